@@ -119,7 +119,11 @@ document.addEventListener("DOMContentLoaded", () => {
     // LÓGICA: DASHBOARD Y CORTES
     // ==========================================
 
-    async function cargarDashboard() {
+    // Cursor de la siguiente página (null = no hay más)
+    let nextCursor = null;
+    const cargarMasWrap = document.getElementById('cargar-mas-wrap');
+
+    async function cargarDashboard(append = false) {
         const fecha = filterFecha.value;
         const cajero = filterCajero.value;
         
@@ -127,6 +131,7 @@ document.addEventListener("DOMContentLoaded", () => {
         const url = new URL(`${API_URL}/obtener-cortes`);
         if (fecha) url.searchParams.append('fecha', fecha);
         if (cajero) url.searchParams.append('cajero', cajero);
+        if (append && nextCursor) url.searchParams.append('after', nextCursor);
 
         try {
             const res = await fetch(url);
@@ -136,13 +141,16 @@ document.addEventListener("DOMContentLoaded", () => {
             document.getElementById('card-total-ventas').innerText = formatCurrency(data.summary.total_ventas);
             document.getElementById('card-total-gastos').innerText = formatCurrency(data.summary.total_gastos);
             document.getElementById('card-neto-total').innerText = formatCurrency(data.summary.neto_total);
-            document.getElementById('conteo-cortes').innerText = `${data.history.length} registros encontrados`;
+            document.getElementById('conteo-cortes').innerText = `${data.summary.total_cortes} registros encontrados`;
 
-            // 2. Actualizar Tabla
+            // 2. Actualizar Tabla (la página siguiente se agrega al final)
             const tbody = document.getElementById('historial-tbody');
-            tbody.innerHTML = '';
+            if (!append) tbody.innerHTML = '';
+
+            nextCursor = data.next_cursor || null;
+            cargarMasWrap.classList.toggle('hidden', !nextCursor);
             
-            if (data.history.length === 0) {
+            if (!append && data.history.length === 0) {
                 tbody.innerHTML = `<tr><td colspan="7" class="table-cell text-center text-slate-400 py-8">No se encontraron datos</td></tr>`;
             }
 
@@ -176,20 +184,16 @@ document.addEventListener("DOMContentLoaded", () => {
                         </div>
                     </td>
                 `;
+                // Listeners dinámicos de la fila
+                tr.querySelector('.view-btn').addEventListener('click', () => abrirModal(corte.id));
+                tr.querySelector('.delete-corte-btn').addEventListener('click', () => eliminarCorte(corte.id));
+
                 tbody.appendChild(tr);
             });
             
             // Refrescar iconos
             if (window.lucide) lucide.createIcons();
 
-            // Listeners dinámicos para la tabla
-            document.querySelectorAll('.view-btn').forEach(btn => {
-                btn.addEventListener('click', () => abrirModal(btn.dataset.id));
-            });
-            document.querySelectorAll('.delete-corte-btn').forEach(btn => {
-                btn.addEventListener('click', () => eliminarCorte(btn.dataset.id));
-            });
-
         } catch (e) {
             console.error(e);
             showToast("Error cargando datos", "error");
@@ -197,8 +201,9 @@ document.addEventListener("DOMContentLoaded", () => {
     }
 
     // Eventos de Filtros
-    filterFecha.addEventListener('change', cargarDashboard);
-    filterCajero.addEventListener('keyup', cargarDashboard);
+    filterFecha.addEventListener('change', () => cargarDashboard());
+    filterCajero.addEventListener('keyup', () => cargarDashboard());
+    document.getElementById('cargar-mas-btn').addEventListener('click', () => cargarDashboard(true));
 
     // Función Eliminar Corte
     async function eliminarCorte(id) {
@@ -1,10 +1,9 @@
 import os
+import sys
 from datetime import datetime, timedelta
 
 from flask import Flask, jsonify, request
 import jwt
-import pymysql
-from pymysql.cursors import DictCursor
 
 # .env en local
 try:
@@ -13,22 +12,21 @@ try:
 except ImportError:
     pass
 
+# Código compartido entre servicios (services/common)
+_SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SERVICES_DIR not in sys.path:
+    sys.path.append(_SERVICES_DIR)
+
+from common.db import get_pool
+
 app = Flask(__name__)
 
 JWT_SECRET = os.getenv("JWT_SECRET", "super_secreto_en_dev")
 JWT_EXP_MIN = int(os.getenv("JWT_EXP_MIN", "60"))
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", "localhost"),
-    "user": os.getenv("DB_USER", "root"),
-    "password": os.getenv("DB_PASS", ""),
-    "database": os.getenv("DB_NAME", "corte_caja"),
-    "cursorclass": DictCursor
-}
-
+db = get_pool()
 
-def get_connection():
-    return pymysql.connect(**DB_CONFIG)
+_SQL_LOGIN = "SELECT email, password, rol FROM usuarios WHERE email = %s"
 
 
 def create_token(email: str, role: str):
@@ -56,7 +54,7 @@ def decode_token(token: str):
 
 @app.route("/auth/health", methods=["GET"])
 def health():
-    return jsonify({"status": "ok", "service": "auth"}), 200
+    return jsonify({"status": "ok", "service": "auth", "db_pool": db.stats()}), 200
 
 
 @app.route("/auth/login", methods=["POST"])
@@ -77,14 +75,9 @@ def login():
         return jsonify({"message": "Email y password son obligatorios"}), 400
 
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT email, password, rol FROM usuarios WHERE email = %s",
-                (email,)
-            )
+        with db.conexion() as conn, conn.cursor() as cursor:
+            cursor.execute(_SQL_LOGIN, (email,))
             user = cursor.fetchone()
-        conn.close()
     except Exception as e:
         return jsonify({"message": f"Error de base de datos: {e}"}), 500
 
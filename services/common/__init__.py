@@ -0,0 +1,6 @@
+"""
+Código compartido entre los microservicios de Corte de Caja.
+
+En Lambda este paquete se empaqueta junto a app.py de cada servicio;
+en local cada app.py agrega services/ al sys.path para encontrarlo.
+"""
@@ -0,0 +1,77 @@
+"""
+Agregación exacta de montos en centavos enteros.
+
+Sólo helpers: centavos() / a_pesos() / resumen() y la suma por grupo de
+filas de corte_totales que usan los reportes. Las sumas grandes ya se
+hacen en SQL; aquí llegan decenas de filas, así que se suman en enteros
+con Python puro y la conversión a float (para el JSON) ocurre una sola
+vez, al final, con a_pesos(). No hay ruta con numpy ni dependencia
+opcional: la variante vectorizada sólo existe en el benchmark.
+
+Clasificación (la misma de cortes/totales.py y corte_totales):
+  INGRESO + VENTAS_TARJETA  -> ventas_tarjeta
+  INGRESO + cualquier otra  -> ventas_efectivo
+  EGRESO                    -> gastos
+  otro tipo                 -> otros
+
+Benchmark contra los ciclos con float: python -m common.bench_agregados
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+CATEGORIAS = ("ventas_efectivo", "ventas_tarjeta", "gastos", "otros")
+EFECTIVO, TARJETA, GASTOS, OTROS = range(len(CATEGORIAS))
+
+
+def codigo(tipo, descripcion):
+    """Código de categoría de un movimiento."""
+    if tipo == "INGRESO":
+        return TARJETA if (descripcion or "").upper() == "VENTAS_TARJETA" else EFECTIVO
+    if tipo == "EGRESO":
+        return GASTOS
+    return OTROS
+
+
+def centavos(valor):
+    """Decimal / str / int / float / None -> centavos (int), redondeo comercial."""
+    if valor is None:
+        return 0
+    if not isinstance(valor, Decimal):
+        valor = Decimal(str(valor))
+    return int(valor.scaleb(2).to_integral_value(ROUND_HALF_UP))
+
+
+def a_pesos(centavos_):
+    return centavos_ / 100
+
+
+def sumar_totales(filas, col_grupo=None):
+    """
+    Filas que ya traen ventas_efectivo / ventas_tarjeta / gastos (corte_totales)
+    -> {grupo: [centavos por categoría]} en el orden de CATEGORIAS. Sin
+    col_grupo todo cae en el grupo 0.
+    """
+    sumas = {}
+    for row in filas:
+        grupo = row[col_grupo] if col_grupo else 0
+        fila = sumas.get(grupo)
+        if fila is None:
+            fila = sumas[grupo] = [0] * len(CATEGORIAS)
+        for cat in (EFECTIVO, TARJETA, GASTOS):
+            fila[cat] += centavos(row.get(CATEGORIAS[cat]))
+    return sumas
+
+
+def total(filas):
+    """[centavos por categoría] de todas las filas juntas."""
+    return sumar_totales(filas).get(0, [0] * len(CATEGORIAS))
+
+
+def resumen(sumas):
+    """[centavos por categoría] -> dict en pesos con neto = ventas - gastos."""
+    efectivo, tarjeta, gastos = sumas[EFECTIVO], sumas[TARJETA], sumas[GASTOS]
+    return {
+        "ventas_efectivo": a_pesos(efectivo),
+        "ventas_tarjeta": a_pesos(tarjeta),
+        "gastos": a_pesos(gastos),
+        "neto": a_pesos(efectivo + tarjeta - gastos),
+    }
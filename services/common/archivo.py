@@ -0,0 +1,206 @@
+"""
+Archivo frío de cortes viejos.
+
+Los cortes CERRADO con fecha_inicio anterior al horizonte (ARCHIVO_DIAS,
+365 por defecto) se mueven, con sus movimientos y totales, a
+cortes_archivo / movimientos_archivo / corte_totales_archivo (migración
+0007, ROW_FORMAT=COMPRESSED). Las tablas calientes quedan con el último
+año y caben en el buffer pool.
+
+archivo_estado.hasta marca la frontera: todo lo archivado tiene
+fecha_inicio < hasta (y sus movimientos, fecha < hasta). Las lecturas piden fuentes(cursor, desde) y sólo
+agregan las tablas de archivo cuando su rango empieza antes de la
+frontera (o no tiene inicio). La frontera se mueve ANTES de copiar filas
+y cada lote se mueve en una transacción, así que caliente + archivo
+siempre tiene todo exactamente una vez.
+
+Los cortes archivados son de sólo lectura. Los rollups de resumen_diario
+no cambian al archivar.
+
+Uso (desde services/):
+  python -m common.archivo estado
+  python -m common.archivo archivar [--dias N] [--lote N] [--optimizar]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+from common.db import get_pool
+
+CALIENTE = {"cortes": "cortes", "movimientos": "movimientos", "totales": "corte_totales"}
+ARCHIVO = {"cortes": "cortes_archivo", "movimientos": "movimientos_archivo",
+           "totales": "corte_totales_archivo"}
+
+
+def frontera(cursor):
+    """Fecha hasta la que puede haber cortes archivados (o None)."""
+    cursor.execute("SELECT hasta FROM archivo_estado WHERE id = 1")
+    row = cursor.fetchone()
+    return row["hasta"] if row else None
+
+
+def antes_de_frontera(desde, hasta):
+    """¿Un rango que empieza en `desde` (None = sin inicio) toca el archivo con frontera `hasta`?"""
+    if hasta is None:
+        return False
+    if desde is None:
+        return True
+    if not isinstance(desde, datetime):
+        desde = datetime(desde.year, desde.month, desde.day)
+    return desde.replace(tzinfo=None) < hasta
+
+
+def necesita_archivo(cursor, desde):
+    return antes_de_frontera(desde, frontera(cursor))
+
+
+def fuentes(cursor, desde):
+    """Tablas a consultar para un rango que empieza en `desde`."""
+    return [CALIENTE, ARCHIVO] if necesita_archivo(cursor, desde) else [CALIENTE]
+
+
+def fuentes_con_frontera(hasta, desde):
+    """Igual que fuentes(), cuando la frontera ya se leyó en otra consulta."""
+    return [CALIENTE, ARCHIVO] if antes_de_frontera(desde, hasta) else [CALIENTE]
+
+
+def union_all(plantilla, lista_fuentes, params=()):
+    """
+    Repite `plantilla` (con {cortes}, {movimientos}, {totales}) por cada
+    fuente y las une con UNION ALL. Regresa (sql, params repetidos).
+    """
+    if len(lista_fuentes) == 1:
+        return plantilla.format(**lista_fuentes[0]), list(params)
+    partes = [f"({plantilla.format(**f)})" for f in lista_fuentes]
+    return "\nUNION ALL\n".join(partes), list(params) * len(lista_fuentes)
+
+
+# ==========================================
+# Archivador
+# ==========================================
+def _mover_lote(cursor, ids):
+    placeholders = ",".join(["%s"] * len(ids))
+    for origen, destino, columna in (
+        ("cortes", "cortes_archivo", "id"),
+        ("movimientos", "movimientos_archivo", "corte_id"),
+        ("corte_totales", "corte_totales_archivo", "corte_id"),
+    ):
+        cursor.execute(
+            f"INSERT INTO {destino} SELECT * FROM {origen} WHERE {columna} IN ({placeholders})",
+            ids
+        )
+    # Hijos primero, igual que DELETE /corte/<id>
+    for tabla, columna in (("movimientos", "corte_id"), ("corte_totales", "corte_id"), ("cortes", "id")):
+        cursor.execute(f"DELETE FROM {tabla} WHERE {columna} IN ({placeholders})", ids)
+
+
+def archivar(db, dias=None, lote=None, pausa=0.0, log=print):
+    """
+    Mueve al archivo los cortes CERRADO anteriores a hoy - `dias`, por
+    lotes de `lote` cortes. Regresa cuántos cortes se movieron.
+    """
+    dias = dias or int(os.getenv("ARCHIVO_DIAS", "365"))
+    lote = lote or int(os.getenv("ARCHIVO_LOTE", "500"))
+
+    # 1) Primero la frontera: desde aquí las lecturas ya consultan el archivo
+    with db.transaccion() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT CAST(CURDATE() - INTERVAL %s DAY AS DATETIME) AS limite", (dias,))
+        limite = cursor.fetchone()["limite"]
+        cursor.execute(
+            """
+            INSERT INTO archivo_estado (id, hasta) VALUES (1, %s)
+            ON DUPLICATE KEY UPDATE hasta = GREATEST(hasta, VALUES(hasta))
+            """,
+            (limite,)
+        )
+
+    # 2) Lotes chicos: cada uno es una transacción corta
+    movidos = 0
+    while True:
+        with db.transaccion() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.id FROM cortes c
+                WHERE c.estado = 'CERRADO' AND c.fecha_inicio < %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM movimientos m
+                      WHERE m.corte_id = c.id AND m.fecha >= %s
+                  )
+                ORDER BY c.fecha_inicio, c.id
+                LIMIT %s
+                FOR UPDATE
+                """,
+                (limite, limite, lote)
+            )
+            ids = [row["id"] for row in cursor.fetchall()]
+            if not ids:
+                break
+            _mover_lote(cursor, ids)
+
+        movidos += len(ids)
+        log(f"archivo: {movidos} cortes movidos (hasta {limite:%Y-%m-%d})")
+        if pausa:
+            time.sleep(pausa)
+    return movidos
+
+
+def optimizar(db, log=print):
+    """Reconstruye las tablas calientes para devolver el espacio liberado."""
+    with db.conexion() as conn, conn.cursor() as cursor:
+        for tabla in ("movimientos", "corte_totales", "cortes"):
+            cursor.execute(f"OPTIMIZE TABLE {tabla}")
+            cursor.fetchall()
+            log(f"archivo: {tabla} optimizada")
+
+
+def estado(db):
+    with db.conexion() as conn, conn.cursor() as cursor:
+        resultado = {"hasta": frontera(cursor)}
+        for nombre, tabla in (*CALIENTE.items(), *((f"{k}_archivo", v) for k, v in ARCHIVO.items())):
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                (tabla,)
+            )
+            row = cursor.fetchone()
+            resultado[nombre] = row["table_rows"] if row else None
+        return resultado
+
+
+def main(argv):
+    if not argv or argv[0] not in ("estado", "archivar"):
+        print("Uso: python -m common.archivo estado | archivar [--dias N] [--lote N] [--optimizar]")
+        return 2
+
+    db = get_pool()
+
+    if argv[0] == "estado":
+        for clave, valor in estado(db).items():
+            print(f"{clave}: {valor}")
+        return 0
+
+    def opcion(nombre):
+        return int(argv[argv.index(nombre) + 1]) if nombre in argv else None
+
+    movidos = archivar(db, dias=opcion("--dias"), lote=opcion("--lote"))
+    print(f"{movidos} cortes archivados")
+    if movidos and "--optimizar" in argv:
+        optimizar(db)
+    return 0
+
+
+# Lambda programada (EventBridge), p. ej. una vez al día
+def handler(event, context):
+    movidos = archivar(get_pool(), pausa=0.05)
+    print("archivo:", movidos)
+    return {"archivados": movidos}
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    sys.exit(main(sys.argv[1:]))
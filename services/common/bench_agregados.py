@@ -0,0 +1,149 @@
+"""
+Benchmark de common.agregados contra los ciclos con float que usaban el
+dashboard / detalle / reportes (float(Decimal) fila por fila).
+
+Sin BD: genera N movimientos sintéticos (Decimal, como los regresa
+PyMySQL) repartidos en cortes y compara tiempos y el error acumulado
+contra la suma exacta en Decimal. La carga a columnas (array de enteros:
+grupo, categoría, centavos) y la suma agrupada viven sólo aquí; con numpy
+instalado mide también la variante vectorizada (bincount). Los servicios
+no las usan: sólo agregan decenas de filas con common.agregados.
+
+Uso (desde services/):
+  python -m common.bench_agregados [--n 1000000] [--cortes 5000]
+"""
+import random
+import sys
+import time
+from array import array
+from decimal import Decimal
+
+from common import agregados
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_DESCRIPCIONES = [("INGRESO", "VENTAS_EFECTIVO"), ("INGRESO", "VENTAS_TARJETA"), ("EGRESO", "GASTOS")]
+
+
+def generar(n, cortes, semilla=7):
+    rnd = random.Random(semilla)
+    filas = []
+    for _ in range(n):
+        tipo, descripcion = rnd.choice(_DESCRIPCIONES)
+        filas.append({
+            "corte_id": rnd.randrange(cortes),
+            "tipo": tipo,
+            "descripcion": descripcion,
+            "monto": Decimal(rnd.randrange(1, 500000)) / 100,
+        })
+    return filas
+
+
+def con_floats(filas):
+    """Como el código anterior: float por fila, acumulado por corte."""
+    por_corte = {}
+    for row in filas:
+        t = por_corte.setdefault(row["corte_id"], {"ventas_efectivo": 0.0, "ventas_tarjeta": 0.0, "gastos": 0.0})
+        monto = float(row["monto"] or 0)
+        if row["tipo"] == "INGRESO":
+            if row["descripcion"] == "VENTAS_TARJETA":
+                t["ventas_tarjeta"] += monto
+            else:
+                t["ventas_efectivo"] += monto
+        elif row["tipo"] == "EGRESO":
+            t["gastos"] += monto
+    total = {"ventas_efectivo": 0.0, "ventas_tarjeta": 0.0, "gastos": 0.0}
+    for t in por_corte.values():
+        for k in total:
+            total[k] += t[k]
+    return total
+
+
+def exacto(filas):
+    total = {c: Decimal("0") for c in agregados.CATEGORIAS}
+    for row in filas:
+        total[agregados.CATEGORIAS[agregados.codigo(row["tipo"], row["descripcion"])]] += row["monto"]
+    return total
+
+
+def a_columnas(filas, col_grupo):
+    """Filas con tipo / descripcion / monto -> arrays paralelos (grupo, categoria, centavos)."""
+    grupo, categoria, cents = array("q"), array("b"), array("q")
+    for row in filas:
+        grupo.append(row[col_grupo])
+        categoria.append(agregados.codigo(row["tipo"], row["descripcion"]))
+        cents.append(agregados.centavos(row["monto"]))
+    return grupo, categoria, cents
+
+
+def por_grupo(cols):
+    """{grupo: [centavos por categoría]} de una sola pasada en Python."""
+    n = len(agregados.CATEGORIAS)
+    sumas = {}
+    for g, c, v in zip(*cols):
+        fila = sumas.get(g)
+        if fila is None:
+            fila = sumas[g] = [0] * n
+        fila[c] += v
+    return sumas
+
+
+def por_grupo_numpy(cols):
+    """por_grupo() con un bincount de numpy."""
+    n = len(agregados.CATEGORIAS)
+    grupo, categoria, cents = cols
+    grupos, indice = np.unique(np.frombuffer(grupo, dtype=np.int64), return_inverse=True)
+    celda = indice * n + np.frombuffer(categoria, dtype=np.int8)
+    # Pesos float64: exactos mientras cada suma quede bajo 2**53 centavos
+    sumas = np.bincount(celda, weights=np.frombuffer(cents, dtype=np.int64),
+                        minlength=len(grupos) * n)
+    sumas = np.rint(sumas).astype(np.int64).reshape(len(grupos), n)
+    return {int(g): [int(x) for x in fila] for g, fila in zip(grupos, sumas)}
+
+
+def medir(nombre, fn, *args):
+    inicio = time.perf_counter()
+    resultado = fn(*args)
+    print(f"  {nombre:<32} {time.perf_counter() - inicio:8.3f} s")
+    return resultado
+
+
+def main(argv):
+    def opcion(nombre, defecto):
+        return int(argv[argv.index(nombre) + 1]) if nombre in argv else defecto
+
+    n = opcion("--n", 1_000_000)
+    cortes = opcion("--cortes", 5000)
+
+    print(f"generando {n} movimientos en {cortes} cortes...")
+    filas = generar(n, cortes)
+    referencia = exacto(filas)
+
+    floats = medir("ciclo con float (antes)", con_floats, filas)
+    cols = medir("carga a columnas", a_columnas, filas, "corte_id")
+    sumas = medir("suma agrupada", por_grupo, cols)
+
+    if np is not None:
+        vectorizada = medir("suma agrupada con numpy", por_grupo_numpy, cols)
+        print(f"  numpy {'igual' if vectorizada == sumas else 'DISTINTO'}")
+    else:
+        print("  numpy no instalado: sin suma vectorizada")
+
+    total = [0] * len(agregados.CATEGORIAS)
+    for fila in sumas.values():
+        for i, v in enumerate(fila):
+            total[i] += v
+
+    print("error contra Decimal:")
+    for i, cat in enumerate(agregados.CATEGORIAS[:3]):
+        exacta = referencia[cat]
+        print(f"  {cat:<16} float: {Decimal(repr(floats[cat])) - exacta:+.10f}"
+              f"   centavos: {Decimal(total[i]) / 100 - exacta:+.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,27 @@
+"""
+Clientes de AWS creados en el primer uso y reutilizados después.
+
+boto3 tarda en importarse y cada boto3.client() vuelve a cargar el modelo
+del servicio; en Lambda eso pega en el arranque en frío aunque la ruta
+(p. ej. /health) nunca use AWS. Aquí el import y el cliente se difieren
+hasta que hacen falta y el cliente queda cacheado por proceso (los
+clientes de boto3 son seguros entre hilos).
+"""
+import threading
+from functools import lru_cache
+
+# Crear clientes desde la sesión por defecto de boto3 no es seguro entre
+# hilos (sí lo es usarlos): la creación va bajo un lock.
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _crear(servicio, region_name):
+    import boto3
+
+    return boto3.client(servicio, region_name=region_name)
+
+
+def cliente_aws(servicio, region_name=None):
+    with _lock:
+        return _crear(servicio, region_name)
@@ -0,0 +1,223 @@
+"""
+Pool de conexiones MySQL compartido por todos los microservicios.
+
+Cada Lambda (o proceso local) mantiene un único pool a nivel de módulo,
+así que las invocaciones "calientes" reutilizan las conexiones ya abiertas
+en lugar de pagar el handshake TCP + auth en cada request.
+
+Uso:
+
+    db = get_pool()
+
+    with db.conexion() as conn:          # solo lectura / commit manual
+        with conn.cursor() as cursor:
+            ...
+
+    with db.transaccion() as conn:       # commit al salir, rollback si falla
+        with conn.cursor() as cursor:
+            ...
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+from pymysql.cursors import DictCursor
+
+
+class PoolAgotado(Exception):
+    """No se liberó ninguna conexión dentro del tiempo de espera."""
+
+
+def config_desde_env(**extra):
+    """
+    Configuración de conexión a partir de las variables de entorno
+    que ya usan todos los servicios (DB_HOST, DB_USER, DB_PASS, DB_NAME).
+    """
+    config = {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "user": os.getenv("DB_USER", "root"),
+        "password": os.getenv("DB_PASS", ""),
+        "database": os.getenv("DB_NAME", "corte_caja"),
+        "cursorclass": DictCursor,
+    }
+    config.update(extra)
+    return config
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones PyMySQL.
+
+    - Como máximo `max_size` conexiones vivas (prestadas + libres).
+    - Al prestar una conexión se valida con ping(); si el servidor la cerró
+      (wait_timeout, failover de RDS, etc.) se descarta y se abre otra.
+    - Al devolverla se hace rollback para no arrastrar una transacción
+      implícita (y su snapshot) al siguiente request.
+    """
+
+    def __init__(self, config, max_size=5, timeout=10.0):
+        self.config = dict(config)
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+
+        self._libres = []
+        self._cond = threading.Condition()
+        self._vivas = 0
+
+        self._stats = {
+            "creadas": 0,
+            "reutilizadas": 0,
+            "descartadas": 0,
+            "esperas": 0,
+            "agotado": 0,
+        }
+
+    # ------------------------------
+    # Préstamo / devolución
+    # ------------------------------
+    def _tomar(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._libres:
+                    conn = self._libres.pop()
+                    break
+                if self._vivas < self.max_size:
+                    self._vivas += 1
+                    conn = None
+                    break
+                restante = deadline - time.monotonic()
+                if restante <= 0:
+                    self._stats["agotado"] += 1
+                    raise PoolAgotado(
+                        f"Sin conexiones libres tras {self.timeout}s "
+                        f"(max_size={self.max_size})"
+                    )
+                self._stats["esperas"] += 1
+                self._cond.wait(restante)
+
+        if conn is not None:
+            try:
+                conn.ping(reconnect=False)
+                self._contar("reutilizadas")
+                return conn
+            except Exception:
+                self._cerrar_silencioso(conn)
+                self._contar("descartadas")
+
+        try:
+            conn = pymysql.connect(**self.config)
+        except Exception:
+            with self._cond:
+                self._vivas -= 1
+                self._cond.notify()
+            raise
+        self._contar("creadas")
+        return conn
+
+    def _devolver(self, conn, descartar=False):
+        if not descartar:
+            try:
+                conn.rollback()
+            except Exception:
+                descartar = True
+
+        with self._cond:
+            if descartar or not conn.open:
+                self._vivas -= 1
+                self._stats["descartadas"] += 1
+            else:
+                self._libres.append(conn)
+            self._cond.notify()
+
+        if descartar:
+            self._cerrar_silencioso(conn)
+
+    @contextmanager
+    def conexion(self):
+        """
+        Presta una conexión y la devuelve al pool al salir del bloque,
+        también cuando hay una excepción o un `return` temprano.
+        """
+        conn = self._tomar()
+        try:
+            yield conn
+        except pymysql.err.OperationalError:
+            # Conexión probablemente rota: no la regresamos al pool
+            self._devolver(conn, descartar=True)
+            raise
+        except BaseException:
+            self._devolver(conn)
+            raise
+        else:
+            self._devolver(conn)
+
+    @contextmanager
+    def transaccion(self):
+        """
+        Igual que conexion(), pero hace commit al terminar el bloque
+        y rollback si se lanzó una excepción.
+        """
+        with self.conexion() as conn:
+            yield conn
+            conn.commit()
+
+    # ------------------------------
+    # Utilidades
+    # ------------------------------
+    def stats(self):
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "abiertas": self._vivas,
+                "libres": len(self._libres),
+                "en_uso": self._vivas - len(self._libres),
+                **self._stats,
+            }
+
+    def cerrar(self):
+        with self._cond:
+            libres, self._libres = self._libres, []
+            self._vivas -= len(libres)
+        for conn in libres:
+            self._cerrar_silencioso(conn)
+
+    def _contar(self, clave):
+        with self._cond:
+            self._stats[clave] += 1
+
+    @staticmethod
+    def _cerrar_silencioso(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# ==========================================
+# Pool por proceso (sobrevive entre invocaciones calientes)
+# ==========================================
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config=None, max_size=None, timeout=None):
+    """
+    Devuelve el pool del proceso para `config` (por defecto el de las
+    variables de entorno), creándolo la primera vez.
+    """
+    config = config or config_desde_env()
+    clave = tuple(sorted((k, repr(v)) for k, v in config.items()))
+
+    with _pools_lock:
+        pool = _pools.get(clave)
+        if pool is None:
+            pool = ConnectionPool(
+                config,
+                max_size=max_size or int(os.getenv("DB_POOL_SIZE", "5")),
+                timeout=timeout or float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            )
+            _pools[clave] = pool
+        return pool
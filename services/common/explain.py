@@ -0,0 +1,178 @@
+"""
+Chequeo de planes de ejecución de las consultas calientes.
+
+Corre EXPLAIN sobre cada consulta de consultas_calientes() y falla (exit 1)
+si alguna hace un full scan (type = ALL) sobre una tabla no permitida.
+Tiene sentido contra una BD con volumen realista: con tablas casi vacías
+MySQL prefiere escanear aunque exista el índice.
+
+Las consultas salen de los propios servicios (constantes SQL y helpers
+de cada app.py / resumenes.py), así que no pueden desviarse de lo que
+corren los handlers. Sólo los parámetros son de ejemplo.
+
+Uso (desde services/):
+  python -m common.explain
+"""
+import importlib.util
+import os
+import sys
+from datetime import datetime, timedelta
+
+from common import archivo
+from common.db import get_pool
+
+_SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_HOY = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+_MANANA = _HOY + timedelta(days=1)
+
+
+def _servicio(nombre):
+    """
+    services/<nombre>/app.py como módulo `<nombre>_app` (todos se llaman
+    app.py). Su carpeta va al sys.path para sus imports locales
+    (resumenes, totales, jobs...). Crear la app no abre conexiones.
+    """
+    carpeta = os.path.join(_SERVICES_DIR, nombre)
+    if carpeta not in sys.path:
+        sys.path.append(carpeta)
+    spec = importlib.util.spec_from_file_location(f"{nombre}_app", os.path.join(carpeta, "app.py"))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def consultas_calientes():
+    """(nombre, sql, params, alias de tablas en las que se tolera un scan)"""
+    auth, cortes, reportes = _servicio("auth"), _servicio("cortes"), _servicio("reportes")
+    caliente = archivo.CALIENTE
+
+    def pagina(plantilla, filtros="", params=(), fuente=caliente, keyset=None):
+        """Página del dashboard tal como la arma pagina_de_fuentes() (una fuente)."""
+        params = list(params)
+        sql = plantilla + filtros + cortes.filtro_keyset("c.fecha_inicio", "c.id", keyset, params)
+        sql += cortes.orden_pagina("c.fecha_inicio", "c.id")
+        return sql.format(**fuente), (*params, 51)
+
+    por_cajero = []
+    filtro_cajero = cortes.condicion_usuarios([1, 2], por_cajero)   # ?cajero= ya resuelto
+    rango = (_HOY - timedelta(days=1), _MANANA, 1)
+    cortes_rango, params_rango = archivo.union_all(reportes._SQL_CORTES_RANGO, [caliente], rango)
+
+    return [
+        ("auth.login", auth._SQL_LOGIN, ("gerente@demo.com",), set()),
+        (
+            "cortes.dashboard.resumen_por_fecha",
+            (cortes.SQL_DASHBOARD_RESUMEN + cortes.FILTRO_DIA).format(**caliente),
+            (_HOY, _MANANA),
+            set(),
+        ),
+        (
+            # Resumen por defecto (sin ?fecha=): vista de entrada del dashboard.
+            # resumen_diario se recorre completa a propósito: tiene una fila por
+            # (día, cajero, turno), no por corte; los ABIERTO van por índice.
+            "cortes.dashboard.resumen",
+            cortes.resumenes._SQL_TOTALES_DASHBOARD.format(filtro_r="", filtro_c=""),
+            (),
+            {"r", "<derived2>"},
+        ),
+        ("cortes.dashboard.pagina", *pagina(cortes.SQL_DASHBOARD_PAGINA), set()),
+        (
+            "cortes.dashboard.pagina_por_fecha",
+            *pagina(cortes.SQL_DASHBOARD_PAGINA, cortes.FILTRO_DIA, (_HOY, _MANANA),
+                    keyset=(_MANANA, 2 ** 31 - 1)),
+            set(),
+        ),
+        (
+            "cortes.dashboard.pagina_por_cajero",
+            *pagina(cortes.SQL_DASHBOARD_PAGINA, filtro_cajero, por_cajero),
+            set(),
+        ),
+        (
+            # Parte "archivo" de la página del dashboard (common/archivo.py)
+            "cortes.dashboard.pagina_archivo",
+            *pagina(cortes.SQL_DASHBOARD_PAGINA, cortes.FILTRO_DIA,
+                    (_HOY - timedelta(days=400), _HOY - timedelta(days=399)), archivo.ARCHIVO),
+            set(),
+        ),
+        (
+            # leer_detalles(): /corte/<id> con un id, /cortes/detalle con varios
+            "cortes.detalle",
+            cortes.SQL_DETALLE.format(**caliente) + " WHERE c.id IN (%s)",
+            (1,),
+            set(),
+        ),
+        (
+            "cortes.detalle.lote",
+            cortes.SQL_DETALLE.format(**caliente) + " WHERE c.id IN (%s,%s,%s)",
+            (1, 2, 3),
+            set(),
+        ),
+        (
+            "cortes.movimientos.pagina",
+            (cortes.SQL_MOVIMIENTOS_PAGINA + cortes.orden_pagina("fecha", "id")).format(**caliente),
+            (1, 51),
+            set(),
+        ),
+        (
+            "cortes.resumen.por_mes",
+            cortes.resumenes.sql_consulta("mes"),
+            (_HOY - timedelta(days=90), _HOY),
+            set(),
+        ),
+        (
+            "reportes.carga.corte_final",
+            reportes._SQL_CORTE_FINAL.format(**caliente),
+            (1,),
+            set(),
+        ),
+        (
+            "reportes.carga.desglose",
+            reportes._SQL_DESGLOSE.format(cortes_rango=cortes_rango),
+            params_rango,
+            set(),
+        ),
+        (
+            "reportes.excel.movimientos",
+            reportes._SQL_MOVIMIENTOS_REPORTE.format(**caliente),
+            rango,
+            set(),
+        ),
+    ]
+
+
+def revisar(cursor, consultas=None):
+    """
+    Regresa una lista de (nombre, tabla, filas estimadas) con los full scans
+    no permitidos.
+    """
+    if consultas is None:
+        consultas = consultas_calientes()
+    problemas = []
+    for nombre, sql, params, permitidos in consultas:
+        cursor.execute("EXPLAIN " + sql, params)
+        for paso in cursor.fetchall():
+            if paso.get("type") == "ALL" and paso.get("table") not in permitidos:
+                problemas.append((nombre, paso.get("table"), paso.get("rows")))
+    return problemas
+
+
+def main():
+    consultas = consultas_calientes()
+    db = get_pool()
+    with db.conexion() as conn, conn.cursor() as cursor:
+        problemas = revisar(cursor, consultas)
+
+    for nombre, tabla, filas in problemas:
+        print(f"FULL SCAN  {nombre}: tabla {tabla} (~{filas} filas)")
+    print(f"{len(consultas)} consultas revisadas, {len(problemas)} full scans")
+    return 1 if problemas else 0
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Lectura de resultados grandes sin cargarlos en memoria.
+
+Las filas salen de un cursor sin buffer (SSDictCursor) conforme el
+consumidor las pide. Lo usan las exportaciones de cortes
+(cortes/exportar.py) y la hoja de movimientos del Excel de reportes.
+"""
+import heapq
+
+from pymysql.cursors import SSDictCursor
+
+
+def filas_sin_buffer(db, sql, params):
+    """
+    Genera las filas de `sql` leyendo del servidor conforme se consumen.
+
+    Si el consumidor corta a medias (cliente desconectado), drenar el resto
+    del resultado costaría leerlo todo; en ese caso se cierra la conexión
+    y el pool la descarta. Si termina bien, la conexión regresa al pool con
+    net_write_timeout de vuelta en su valor por defecto.
+    """
+    with db.conexion() as conn:
+        cursor = conn.cursor(SSDictCursor)
+        terminado = False
+        try:
+            # Un cliente lento no debe hacer que MySQL aborte el envío
+            cursor.execute("SET SESSION net_write_timeout = 600")
+            cursor.execute(sql, params)
+            for row in cursor.fetchall_unbuffered():
+                yield row
+            terminado = True
+        finally:
+            if terminado:
+                try:
+                    cursor.execute("SET SESSION net_write_timeout = DEFAULT")
+                    cursor.close()
+                except Exception:
+                    # Sin poder restaurar la sesión, mejor que no vuelva al pool
+                    conn.close()
+                    raise
+            else:
+                conn.close()
+
+
+def filas_mezcladas(generadores, clave):
+    """
+    Mezcla varios flujos ya ordenados por `clave` (caliente + archivo)
+    sin juntarlos en memoria. Si el consumidor corta, cierra cada flujo
+    para que suelte su conexión.
+    """
+    try:
+        yield from heapq.merge(*generadores, key=clave)
+    finally:
+        for g in generadores:
+            g.close()
@@ -0,0 +1,130 @@
+"""
+Migraciones de esquema versionadas.
+
+Cada archivo de common/sql/ con nombre NNNN_descripcion.sql es una versión.
+Las aplicadas se registran en la tabla schema_migraciones, así que correr
+el comando dos veces no repite nada.
+
+Uso (desde services/):
+  python -m common.migraciones estado
+  python -m common.migraciones aplicar [--hasta NNNN]
+"""
+import os
+import re
+import sys
+
+import pymysql
+
+from common.db import get_pool
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql")
+
+_NOMBRE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# Errores que significan "ya estaba así" al adoptar una BD existente:
+# tabla existente, columna duplicada, índice duplicado.
+_YA_EXISTE = {1050, 1060, 1061}
+
+_DDL_CONTROL = """
+    CREATE TABLE IF NOT EXISTS schema_migraciones (
+        version INT NOT NULL PRIMARY KEY,
+        nombre VARCHAR(150) NOT NULL,
+        aplicada TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def cargar_migraciones(directorio=SQL_DIR):
+    """Lista ordenada de (version, nombre, ruta)."""
+    migraciones = []
+    for archivo in os.listdir(directorio):
+        m = _NOMBRE.match(archivo)
+        if m:
+            migraciones.append((int(m.group(1)), m.group(2), os.path.join(directorio, archivo)))
+    migraciones.sort()
+    return migraciones
+
+
+def dividir_sentencias(sql):
+    """Separa un script en sentencias (sin comentarios `--`)."""
+    lineas = [l for l in sql.splitlines() if not l.strip().startswith("--")]
+    return [s.strip() for s in "\n".join(lineas).split(";") if s.strip()]
+
+
+def versiones_aplicadas(cursor):
+    cursor.execute(_DDL_CONTROL)
+    cursor.execute("SELECT version FROM schema_migraciones")
+    return {row["version"] for row in cursor.fetchall()}
+
+
+def aplicar(db, hasta=None, log=print):
+    """Aplica en orden las migraciones pendientes. Regresa las versiones aplicadas."""
+    aplicadas = []
+    with db.conexion() as conn, conn.cursor() as cursor:
+        ya = versiones_aplicadas(cursor)
+        conn.commit()
+
+        for version, nombre, ruta in cargar_migraciones():
+            if version in ya or (hasta is not None and version > hasta):
+                continue
+
+            log(f"-> {version:04d}_{nombre}")
+            with open(ruta, encoding="utf-8") as f:
+                sentencias = dividir_sentencias(f.read())
+
+            # El DDL de MySQL hace commit implícito, así que cada sentencia
+            # se aplica por separado y la versión se registra al final.
+            for sentencia in sentencias:
+                try:
+                    cursor.execute(sentencia)
+                except pymysql.err.OperationalError as e:
+                    if e.args[0] not in _YA_EXISTE:
+                        raise
+                    log(f"   (ya existía) {e.args[1]}")
+
+            cursor.execute(
+                "INSERT INTO schema_migraciones (version, nombre) VALUES (%s, %s)",
+                (version, nombre)
+            )
+            conn.commit()
+            aplicadas.append(version)
+
+    return aplicadas
+
+
+def estado(db):
+    """Lista de (version, nombre, aplicada: bool)."""
+    with db.conexion() as conn, conn.cursor() as cursor:
+        ya = versiones_aplicadas(cursor)
+        conn.commit()
+    return [(v, n, v in ya) for v, n, _ in cargar_migraciones()]
+
+
+def main(argv):
+    if not argv or argv[0] not in ("estado", "aplicar"):
+        print("Uso: python -m common.migraciones estado | aplicar [--hasta NNNN]")
+        return 2
+
+    db = get_pool()
+
+    if argv[0] == "estado":
+        for version, nombre, aplicada in estado(db):
+            print(f"{'[x]' if aplicada else '[ ]'} {version:04d}_{nombre}")
+        return 0
+
+    hasta = None
+    if "--hasta" in argv:
+        hasta = int(argv[argv.index("--hasta") + 1])
+
+    aplicadas = aplicar(db, hasta=hasta)
+    print(f"{len(aplicadas)} migraciones aplicadas")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    sys.exit(main(sys.argv[1:]))
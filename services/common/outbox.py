@@ -0,0 +1,288 @@
+"""
+Outbox transaccional para la cadena cortes -> reportes -> notificaciones.
+
+Quien origina el evento lo guarda con encolar() usando el MISMO cursor de
+la transacción que escribe el corte / reporte: si el commit falla no queda
+evento, y si el commit pasa el evento no se pierde aunque el destino esté
+caído.
+
+El Dispatcher drena la tabla por lotes:
+  - reclama filas PENDIENTE con proximo_intento vencido (FOR UPDATE
+    SKIP LOCKED) y les empuja proximo_intento como "lease"; si el proceso
+    muere a medias, la fila vuelve a estar disponible al vencer el lease;
+  - las entrega por HTTP en paralelo (`concurrencia` hilos);
+  - 2xx -> ENVIADO (salvo 202: el destino sólo lo aceptó, se reintenta);
+    error -> reintento con backoff exponencial;
+    4xx definitivo o demasiados intentos -> MUERTO (dead letter).
+
+La entrega es "al menos una vez": los destinos reciben el header
+Idempotency-Key (outbox-<id>) para poder descartar duplicados.
+
+Uso (desde services/):
+  python -m common.outbox despachar [--una-vez] [--lote N] [--concurrencia N]
+  python -m common.outbox muertos
+  python -m common.outbox reintentar <id> [<id> ...]
+"""
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common.db import get_pool
+
+EVENTO_GENERAR_REPORTE = "reporte.generar"
+EVENTO_NOTIFICAR_REPORTE = "notificacion.reporte_final"
+
+
+def destinos_desde_env():
+    """URL a la que se entrega cada tipo de evento."""
+    return {
+        EVENTO_GENERAR_REPORTE: os.getenv("REPORTES_URL"),
+        EVENTO_NOTIFICAR_REPORTE: os.getenv("NOTIFICACIONES_URL"),
+    }
+
+
+def encolar(cursor, tipo, payload):
+    """Registra un evento dentro de la transacción del llamador."""
+    cursor.execute(
+        "INSERT INTO outbox (tipo, payload) VALUES (%s, %s)",
+        (tipo, json.dumps(payload, default=str))
+    )
+    return cursor.lastrowid
+
+
+class ErrorEntrega(Exception):
+    def __init__(self, mensaje, definitivo=False):
+        super().__init__(mensaje)
+        self.definitivo = definitivo
+
+
+def enviar_http(url, evento, timeout):
+    """Entrega un evento por POST. Lanza ErrorEntrega si no fue 2xx."""
+    import requests
+
+    try:
+        resp = requests.post(
+            url,
+            json=evento["payload"],
+            headers={"Idempotency-Key": f"outbox-{evento['id']}"},
+            timeout=timeout,
+        )
+    except requests.RequestException as e:
+        raise ErrorEntrega(f"{type(e).__name__}: {e}")
+
+    # 202 = aceptado para procesar después, sin garantía de que ocurra
+    if resp.status_code == 202:
+        raise ErrorEntrega("HTTP 202: aceptado sin procesar")
+    if 200 <= resp.status_code < 300:
+        return
+    # 408/429 y 5xx se reintentan; el resto de 4xx no va a mejorar
+    definitivo = 400 <= resp.status_code < 500 and resp.status_code not in (408, 429)
+    raise ErrorEntrega(f"HTTP {resp.status_code}: {resp.text[:200]}", definitivo=definitivo)
+
+
+class Dispatcher:
+    def __init__(self, db=None, destinos=None, lote=None, concurrencia=None,
+                 max_intentos=None, backoff_base=None, backoff_max=None,
+                 lease=None, timeout=None, enviar=enviar_http):
+        self.db = db or get_pool()
+        self.destinos = destinos or destinos_desde_env()
+        self.lote = lote or int(os.getenv("OUTBOX_LOTE", "50"))
+        self.concurrencia = concurrencia or int(os.getenv("OUTBOX_CONCURRENCIA", "4"))
+        self.max_intentos = max_intentos or int(os.getenv("OUTBOX_MAX_INTENTOS", "8"))
+        self.backoff_base = backoff_base or float(os.getenv("OUTBOX_BACKOFF_BASE", "5"))
+        self.backoff_max = backoff_max or float(os.getenv("OUTBOX_BACKOFF_MAX", "3600"))
+        self.lease = lease or int(os.getenv("OUTBOX_LEASE", "120"))
+        self.timeout = timeout or float(os.getenv("OUTBOX_TIMEOUT", "30"))
+        self.enviar = enviar
+
+    def backoff(self, intentos):
+        """Segundos de espera antes del siguiente intento (con jitter)."""
+        espera = min(self.backoff_max, self.backoff_base * (2 ** (intentos - 1)))
+        return int(espera * random.uniform(0.8, 1.2))
+
+    # ------------------------------
+    # Una ronda: reclamar, entregar, registrar
+    # ------------------------------
+    def reclamar(self):
+        with self.db.transaccion() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT id, tipo, payload, intentos
+                FROM outbox
+                WHERE estado = 'PENDIENTE'
+                  AND proximo_intento <= NOW()
+                ORDER BY proximo_intento, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                (self.lote,)
+            )
+            eventos = cursor.fetchall()
+            if not eventos:
+                return []
+
+            ids = [e["id"] for e in eventos]
+            placeholders = ",".join(["%s"] * len(ids))
+            cursor.execute(
+                f"""
+                UPDATE outbox
+                SET intentos = intentos + 1,
+                    proximo_intento = NOW() + INTERVAL %s SECOND
+                WHERE id IN ({placeholders})
+                """,
+                [self.lease, *ids]
+            )
+
+        for e in eventos:
+            e["intentos"] += 1
+            if isinstance(e["payload"], (str, bytes)):
+                e["payload"] = json.loads(e["payload"])
+        return eventos
+
+    def _entregar(self, evento):
+        url = self.destinos.get(evento["tipo"])
+        if not url:
+            return evento, ErrorEntrega(f"sin destino configurado para {evento['tipo']}")
+        try:
+            self.enviar(url, evento, self.timeout)
+            return evento, None
+        except ErrorEntrega as e:
+            return evento, e
+        except Exception as e:
+            return evento, ErrorEntrega(f"{type(e).__name__}: {e}")
+
+    def registrar(self, resultados):
+        stats = {"enviados": 0, "reintentos": 0, "muertos": 0}
+        with self.db.transaccion() as conn, conn.cursor() as cursor:
+            for evento, error in resultados:
+                if error is None:
+                    cursor.execute(
+                        """
+                        UPDATE outbox
+                        SET estado = 'ENVIADO', enviado = NOW(), ultimo_error = NULL
+                        WHERE id = %s
+                        """,
+                        (evento["id"],)
+                    )
+                    stats["enviados"] += 1
+                elif error.definitivo or evento["intentos"] >= self.max_intentos:
+                    cursor.execute(
+                        "UPDATE outbox SET estado = 'MUERTO', ultimo_error = %s WHERE id = %s",
+                        (str(error)[:500], evento["id"])
+                    )
+                    stats["muertos"] += 1
+                else:
+                    cursor.execute(
+                        """
+                        UPDATE outbox
+                        SET proximo_intento = NOW() + INTERVAL %s SECOND,
+                            ultimo_error = %s
+                        WHERE id = %s
+                        """,
+                        (self.backoff(evento["intentos"]), str(error)[:500], evento["id"])
+                    )
+                    stats["reintentos"] += 1
+        return stats
+
+    def ejecutar_ronda(self):
+        eventos = self.reclamar()
+        if not eventos:
+            return {"reclamados": 0, "enviados": 0, "reintentos": 0, "muertos": 0}
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrencia, len(eventos))) as pool:
+            resultados = list(pool.map(self._entregar, eventos))
+
+        stats = self.registrar(resultados)
+        stats["reclamados"] = len(eventos)
+        return stats
+
+    def ejecutar(self, espera=2.0, una_vez=False, log=print):
+        """Drena el outbox; con una_vez=True termina cuando no queda nada listo."""
+        while True:
+            stats = self.ejecutar_ronda()
+            if stats["reclamados"]:
+                log(f"outbox: {stats}")
+            elif una_vez:
+                return
+            else:
+                time.sleep(espera)
+
+
+# ==========================================
+# Dead letters
+# ==========================================
+def listar_muertos(db, limite=100):
+    with db.conexion() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT id, tipo, intentos, ultimo_error, creado
+            FROM outbox
+            WHERE estado = 'MUERTO'
+            ORDER BY id DESC
+            LIMIT %s
+            """,
+            (limite,)
+        )
+        return cursor.fetchall()
+
+
+def reintentar(db, ids):
+    """Regresa eventos MUERTO a PENDIENTE con el contador en cero."""
+    if not ids:
+        return 0
+    placeholders = ",".join(["%s"] * len(ids))
+    with db.transaccion() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE outbox
+            SET estado = 'PENDIENTE', intentos = 0, proximo_intento = NOW()
+            WHERE estado = 'MUERTO' AND id IN ({placeholders})
+            """,
+            list(ids)
+        )
+        return cursor.rowcount
+
+
+# Lambda programada (EventBridge) que drena lo pendiente
+def handler(event, context):
+    stats = Dispatcher().ejecutar_ronda()
+    print("outbox:", stats)
+    return stats
+
+
+def main(argv):
+    if not argv or argv[0] not in ("despachar", "muertos", "reintentar"):
+        print("Uso: python -m common.outbox despachar [--una-vez] [--lote N] [--concurrencia N]"
+              " | muertos | reintentar <id> ...")
+        return 2
+
+    if argv[0] == "muertos":
+        for e in listar_muertos(get_pool()):
+            print(f"{e['id']}  {e['tipo']}  intentos={e['intentos']}  {e['ultimo_error']}")
+        return 0
+
+    if argv[0] == "reintentar":
+        print(f"{reintentar(get_pool(), [int(x) for x in argv[1:]])} eventos reencolados")
+        return 0
+
+    def opcion(nombre):
+        return int(argv[argv.index(nombre) + 1]) if nombre in argv else None
+
+    dispatcher = Dispatcher(lote=opcion("--lote"), concurrencia=opcion("--concurrencia"))
+    try:
+        dispatcher.ejecutar(una_vez="--una-vez" in argv)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,88 @@
+"""
+Perfil de arranque en frío: tiempo de import de cada servicio.
+
+Importa el app.py de cada servicio en un proceso nuevo con
+`python -X importtime` (igual que un arranque en frío de Lambda) y
+reporta el tiempo total y los módulos que más pesan. Con --max-ms
+termina con exit 1 si algún servicio se pasa, para detectar regresiones
+(p. ej. alguien vuelve a importar boto3 u openpyxl a nivel de módulo).
+
+Uso (desde services/):
+  python -m common.perfil_arranque [servicio ...] [--top N] [--max-ms N]
+"""
+import os
+import re
+import subprocess
+import sys
+
+SERVICIOS = ("auth", "users", "cortes", "reportes", "notificaciones")
+
+_SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import time:  self [us] | cumulative | imported package
+_LINEA = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+
+def medir(servicio):
+    """
+    Regresa (total_us, [(modulo, acumulado_us, self_us), ...]) con los
+    imports de primer nivel que hizo app.py (y el propio app como total).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=os.path.join(_SERVICES_DIR, servicio),
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        errores = [l for l in proc.stderr.splitlines() if l.strip() and not l.startswith("import time:")]
+        ultima = errores[-1] if errores else "?"
+        raise RuntimeError(f"{servicio}: no se pudo importar app.py ({ultima})")
+
+    modulos = []
+    total = 0
+    for linea in proc.stderr.splitlines():
+        m = _LINEA.match(linea)
+        if not m:
+            continue
+        propio, acumulado, sangria, nombre = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        if nombre == "app":
+            total = acumulado
+        # La sangría crece 2 espacios por nivel: 3 = importado directo por app
+        elif len(sangria) == 3:
+            modulos.append((nombre, acumulado, propio))
+    return total, modulos
+
+
+def main(argv):
+    def opcion(nombre, defecto):
+        return int(argv[argv.index(nombre) + 1]) if nombre in argv else defecto
+
+    top = opcion("--top", 8)
+    max_ms = opcion("--max-ms", None)
+    valores = {argv[argv.index(o) + 1] for o in ("--top", "--max-ms") if o in argv}
+    servicios = [a for a in argv if not a.startswith("--") and a not in valores] or list(SERVICIOS)
+
+    excedidos = []
+    for servicio in servicios:
+        try:
+            total, modulos = medir(servicio)
+        except RuntimeError as e:
+            print(e)
+            excedidos.append(servicio)
+            continue
+
+        print(f"{servicio:<16} {total / 1000:8.1f} ms")
+        for nombre, acumulado, _ in sorted(modulos, key=lambda m: -m[1])[:top]:
+            print(f"    {nombre:<36} {acumulado / 1000:8.1f} ms")
+        if max_ms is not None and total / 1000 > max_ms:
+            excedidos.append(servicio)
+
+    if excedidos:
+        print(f"fuera de presupuesto: {', '.join(excedidos)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,55 @@
+-- Esquema base que usan los servicios (auth, users, cortes, reportes,
+-- notificaciones). Con IF NOT EXISTS para poder adoptar una BD existente.
+--
+-- No se declaran FOREIGN KEYs: los servicios ya borran en orden
+-- (movimientos -> corte_totales -> cortes) y eliminar usuarios/cortes
+-- con historial no debe fallar por restricciones nuevas.
+
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    email VARCHAR(150) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    nombre VARCHAR(150) NOT NULL,
+    rol ENUM('GERENTE', 'CAJERO', 'ADMIN') NOT NULL DEFAULT 'CAJERO',
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_usuarios_email (email)
+);
+
+CREATE TABLE IF NOT EXISTS cortes (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    usuario_id INT NOT NULL,
+    monto_inicial DECIMAL(12,2) NOT NULL DEFAULT 0,
+    monto_final DECIMAL(12,2) NULL,
+    fecha_inicio DATETIME NOT NULL,
+    fecha_fin DATETIME NULL,
+    turno VARCHAR(30) NULL,
+    estado ENUM('ABIERTO', 'CERRADO') NOT NULL DEFAULT 'ABIERTO',
+    observaciones TEXT NULL,
+    tipo_corte ENUM('TURNO', 'FINAL') NOT NULL DEFAULT 'TURNO'
+);
+
+CREATE TABLE IF NOT EXISTS movimientos (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    corte_id INT NOT NULL,
+    tipo ENUM('INGRESO', 'EGRESO') NOT NULL,
+    descripcion VARCHAR(100) NULL,
+    monto DECIMAL(12,2) NOT NULL,
+    fecha DATETIME NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS reportes (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    corte_id INT NOT NULL,
+    archivo_pdf_url VARCHAR(500) NOT NULL,
+    archivo_excel_url VARCHAR(500) NOT NULL,
+    fecha_generado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS notificaciones (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    usuario_id INT NOT NULL,
+    asunto VARCHAR(255) NOT NULL,
+    mensaje TEXT NULL,
+    enviado TINYINT(1) NOT NULL DEFAULT 0,
+    fecha_envio TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,29 @@
+-- Totales materializados por corte (ver services/cortes/totales.py).
+-- El INSERT IGNORE rellena los cortes que ya existían; para recalcular
+-- todo usar `python totales.py reconstruir`.
+
+CREATE TABLE IF NOT EXISTS corte_totales (
+    corte_id INT NOT NULL PRIMARY KEY,
+    ventas_efectivo DECIMAL(14,2) NOT NULL DEFAULT 0,
+    ventas_tarjeta DECIMAL(14,2) NOT NULL DEFAULT 0,
+    gastos DECIMAL(14,2) NOT NULL DEFAULT 0,
+    neto DECIMAL(14,2) NOT NULL DEFAULT 0,
+    num_movimientos INT NOT NULL DEFAULT 0,
+    actualizado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO corte_totales
+    (corte_id, ventas_efectivo, ventas_tarjeta, gastos, neto, num_movimientos)
+SELECT corte_id,
+       SUM(CASE WHEN tipo = 'INGRESO' AND UPPER(COALESCE(descripcion, '')) <> 'VENTAS_TARJETA'
+                THEN monto ELSE 0 END),
+       SUM(CASE WHEN tipo = 'INGRESO' AND UPPER(COALESCE(descripcion, '')) = 'VENTAS_TARJETA'
+                THEN monto ELSE 0 END),
+       SUM(CASE WHEN tipo = 'EGRESO' THEN monto ELSE 0 END),
+       SUM(CASE WHEN tipo = 'INGRESO' THEN monto
+                WHEN tipo = 'EGRESO' THEN -monto
+                ELSE 0 END),
+       COUNT(*)
+FROM movimientos
+GROUP BY corte_id;
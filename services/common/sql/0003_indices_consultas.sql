@@ -0,0 +1,20 @@
+-- Índices para las consultas calientes (ver common/explain.py).
+
+-- Dashboard, /cortes y rangos de fecha: ORDER BY fecha_inicio DESC, id DESC
+-- y filtro por día como rango semiabierto sobre fecha_inicio.
+CREATE INDEX ix_cortes_fecha_id ON cortes (fecha_inicio, id);
+
+-- reportes: último FINAL anterior y TURNO dentro de un rango.
+CREATE INDEX ix_cortes_tipo_fecha ON cortes (tipo_corte, fecha_inicio);
+
+-- Filtro por cajero.
+CREATE INDEX ix_cortes_usuario_fecha ON cortes (usuario_id, fecha_inicio);
+
+-- Movimientos de un corte (detalle, totales, paginación por (fecha, id)).
+CREATE INDEX ix_movimientos_corte_fecha ON movimientos (corte_id, fecha, id);
+
+-- Listado y búsqueda de reportes por corte.
+CREATE INDEX ix_reportes_corte ON reportes (corte_id);
+CREATE INDEX ix_reportes_fecha ON reportes (fecha_generado);
+
+CREATE INDEX ix_notificaciones_usuario ON notificaciones (usuario_id);
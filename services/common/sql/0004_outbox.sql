@@ -0,0 +1,21 @@
+-- Outbox transaccional (ver common/outbox.py). Los servicios insertan aquí
+-- en la misma transacción que el cambio que origina el evento; el
+-- dispatcher lo entrega por HTTP al servicio destino.
+
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(60) NOT NULL,
+    payload JSON NOT NULL,
+    estado ENUM('PENDIENTE', 'ENVIADO', 'MUERTO') NOT NULL DEFAULT 'PENDIENTE',
+    intentos INT NOT NULL DEFAULT 0,
+    proximo_intento DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ultimo_error VARCHAR(500) NULL,
+    creado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    enviado DATETIME NULL
+);
+
+CREATE INDEX ix_outbox_pendientes ON outbox (estado, proximo_intento);
+
+-- notificaciones descarta entregas repetidas del mismo evento
+ALTER TABLE notificaciones ADD COLUMN clave_idempotencia VARCHAR(64) NULL;
+CREATE UNIQUE INDEX uq_notificaciones_clave ON notificaciones (clave_idempotencia);
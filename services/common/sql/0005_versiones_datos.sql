@@ -0,0 +1,12 @@
+-- Contadores de versión de datos (ver services/cortes/versiones.py): una
+-- fila por día de negocio ('cortes:YYYY-MM-DD'), que cada escritura de
+-- cortes/movimientos incrementa como última sentencia de su transacción.
+-- El dashboard usa la del día filtrado (o la suma de todas) como ETag.
+-- La fila 'cortes' de abajo es la versión global original; sigue sumando.
+
+CREATE TABLE IF NOT EXISTS versiones_datos (
+    ambito VARCHAR(40) NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT IGNORE INTO versiones_datos (ambito, version) VALUES ('cortes', 0);
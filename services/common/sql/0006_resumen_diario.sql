@@ -0,0 +1,33 @@
+-- Rollups de cortes cerrados por (día, cajero, turno) para GET /resumen
+-- (ver services/cortes/resumenes.py). El INSERT IGNORE rellena lo que ya
+-- existía; para recalcular todo usar `python resumenes.py reconstruir`.
+
+CREATE TABLE IF NOT EXISTS resumen_diario (
+    dia DATE NOT NULL,
+    usuario_id INT NOT NULL,
+    turno VARCHAR(30) NOT NULL DEFAULT '',
+    num_cortes INT NOT NULL DEFAULT 0,
+    ventas_efectivo DECIMAL(14,2) NOT NULL DEFAULT 0,
+    ventas_tarjeta DECIMAL(14,2) NOT NULL DEFAULT 0,
+    gastos DECIMAL(14,2) NOT NULL DEFAULT 0,
+    neto DECIMAL(14,2) NOT NULL DEFAULT 0,
+    num_movimientos INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, usuario_id, turno)
+);
+
+INSERT IGNORE INTO resumen_diario
+    (dia, usuario_id, turno, num_cortes, ventas_efectivo, ventas_tarjeta,
+     gastos, neto, num_movimientos)
+SELECT DATE(c.fecha_inicio),
+       c.usuario_id,
+       COALESCE(c.turno, ''),
+       COUNT(*),
+       SUM(COALESCE(t.ventas_efectivo, 0)),
+       SUM(COALESCE(t.ventas_tarjeta, 0)),
+       SUM(COALESCE(t.gastos, 0)),
+       SUM(COALESCE(t.neto, 0)),
+       SUM(COALESCE(t.num_movimientos, 0))
+FROM cortes c
+LEFT JOIN corte_totales t ON t.corte_id = c.id
+WHERE c.estado = 'CERRADO'
+GROUP BY DATE(c.fecha_inicio), c.usuario_id, COALESCE(c.turno, '');
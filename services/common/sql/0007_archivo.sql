@@ -0,0 +1,22 @@
+-- Archivo frío de cortes cerrados viejos (ver common/archivo.py).
+-- Mismas columnas que las tablas calientes, en formato comprimido: el
+-- archivador copia con INSERT ... SELECT *, así que cualquier ALTER
+-- futuro sobre cortes / movimientos / corte_totales debe repetirse aquí.
+
+CREATE TABLE IF NOT EXISTS cortes_archivo LIKE cortes;
+ALTER TABLE cortes_archivo ROW_FORMAT=COMPRESSED;
+
+CREATE TABLE IF NOT EXISTS movimientos_archivo LIKE movimientos;
+ALTER TABLE movimientos_archivo ROW_FORMAT=COMPRESSED;
+
+CREATE TABLE IF NOT EXISTS corte_totales_archivo LIKE corte_totales;
+ALTER TABLE corte_totales_archivo ROW_FORMAT=COMPRESSED;
+
+-- Todo lo archivado tiene fecha_inicio < hasta; las lecturas consultan
+-- el archivo sólo si su rango empieza antes de esa fecha.
+CREATE TABLE IF NOT EXISTS archivo_estado (
+    id TINYINT NOT NULL PRIMARY KEY,
+    hasta DATETIME NOT NULL,
+    actualizado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,22 @@
+-- Jobs de generación de reportes (ver reportes/jobs.py).
+-- `activo` vale el corte_final_id mientras el job está PENDIENTE o
+-- EN_PROCESO y NULL al terminar: el índice único deja un solo job vivo
+-- por corte (las peticiones repetidas se unen a ese job).
+
+CREATE TABLE IF NOT EXISTS reporte_jobs (
+    id CHAR(32) NOT NULL PRIMARY KEY,
+    corte_final_id INT NOT NULL,
+    estado ENUM('PENDIENTE', 'EN_PROCESO', 'LISTO', 'ERROR') NOT NULL DEFAULT 'PENDIENTE',
+    etapa VARCHAR(30) NULL,
+    progreso TINYINT NOT NULL DEFAULT 0,
+    activo INT NULL,
+    resultado JSON NULL,
+    error VARCHAR(500) NULL,
+    creado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    actualizado TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ON UPDATE CURRENT_TIMESTAMP,
+    terminado DATETIME NULL,
+    UNIQUE KEY uq_reporte_jobs_activo (activo)
+);
+
+CREATE INDEX ix_reporte_jobs_corte ON reporte_jobs (corte_final_id, creado);
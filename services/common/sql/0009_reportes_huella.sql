@@ -0,0 +1,6 @@
+-- Huella de los datos de entrada de cada reporte (ver huella_reporte en
+-- reportes/app.py): un reporte con la misma huella se reutiliza en vez
+-- de volver a generarse.
+
+ALTER TABLE reportes ADD COLUMN huella CHAR(64) NULL;
+CREATE INDEX ix_reportes_corte_huella ON reportes (corte_id, huella);
@@ -0,0 +1,7 @@
+-- Llave de cada artefacto en el almacén de reportes (ver
+-- reportes/almacen.py). Las URLs se arman con el backend actual al leer;
+-- archivo_pdf_url / archivo_excel_url quedan como respaldo para los
+-- reportes anteriores a esta migración.
+
+ALTER TABLE reportes ADD COLUMN archivo_pdf_llave VARCHAR(300) NULL;
+ALTER TABLE reportes ADD COLUMN archivo_excel_llave VARCHAR(300) NULL;
@@ -0,0 +1,4 @@
+-- Resumen del dashboard sin ?fecha=: los cortes CERRADO salen de
+-- resumen_diario y sólo los ABIERTO (pocos) se leen de cortes
+-- (ver cortes/resumenes.py totales_dashboard).
+CREATE INDEX ix_cortes_estado_usuario ON cortes (estado, usuario_id);
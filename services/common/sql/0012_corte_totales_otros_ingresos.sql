@@ -0,0 +1,29 @@
+-- INGRESO que no es VENTAS_EFECTIVO ni VENTAS_TARJETA. En corte_totales
+-- cuentan dentro de ventas_efectivo (dashboard y detalle); los reportes
+-- conservan su clasificación original y los restan (ver reportes/app.py).
+-- El archivador copia con SELECT *: misma columna y posición en el archivo.
+
+ALTER TABLE corte_totales
+    ADD COLUMN otros_ingresos DECIMAL(14,2) NOT NULL DEFAULT 0 AFTER num_movimientos;
+ALTER TABLE corte_totales_archivo
+    ADD COLUMN otros_ingresos DECIMAL(14,2) NOT NULL DEFAULT 0 AFTER num_movimientos;
+
+UPDATE corte_totales t
+JOIN (
+    SELECT corte_id, SUM(monto) AS otros_ingresos
+    FROM movimientos
+    WHERE tipo = 'INGRESO'
+      AND UPPER(COALESCE(descripcion, '')) NOT IN ('VENTAS_EFECTIVO', 'VENTAS_TARJETA')
+    GROUP BY corte_id
+) m ON m.corte_id = t.corte_id
+SET t.otros_ingresos = m.otros_ingresos;
+
+UPDATE corte_totales_archivo t
+JOIN (
+    SELECT corte_id, SUM(monto) AS otros_ingresos
+    FROM movimientos_archivo
+    WHERE tipo = 'INGRESO'
+      AND UPPER(COALESCE(descripcion, '')) NOT IN ('VENTAS_EFECTIVO', 'VENTAS_TARJETA')
+    GROUP BY corte_id
+) m ON m.corte_id = t.corte_id
+SET t.otros_ingresos = m.otros_ingresos;
@@ -0,0 +1,92 @@
+"""
+Stand-in HTTP local de reportes y notificaciones para probar el outbox.
+
+Acepta cualquier POST, lo imprime y responde 201; con --falla una fracción
+de las peticiones responde 503 (o tarda más que el timeout con --lento)
+para ver los reintentos y el dead-lettering del dispatcher. Cuenta los
+Idempotency-Key repetidos para ver las entregas duplicadas.
+
+Uso (desde services/):
+  python -m common.stub_destinos [--puerto 8099] [--falla 0.3] [--lento 0.1]
+
+y en otra terminal:
+  REPORTES_URL=http://localhost:8099/reportes \\
+  NOTIFICACIONES_URL=http://localhost:8099/notificaciones \\
+  python -m common.outbox despachar
+"""
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_vistos = set()
+_lock = threading.Lock()
+_stats = {"recibidos": 0, "fallados": 0, "duplicados": 0}
+
+
+def _crear_handler(falla, lento, espera_lento):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            largo = int(self.headers.get("Content-Length") or 0)
+            cuerpo = self.rfile.read(largo).decode("utf-8", "replace")
+            clave = self.headers.get("Idempotency-Key")
+
+            with _lock:
+                _stats["recibidos"] += 1
+                if clave in _vistos:
+                    _stats["duplicados"] += 1
+                sorteo = random.random()
+
+            if sorteo < lento:
+                time.sleep(espera_lento)
+
+            if sorteo < falla:
+                with _lock:
+                    _stats["fallados"] += 1
+                self._responder(503, {"error": "falla simulada"})
+                return
+
+            with _lock:
+                if clave:
+                    _vistos.add(clave)
+                print(f"{self.path} [{clave}] {cuerpo}  {_stats}")
+            self._responder(201, {"ok": True})
+
+        def _responder(self, status, body):
+            datos = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main(argv):
+    def opcion(nombre, defecto):
+        return type(defecto)(argv[argv.index(nombre) + 1]) if nombre in argv else defecto
+
+    puerto = opcion("--puerto", 8099)
+    handler = _crear_handler(
+        falla=opcion("--falla", 0.0),
+        lento=opcion("--lento", 0.0),
+        espera_lento=opcion("--espera-lento", 60.0),
+    )
+    servidor = ThreadingHTTPServer(("0.0.0.0", puerto), handler)
+    print(f"stub de destinos escuchando en :{puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(_stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,8 +1,9 @@
 import os
-from flask import Flask, request, jsonify
-import pymysql
-from pymysql.cursors import DictCursor
-import requests 
+import sys
+import base64
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from flask import Flask, Response, request, jsonify, stream_with_context
 
 # Cargar .env solo en local
 try:
@@ -11,20 +12,115 @@ try:
 except ImportError:
     pass
 
+# Código compartido entre servicios (services/common)
+_SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SERVICES_DIR not in sys.path:
+    sys.path.append(_SERVICES_DIR)
+
+from common.db import get_pool
+from common import archivo, outbox
+from common.agregados import a_pesos, centavos
+from common.flujos import filas_mezcladas, filas_sin_buffer
+
+import cache
+import cajeros
+import exportar
+import resumenes
+import totales
+import versiones
+
 app = Flask(__name__)
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", "localhost"),
-    "user": os.getenv("DB_USER", "root"),
-    "password": os.getenv("DB_PASS", ""),
-    "database": os.getenv("DB_NAME", "corte_caja"),
-    "cursorclass": DictCursor
-}
+db = get_pool()
+
+# Cache de /obtener-cortes (ver cache.py)
+cache_dashboard = cache.desde_env()
 
-REPORTES_URL = os.getenv("REPORTES_URL")
 
-def get_connection():
-    return pymysql.connect(**DB_CONFIG)
+# Búsqueda de cajeros por nombre (ver cajeros.py)
+indice_cajeros = cajeros.IndiceCajeros(db)
+
+PAGE_LIMIT_DEFAULT = int(os.getenv("PAGE_LIMIT_DEFAULT", "50"))
+PAGE_LIMIT_MAX = int(os.getenv("PAGE_LIMIT_MAX", "500"))
+
+
+# ==========================================
+# Paginación por cursor (keyset sobre (fecha, id))
+# ==========================================
+class ParametroInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(fecha, row_id):
+    raw = f"{fecha.strftime('%Y-%m-%dT%H:%M:%S.%f')}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        fecha_str, id_str = raw.split("|", 1)
+        return datetime.strptime(fecha_str, "%Y-%m-%dT%H:%M:%S.%f"), int(id_str)
+    except Exception:
+        raise ParametroInvalido("cursor 'after' inválido")
+
+
+def leer_paginacion():
+    """
+    Lee ?limit= y ?after= del request.
+    Regresa (limit, (fecha, id) | None).
+    """
+    try:
+        limit = int(request.args.get("limit", PAGE_LIMIT_DEFAULT))
+    except ValueError:
+        raise ParametroInvalido("limit debe ser un entero")
+    limit = max(1, min(limit, PAGE_LIMIT_MAX))
+
+    after = request.args.get("after")
+    return limit, (decodificar_cursor(after) if after else None)
+
+
+def filtro_keyset(col_fecha, col_id, after, params):
+    """
+    Condición "viene después de `after`" para un orden (fecha DESC, id DESC).
+    Se escribe expandida para que MySQL use el índice sobre (fecha, id).
+    """
+    if not after:
+        return ""
+    fecha, row_id = after
+    params.extend([fecha, fecha, row_id])
+    return f" AND ({col_fecha} < %s OR ({col_fecha} = %s AND {col_id} < %s))"
+
+
+def cortar_pagina(rows, limit, campo_fecha):
+    """
+    Las consultas piden limit + 1 filas; si llegó la extra hay otra página.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    ultimo = rows[-1]
+    return rows, codificar_cursor(ultimo[campo_fecha], ultimo["id"])
+
+
+def orden_pagina(col_fecha, col_id):
+    return f" ORDER BY {col_fecha} DESC, {col_id} DESC LIMIT %s"
+
+
+def pagina_de_fuentes(cursor, plantilla, params, fuentes, col_fecha, col_id, limit):
+    """
+    Corre `plantilla` (SELECT ... WHERE ..., con {cortes}/{movimientos}/
+    {totales}) en cada fuente con ORDER BY (fecha DESC, id DESC) LIMIT
+    limit + 1. Con archivo, cada parte usa su índice y MySQL sólo mezcla
+    las 2 * (limit + 1) filas resultantes.
+    """
+    sql, params = archivo.union_all(plantilla + orden_pagina(col_fecha, col_id), fuentes, [*params, limit + 1])
+    if len(fuentes) > 1:
+        fecha, row_id = col_fecha.split(".")[-1], col_id.split(".")[-1]
+        sql += f" ORDER BY {fecha} DESC, {row_id} DESC LIMIT %s"
+        params.append(limit + 1)
+    cursor.execute(sql, params)
+    return cursor.fetchall()
 
 
 # ==========================================
@@ -32,7 +128,13 @@ def get_connection():
 # ==========================================
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"status": "ok", "service": "cortes"}), 200
+    return jsonify({
+        "status": "ok",
+        "service": "cortes",
+        "db_pool": db.stats(),
+        "cache_dashboard": cache_dashboard.stats(),
+        "indice_cajeros": indice_cajeros.stats(),
+    }), 200
 
 
 # ==========================================
@@ -43,30 +145,42 @@ def listar_cortes():
     """
     Lista cortes de manera simple. No es el que usa el dashboard principal,
     pero lo dejamos disponible.
+    Paginado por cursor:
+      ?limit=N         (por defecto PAGE_LIMIT_DEFAULT)
+      ?after=<cursor>  (el next_cursor de la página anterior)
+    Respuesta: { "items": [...], "next_cursor": "..." | null }
     """
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT c.id,
-                       c.usuario_id,
-                       u.nombre AS cajero,
-                       c.monto_inicial,
-                       c.monto_final,
-                       c.fecha_inicio,
-                       c.fecha_fin,
-                       c.turno,
-                       c.estado,
-                       c.observaciones
-                FROM cortes c
-                JOIN usuarios u ON u.id = c.usuario_id
-                ORDER BY c.fecha_inicio DESC
-                """
-            )
-            rows = cursor.fetchall()
-        conn.close()
-        return jsonify(rows), 200
+        limit, after = leer_paginacion()
+    except ParametroInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        params = []
+        query = """
+            SELECT c.id,
+                   c.usuario_id,
+                   u.nombre AS cajero,
+                   c.monto_inicial,
+                   c.monto_final,
+                   c.fecha_inicio,
+                   c.fecha_fin,
+                   c.turno,
+                   c.estado,
+                   c.observaciones
+            FROM {cortes} c
+            JOIN usuarios u ON u.id = c.usuario_id
+            WHERE 1=1
+        """
+        query += filtro_keyset("c.fecha_inicio", "c.id", after, params)
+
+        with db.conexion() as conn, conn.cursor() as cursor:
+            # Sin filtro de fecha: el archivo entra si existe
+            fuentes = archivo.fuentes(cursor, None)
+            rows = pagina_de_fuentes(cursor, query, params, fuentes, "c.fecha_inicio", "c.id", limit)
+
+        rows, next_cursor = cortar_pagina(rows, limit, "fecha_inicio")
+        return jsonify({"items": rows, "next_cursor": next_cursor}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -89,8 +203,7 @@ def abrir_corte():
         return jsonify({"error": "usuario_id es obligatorio"}), 400
 
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
+        with db.transaccion() as conn, conn.cursor() as cursor:
             cursor.execute(
                 """
                 INSERT INTO cortes (usuario_id, monto_inicial, fecha_inicio, estado)
@@ -98,7 +211,6 @@ def abrir_corte():
                 """,
                 (usuario_id, monto_inicial)
             )
-            conn.commit()
             corte_id = cursor.lastrowid
 
             cursor.execute(
@@ -111,7 +223,8 @@ def abrir_corte():
                 (corte_id,)
             )
             corte = cursor.fetchone()
-        conn.close()
+            versiones.incrementar(cursor, corte["fecha_inicio"])
+        cache_dashboard.invalidar(corte["fecha_inicio"])
         return jsonify(corte), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -133,8 +246,13 @@ def cerrar_corte(corte_id):
         return jsonify({"error": "monto_final es obligatorio"}), 400
 
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
+        with db.transaccion() as conn, conn.cursor() as cursor:
+            corte = resumenes.leer_cortes(cursor, [corte_id], "FOR UPDATE").get(corte_id)
+            if not corte and corte_archivado(cursor, corte_id):
+                return corte_solo_lectura()
+            if not corte:
+                return jsonify({"error": "Corte no encontrado"}), 404
+
             cursor.execute(
                 """
                 UPDATE cortes
@@ -145,8 +263,11 @@ def cerrar_corte(corte_id):
                 """,
                 (monto_final, corte_id)
             )
-            conn.commit()
-        conn.close()
+            # Al cerrarse entra completo al rollup; si ya estaba cerrado no cambia
+            if corte["estado"] != "CERRADO":
+                resumenes.sumar(cursor, [corte_id])
+            versiones.incrementar(cursor, corte["fecha_inicio"])
+        cache_dashboard.invalidar(corte["fecha_inicio"])
         return jsonify({"message": "Corte cerrado correctamente"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -175,10 +296,23 @@ def registrar_movimiento():
 
     if not corte_id or not tipo or monto is None:
         return jsonify({"error": "corte_id, tipo y monto son obligatorios"}), 400
+    # Los cortes leídos vienen por id entero: "5" también debe encontrarlo
+    try:
+        corte_id = int(corte_id)
+    except (TypeError, ValueError):
+        corte_id = 0
+    if isinstance(data.get("corte_id"), bool) or corte_id <= 0:
+        return jsonify({"error": "corte_id inválido"}), 400
 
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
+        with db.transaccion() as conn, conn.cursor() as cursor:
+            cortes = resumenes.leer_cortes(cursor, [corte_id])
+            corte = cortes.get(corte_id)
+            if not corte and corte_archivado(cursor, corte_id):
+                return corte_solo_lectura()
+            if not corte:
+                return jsonify({"error": "Corte no encontrado"}), 404
+
             cursor.execute(
                 """
                 INSERT INTO movimientos (corte_id, tipo, descripcion, monto, fecha)
@@ -186,37 +320,362 @@ def registrar_movimiento():
                 """,
                 (corte_id, tipo, descripcion, monto)
             )
-            conn.commit()
-        conn.close()
+            nuevos = [(tipo, descripcion, monto)]
+            totales.aplicar_movimientos(cursor, corte_id, nuevos)
+            resumenes.sumar_movimientos(cursor, cortes, {corte_id: nuevos})
+            versiones.incrementar(cursor, corte["fecha_inicio"])
+        cache_dashboard.invalidar(corte["fecha_inicio"])
         return jsonify({"message": "Movimiento registrado"}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+TIPOS_MOVIMIENTO = ("INGRESO", "EGRESO")
+LOTE_MAX = int(os.getenv("LOTE_MOVIMIENTOS_MAX", "5000"))
+
+
+def validar_movimiento(item):
+    """
+    Valida un movimiento del lote.
+    Regresa ((corte_id, tipo, descripcion, monto), None) o (None, "error").
+    """
+    if not isinstance(item, dict):
+        return None, "cada movimiento debe ser un objeto"
+
+    corte_id = item.get("corte_id")
+    tipo = item.get("tipo")
+    descripcion = item.get("descripcion")
+    monto = item.get("monto")
+
+    if not isinstance(corte_id, int) or isinstance(corte_id, bool) or corte_id <= 0:
+        return None, "corte_id inválido"
+    if tipo not in TIPOS_MOVIMIENTO:
+        return None, "tipo debe ser INGRESO o EGRESO"
+    if descripcion is not None and (not isinstance(descripcion, str) or len(descripcion) > 100):
+        return None, "descripcion inválida"
+    if isinstance(monto, bool) or not isinstance(monto, (int, float, str)):
+        return None, "monto inválido"
+    try:
+        monto = Decimal(str(monto))
+    except InvalidOperation:
+        return None, "monto inválido"
+    if not monto.is_finite():
+        return None, "monto inválido"
+
+    return (corte_id, tipo, descripcion, monto), None
+
+
+@app.route("/movimientos/lote", methods=["POST"])
+def registrar_movimientos_lote():
+    """
+    Registra muchos movimientos (de uno o varios cortes) en un solo viaje.
+    Body:
+    {
+      "movimientos": [
+        {"corte_id": 1, "tipo": "INGRESO", "descripcion": "VENTAS_TARJETA", "monto": 150.50},
+        ...
+      ],
+      "todo_o_nada": false   // opcional: si hay algún error no se inserta nada
+    }
+    Todo se valida antes de escribir; los válidos se insertan con un
+    INSERT multi-fila y un solo commit. Respuesta:
+    {
+      "insertados": N,
+      "errores": [{"indice": 3, "error": "..."}]
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get("movimientos")
+    todo_o_nada = bool(data.get("todo_o_nada"))
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "movimientos debe ser una lista no vacía"}), 400
+    if len(items) > LOTE_MAX:
+        return jsonify({"error": f"máximo {LOTE_MAX} movimientos por lote"}), 400
+
+    validos = []
+    errores = []
+    for i, item in enumerate(items):
+        mov, error = validar_movimiento(item)
+        if error:
+            errores.append({"indice": i, "error": error})
+        else:
+            validos.append((i, mov))
+
+    try:
+        with db.transaccion() as conn, conn.cursor() as cursor:
+            # Cortes existentes (bloqueados hasta el commit, ver resumenes.py)
+            corte_ids = sorted({mov[0] for _, mov in validos})
+            existentes = resumenes.leer_cortes(cursor, corte_ids)
+
+            por_insertar = []
+            for i, mov in validos:
+                if mov[0] in existentes:
+                    por_insertar.append(mov)
+                else:
+                    errores.append({"indice": i, "error": "corte no encontrado"})
+            errores.sort(key=lambda e: e["indice"])
+
+            if errores and todo_o_nada:
+                return jsonify({"insertados": 0, "errores": errores}), 400
+
+            if por_insertar:
+                cursor.execute("SELECT NOW() AS ahora")
+                ahora = cursor.fetchone()["ahora"]
+
+                # Sin NOW() en VALUES para que executemany arme un INSERT multi-fila
+                cursor.executemany(
+                    """
+                    INSERT INTO movimientos (corte_id, tipo, descripcion, monto, fecha)
+                    VALUES (%s, %s, %s, %s, %s)
+                    """,
+                    [(*mov, ahora) for mov in por_insertar]
+                )
+
+                por_corte = {}
+                for corte_id, tipo, descripcion, monto in por_insertar:
+                    por_corte.setdefault(corte_id, []).append((tipo, descripcion, monto))
+                totales.aplicar_lote(cursor, por_corte)
+                resumenes.sumar_movimientos(cursor, existentes, por_corte)
+                fechas = [existentes[corte_id]["fecha_inicio"] for corte_id in por_corte]
+                versiones.incrementar(cursor, *fechas)
+
+        if por_insertar:
+            cache_dashboard.invalidar(*fechas)
+        status = 201 if por_insertar else 400
+        return jsonify({"insertados": len(por_insertar), "errores": errores}), status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+SQL_MOVIMIENTOS_PAGINA = """
+    SELECT id, tipo, descripcion, monto, fecha
+    FROM {movimientos}
+    WHERE corte_id = %s
+"""
+
+
 @app.route("/movimientos/<int:corte_id>", methods=["GET"])
 def listar_movimientos(corte_id):
     """
     Lista movimientos de un corte específico.
+    Paginado por cursor sobre (fecha, id), igual que /cortes.
     """
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT id, tipo, descripcion, monto, fecha
-                FROM movimientos
-                WHERE corte_id = %s
-                ORDER BY fecha DESC
-                """,
-                (corte_id,)
-            )
-            rows = cursor.fetchall()
-        conn.close()
-        return jsonify(rows), 200
+        limit, after = leer_paginacion()
+    except ParametroInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        params = [corte_id]
+        query = SQL_MOVIMIENTOS_PAGINA + filtro_keyset("fecha", "id", after, params)
+
+        with db.conexion() as conn, conn.cursor() as cursor:
+            rows = pagina_de_fuentes(cursor, query, params, [archivo.CALIENTE], "fecha", "id", limit)
+            # Página vacía: puede ser un corte archivado
+            if not rows and corte_archivado(cursor, corte_id):
+                rows = pagina_de_fuentes(cursor, query, params, [archivo.ARCHIVO], "fecha", "id", limit)
+
+        rows, next_cursor = cortar_pagina(rows, limit, "fecha")
+        return jsonify({"items": rows, "next_cursor": next_cursor}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def corte_archivado(cursor, corte_id):
+    if archivo.frontera(cursor) is None:
+        return False
+    cursor.execute("SELECT 1 FROM cortes_archivo WHERE id = %s", (corte_id,))
+    return cursor.fetchone() is not None
+
+
+def corte_solo_lectura():
+    """Escritura sobre un corte archivado: existe, pero no se modifica."""
+    return jsonify({"error": "El corte está archivado (sólo lectura)"}), 409
+
+
+# ==========================================
+# GET condicionales (ETag / If-None-Match)
+# ==========================================
+def no_modificado(etag):
+    resp = app.response_class(status=304)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def con_etag(resp, etag):
+    # no-cache: el navegador guarda la respuesta pero revalida siempre con If-None-Match
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+# ==========================================
+# Filtro por nombre de cajero
+# ==========================================
+def filtro_cajero(texto, params, alias="c"):
+    """
+    Resuelve ?cajero=texto a usuario_ids con el índice en memoria y regresa
+    la condición `<alias>.usuario_id IN (...)` (agrega los ids a `params`).
+    Sin coincidencias regresa una condición imposible.
+    """
+    ids = indice_cajeros.buscar(texto)
+    if not ids:
+        return " AND 1=0"
+    return condicion_usuarios(ids, params, alias)
+
+
+def condicion_usuarios(ids, params, alias="c"):
+    params.extend(ids)
+    return f" AND {alias}.usuario_id IN ({','.join(['%s'] * len(ids))})"
+
+
+# ==========================================
+# EXPORTACIÓN EN STREAMING (contabilidad)
+# ==========================================
+def leer_filtros_export(col_fecha):
+    """
+    Filtros comunes de /cortes/export y /movimientos/export:
+      ?formato=csv|ndjson   (por defecto csv)
+      ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD   (ambos inclusive)
+      ?usuario_id=N  o  ?cajero=texto
+    Regresa (formato, sql_where, params, desde | None).
+    """
+    formato = (request.args.get("formato") or "csv").lower()
+    if formato not in exportar.FORMATOS:
+        raise ParametroInvalido("formato debe ser csv o ndjson")
+
+    where = ""
+    params = []
+    desde = None
+    try:
+        if request.args.get("desde"):
+            desde = datetime.strptime(request.args["desde"], "%Y-%m-%d")
+            where += f" AND {col_fecha} >= %s"
+            params.append(desde)
+        if request.args.get("hasta"):
+            where += f" AND {col_fecha} < %s"
+            params.append(datetime.strptime(request.args["hasta"], "%Y-%m-%d") + timedelta(days=1))
+    except ValueError:
+        raise ParametroInvalido("desde/hasta deben tener formato YYYY-MM-DD")
+
+    if request.args.get("usuario_id"):
+        try:
+            params.append(int(request.args["usuario_id"]))
+        except ValueError:
+            raise ParametroInvalido("usuario_id debe ser un entero")
+        where += " AND c.usuario_id = %s"
+    elif request.args.get("cajero"):
+        where += filtro_cajero(request.args["cajero"], params)
+
+    return formato, where, params, desde
+
+
+def fuentes_de_rango(desde):
+    with db.conexion() as conn, conn.cursor() as cursor:
+        return archivo.fuentes(cursor, desde)
+
+
+def respuesta_export(nombre, formato, plantilla, params, columnas, fuentes, orden):
+    """
+    `plantilla` se corre en cada fuente (caliente / archivo), cada una en
+    su propio cursor sin buffer, y los flujos se mezclan por `orden`.
+    """
+    flujos = [filas_sin_buffer(db, plantilla.format(**f), params) for f in fuentes]
+    if len(flujos) == 1:
+        filas = flujos[0]
+    else:
+        filas = filas_mezcladas(flujos, lambda row: tuple(row[c] for c in orden))
+    return Response(
+        stream_with_context(exportar.serializar(formato, filas, columnas)),
+        mimetype=exportar.FORMATOS[formato],
+        headers={
+            "Content-Disposition": f'attachment; filename="{nombre}.{formato}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+COLUMNAS_EXPORT_CORTES = [
+    "id", "usuario_id", "cajero", "tipo_corte", "turno", "estado",
+    "fecha_inicio", "fecha_fin", "monto_inicial", "monto_final",
+    "ventas_efectivo", "ventas_tarjeta", "gastos", "observaciones",
+]
+
+COLUMNAS_EXPORT_MOVIMIENTOS = [
+    "id", "corte_id", "usuario_id", "cajero", "tipo", "descripcion", "monto", "fecha",
+]
+
+
+@app.route("/cortes/export", methods=["GET"])
+def exportar_cortes():
+    """
+    Exporta cortes (con sus totales) en CSV o NDJSON, en streaming.
+    Pensado para contabilidad; la memoria no depende del número de filas.
+    En Lambda, awsgi/API Gateway bufferean la respuesta completa, así que
+    las exportaciones grandes deben pedirse al servicio desplegado en
+    contenedor / local.
+    """
+    try:
+        formato, where, params, desde = leer_filtros_export("c.fecha_inicio")
+        fuentes = fuentes_de_rango(desde)
+    except ParametroInvalido as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    sql = f"""
+        SELECT c.id, c.usuario_id, u.nombre AS cajero, c.tipo_corte, c.turno, c.estado,
+               c.fecha_inicio, c.fecha_fin, c.monto_inicial, c.monto_final,
+               t.ventas_efectivo, t.ventas_tarjeta, t.gastos, c.observaciones
+        FROM {{cortes}} c
+        JOIN usuarios u ON u.id = c.usuario_id
+        LEFT JOIN {{totales}} t ON t.corte_id = c.id
+        WHERE 1=1 {where}
+        ORDER BY c.fecha_inicio, c.id
+    """
+    return respuesta_export("cortes", formato, sql, params, COLUMNAS_EXPORT_CORTES,
+                            fuentes, ("fecha_inicio", "id"))
+
+
+@app.route("/movimientos/export", methods=["GET"])
+def exportar_movimientos():
+    """
+    Exporta movimientos en CSV o NDJSON, en streaming.
+    desde/hasta filtran por la fecha del movimiento.
+    """
+    try:
+        formato, where, params, desde = leer_filtros_export("m.fecha")
+        fuentes = fuentes_de_rango(desde)
+    except ParametroInvalido as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    sql = f"""
+        SELECT m.id, m.corte_id, c.usuario_id, u.nombre AS cajero,
+               m.tipo, m.descripcion, m.monto, m.fecha
+        FROM {{movimientos}} m
+        JOIN {{cortes}} c ON c.id = m.corte_id
+        JOIN usuarios u ON u.id = c.usuario_id
+        WHERE 1=1 {where}
+        ORDER BY m.fecha, m.id
+    """
+    return respuesta_export("movimientos", formato, sql, params, COLUMNAS_EXPORT_MOVIMIENTOS,
+                            fuentes, ("fecha", "id"))
+
+
+# ==========================================
+# Disparo del reporte de un corte FINAL
+# ==========================================
+# El evento queda en el outbox dentro de la transacción del corte; el
+# dispatcher (common/outbox.py, Lambda programada) lo entrega a reportes
+# con reintentos. No se adelanta una ronda en un hilo: en Lambda ese hilo
+# no corre hasta que otra invocación descongela el contenedor. La latencia
+# del reporte es la del periodo del dispatcher programado.
+
+
 # ==========================================
 # ENDPOINT ESPECIAL PARA corte.html: /guardar-corte
 # ==========================================
@@ -251,93 +710,78 @@ def guardar_corte_completo():
     if not usuario_id:
         return jsonify({"message": "usuario_id es obligatorio"}), 400
 
-    neto = fondo_inicial + ventas_efectivo + ventas_tarjeta - gastos
+    neto = a_pesos(centavos(fondo_inicial) + centavos(ventas_efectivo)
+                   + centavos(ventas_tarjeta) - centavos(gastos))
+
+    movimientos = [
+        (tipo, desc, monto)
+        for tipo, desc, monto in (
+            ("INGRESO", "VENTAS_EFECTIVO", ventas_efectivo),
+            ("INGRESO", "VENTAS_TARJETA", ventas_tarjeta),
+            ("EGRESO", "GASTOS", gastos),
+        )
+        if monto > 0
+    ]
 
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            # 1) Crear el corte como CERRADO
+        # Todo el guardado es una sola transacción
+        with db.transaccion() as conn, conn.cursor() as cursor:
+            # 1) Cajero + hora del servidor (la misma para corte y movimientos)
+            cursor.execute(
+                "SELECT nombre, NOW() AS ahora FROM usuarios WHERE id = %s",
+                (usuario_id,)
+            )
+            usuario = cursor.fetchone()
+            if not usuario:
+                return jsonify({"message": "Usuario no encontrado"}), 404
+            ahora = usuario["ahora"]
+
+            # 2) Crear el corte como CERRADO
             cursor.execute(
                 """
                 INSERT INTO cortes
                     (usuario_id, monto_inicial, monto_final,
                      fecha_inicio, fecha_fin, turno, estado, observaciones, tipo_corte)
-                VALUES (%s, %s, %s, NOW(), NOW(), %s, 'CERRADO', %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s, 'CERRADO', %s, %s)
                 """,
-                (usuario_id, fondo_inicial, neto, turno, observaciones, tipo_corte)
+                (usuario_id, fondo_inicial, neto, ahora, ahora, turno, observaciones, tipo_corte)
             )
-            conn.commit()
             corte_id = cursor.lastrowid
 
-            # 2) Registrar movimientos agregados
-            if ventas_efectivo > 0:
-                cursor.execute(
-                    """
-                    INSERT INTO movimientos (corte_id, tipo, descripcion, monto, fecha)
-                    VALUES (%s, 'INGRESO', 'VENTAS_EFECTIVO', %s, NOW())
-                    """,
-                    (corte_id, ventas_efectivo)
-                )
-
-            if ventas_tarjeta > 0:
-                cursor.execute(
+            # 3) Movimientos agregados en un solo INSERT multi-fila
+            if movimientos:
+                cursor.executemany(
                     """
                     INSERT INTO movimientos (corte_id, tipo, descripcion, monto, fecha)
-                    VALUES (%s, 'INGRESO', 'VENTAS_TARJETA', %s, NOW())
+                    VALUES (%s, %s, %s, %s, %s)
                     """,
-                    (corte_id, ventas_tarjeta)
+                    [(corte_id, tipo, desc, monto, ahora) for tipo, desc, monto in movimientos]
                 )
 
-            if gastos > 0:
-                cursor.execute(
-                    """
-                    INSERT INTO movimientos (corte_id, tipo, descripcion, monto, fecha)
-                    VALUES (%s, 'EGRESO', 'GASTOS', %s, NOW())
-                    """,
-                    (corte_id, gastos)
-                )
+            # 4) Totales materializados y rollup del día
+            totales.aplicar_movimientos(cursor, corte_id, movimientos)
+            resumenes.sumar_corte_nuevo(
+                cursor, {"fecha_inicio": ahora, "usuario_id": usuario_id, "turno": turno}, movimientos
+            )
 
-            conn.commit()
+            # 5) SI ES CORTE FINAL → evento para generar el reporte
+            if tipo_corte == "FINAL":
+                outbox.encolar(cursor, outbox.EVENTO_GENERAR_REPORTE,
+                               {"corte_final_id": corte_id, "esperar": True})
 
-            cursor.execute(
-                """
-                SELECT c.id, c.usuario_id, u.nombre AS cajero,
-                       c.monto_inicial, c.monto_final,
-                       c.fecha_inicio, c.fecha_fin, c.turno, c.estado,
-                       c.observaciones
-                FROM cortes c
-                JOIN usuarios u ON u.id = c.usuario_id
-                WHERE c.id = %s
-                """,
-                (corte_id,)
-            )
-            corte = cursor.fetchone()
+            versiones.incrementar(cursor, ahora)
 
-            # ==============================
-            # SI ES CORTE FINAL → generar reporte
-            # ==============================
-            if tipo_corte == "FINAL" and REPORTES_URL:
-                try:
-                    # Llamar al microservicio de reportes (Lambda+API Gateway)
-                    resp = requests.post(
-                        REPORTES_URL,
-                        json={"corte_final_id": corte_id},
-                        timeout=5
-                    )
-                    print("Llamada a REPORTES_URL status:", resp.status_code, resp.text)
-                except Exception as e:
-                    # No rompemos el flujo principal si falla el reporte
-                    print("Error llamando a microservicio de reportes:", e)
-        conn.close()
+        cache_dashboard.invalidar(ahora)
 
+        # La respuesta sale de lo que acabamos de escribir, sin releer el corte
         return jsonify({
-            "id": corte["id"],
-            "cajero": corte["cajero"],
-            "fondo_inicial": corte["monto_inicial"],
-            "monto_final": corte["monto_final"],
-            "turno": corte["turno"],
-            "estado": corte["estado"],
-            "observaciones": corte["observaciones"],
+            "id": corte_id,
+            "cajero": usuario["nombre"],
+            "fondo_inicial": fondo_inicial,
+            "monto_final": neto,
+            "turno": turno,
+            "estado": "CERRADO",
+            "observaciones": observaciones,
         }), 201
 
     except Exception as e:
@@ -347,6 +791,42 @@ def guardar_corte_completo():
 # ==========================================
 # ENDPOINT PARA DASHBOARD: /obtener-cortes
 # ==========================================
+# Plantillas con {cortes}/{totales} (common/archivo.py); terminan en el
+# WHERE para que el handler agregue los filtros. common/explain.py las
+# revisa tal cual.
+SQL_DASHBOARD_RESUMEN = """
+    SELECT COUNT(*) AS total_cortes,
+           SUM(t.ventas_efectivo + t.ventas_tarjeta) AS total_ingresos,
+           SUM(t.gastos) AS total_egresos
+    FROM {cortes} c
+    JOIN usuarios u ON u.id = c.usuario_id
+    LEFT JOIN {totales} t ON t.corte_id = c.id
+    WHERE 1=1
+"""
+
+SQL_DASHBOARD_PAGINA = """
+    SELECT c.id,
+           c.usuario_id,
+           u.nombre AS cajero,
+           c.monto_inicial,
+           c.monto_final,
+           c.fecha_inicio,
+           c.fecha_fin,
+           c.turno,
+           c.estado,
+           c.observaciones,
+           t.ventas_efectivo + t.ventas_tarjeta AS total_ingresos,
+           t.gastos AS total_egresos
+    FROM {cortes} c
+    JOIN usuarios u ON u.id = c.usuario_id
+    LEFT JOIN {totales} t ON t.corte_id = c.id
+    WHERE 1=1
+"""
+
+# ?fecha=: rango semiabierto [día, día + 1) para que use el índice de fecha_inicio
+FILTRO_DIA = " AND c.fecha_inicio >= %s AND c.fecha_inicio < %s"
+
+
 @app.route("/obtener-cortes", methods=["GET"])
 def obtener_cortes_dashboard():
     """
@@ -355,7 +835,8 @@ def obtener_cortes_dashboard():
       "summary": {
         "total_ventas": ...,
         "total_gastos": ...,
-        "neto_total": ...
+        "neto_total": ...,
+        "total_cortes": ...
       },
       "history": [
         {
@@ -368,92 +849,98 @@ def obtener_cortes_dashboard():
           "gastos": ...,
           "monto_final": ...
         }
-      ]
+      ],
+      "next_cursor": "..." | null
     }
     Soporta filtros opcionales:
       ?fecha=YYYY-MM-DD
       ?cajero=texto
+    y paginación por cursor:
+      ?limit=N
+      ?after=<next_cursor>
+
+    "summary" se calcula en SQL sobre TODOS los cortes que cumplen el filtro,
+    no sólo sobre la página devuelta en "history".
     """
     fecha = request.args.get("fecha")
     cajero_filtro = request.args.get("cajero")
 
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            # 1) Traer cortes
-            query = """
-                SELECT c.id,
-                       c.usuario_id,
-                       u.nombre AS cajero,
-                       c.monto_inicial,
-                       c.monto_final,
-                       c.fecha_inicio,
-                       c.fecha_fin,
-                       c.turno,
-                       c.estado,
-                       c.observaciones
-                FROM cortes c
-                JOIN usuarios u ON u.id = c.usuario_id
-                WHERE 1=1
-            """
-            params = []
-
-            if fecha:
-                query += " AND DATE(c.fecha_inicio) = %s"
-                params.append(fecha)
-
-            if cajero_filtro:
-                query += " AND u.nombre LIKE %s"
-                params.append(f"%{cajero_filtro}%")
-
-            query += " ORDER BY c.fecha_inicio DESC"
-
-            cursor.execute(query, params)
-            cortes = cursor.fetchall()
-
-            if not cortes:
-                conn.close()
-                return jsonify({
-                    "summary": {
-                        "total_ventas": 0,
-                        "total_gastos": 0,
-                        "neto_total": 0
-                    },
-                    "history": []
-                }), 200
-
-            corte_ids = [c["id"] for c in cortes]
-
-            # 2) Traer agregados de movimientos
-            format_strings = ",".join(["%s"] * len(corte_ids))
-            cursor.execute(
-                f"""
-                SELECT corte_id,
-                       SUM(CASE WHEN tipo = 'INGRESO' THEN monto ELSE 0 END) AS total_ingresos,
-                       SUM(CASE WHEN tipo = 'EGRESO' THEN monto ELSE 0 END) AS total_egresos
-                FROM movimientos
-                WHERE corte_id IN ({format_strings})
-                GROUP BY corte_id
-                """,
-                corte_ids
-            )
-            mov_rows = cursor.fetchall()
+        limit, after = leer_paginacion()
+    except ParametroInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    filtros = ""
+    filtro_params = []
+    desde = None
+
+    if fecha:
+        try:
+            dia = datetime.strptime(fecha, "%Y-%m-%d")
+        except ValueError:
+            return jsonify({"error": "fecha debe tener formato YYYY-MM-DD"}), 400
+        fecha = dia.strftime("%Y-%m-%d")
+        desde = dia
+        filtros += FILTRO_DIA
+        filtro_params.extend([dia, dia + timedelta(days=1)])
+
+    try:
+        if cajero_filtro:
+            filtros += filtro_cajero(cajero_filtro, filtro_params)
+
+        with db.conexion() as conn, conn.cursor() as cursor:
+            # 0) Si el cliente ya tiene esta versión de los datos, 304 sin más consultas
+            version = versiones.leer(cursor, fecha)
+            etag = versiones.etag(version, fecha)
+            if request.if_none_match.contains(etag):
+                return no_modificado(etag)
+
+            # Cache de respuestas por (fecha, cajero, página), válidas sólo en su versión
+            clave_cache = cache_dashboard.clave(fecha, cajero_filtro, limit, request.args.get("after"))
+            cacheado = cache_dashboard.obtener(clave_cache, version)
+            if cacheado is not None:
+                return con_etag(app.response_class(cacheado, mimetype="application/json"), etag), 200
+            generacion = cache_dashboard.generacion(fecha)
+
+            # Días anteriores a la frontera del archivo también se leen de ahí
+            fuentes = archivo.fuentes(cursor, desde)
+
+            # 1) Totales del filtro completo (independientes de la página).
+            #    Sin fecha, de los rollups en vez de recorrer todos los cortes.
+            if not fecha:
+                params_cajero = []
+                filtro_r = filtro_c = ""
+                if cajero_filtro:
+                    filtro_r = filtro_cajero(cajero_filtro, params_cajero, "r")
+                    filtro_c = filtro_cajero(cajero_filtro, [])
+                resumen = resumenes.totales_dashboard(cursor, filtro_r, filtro_c, params_cajero)
+            else:
+                sql_resumen, params_resumen = archivo.union_all(
+                    SQL_DASHBOARD_RESUMEN + filtros, fuentes, filtro_params
+                )
+                cursor.execute(
+                    f"""
+                    SELECT SUM(total_cortes) AS total_cortes,
+                           SUM(total_ingresos) AS total_ingresos,
+                           SUM(total_egresos) AS total_egresos
+                    FROM ({sql_resumen}) r
+                    """,
+                    params_resumen
+                )
+                resumen = cursor.fetchone() or {}
 
-        conn.close()
+            # 2) Página de cortes con sus totales materializados
+            params = list(filtro_params)
+            query = SQL_DASHBOARD_PAGINA + filtros + filtro_keyset("c.fecha_inicio", "c.id", after, params)
 
-        agregados = {row["corte_id"]: row for row in mov_rows}
+            rows = pagina_de_fuentes(cursor, query, params, fuentes, "c.fecha_inicio", "c.id", limit)
+            cortes, next_cursor = cortar_pagina(rows, limit, "fecha_inicio")
 
         history = []
-        total_ventas = 0
-        total_gastos = 0
 
         for c in cortes:
-            agg = agregados.get(c["id"], {})
-            ventas = float(agg.get("total_ingresos") or 0)
-            gastos = float(agg.get("total_egresos") or 0)
-
-            total_ventas += ventas
-            total_gastos += gastos
+            ventas = a_pesos(centavos(c["total_ingresos"]))
+            gastos = a_pesos(centavos(c["total_egresos"]))
 
             fecha_dt = c["fecha_inicio"]
             if fecha_dt:
@@ -468,22 +955,107 @@ def obtener_cortes_dashboard():
                 "fecha": fecha_str,
                 "hora": hora_str,
                 "cajero": c["cajero"],
-                "fondo_inicial": float(c["monto_inicial"] or 0),
+                "fondo_inicial": a_pesos(centavos(c["monto_inicial"])),
                 "ventas": ventas,
                 "gastos": gastos,
-                "monto_final": float(c["monto_final"] or 0)
+                "monto_final": a_pesos(centavos(c["monto_final"]))
             })
 
-        neto_total = total_ventas - total_gastos
+        # Sumas exactas de SQL (DECIMAL); el neto se calcula en centavos
+        total_ventas = centavos(resumen.get("total_ingresos"))
+        total_gastos = centavos(resumen.get("total_egresos"))
 
-        return jsonify({
+        resp = jsonify({
             "summary": {
-                "total_ventas": total_ventas,
-                "total_gastos": total_gastos,
-                "neto_total": neto_total
+                "total_ventas": a_pesos(total_ventas),
+                "total_gastos": a_pesos(total_gastos),
+                "neto_total": a_pesos(total_ventas - total_gastos),
+                "total_cortes": int(resumen.get("total_cortes") or 0)
             },
-            "history": history
-        }), 200
+            "history": history,
+            "next_cursor": next_cursor
+        })
+        cache_dashboard.guardar(clave_cache, fecha, resp.get_data(), generacion, version)
+        return con_etag(resp, etag), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ==========================================
+# VISTAS DE SEMANA / MES / TRIMESTRE: /resumen
+# ==========================================
+@app.route("/resumen", methods=["GET"])
+def resumen_periodo():
+    """
+    Totales de cortes cerrados por cubeta, desde los rollups diarios
+    (ver resumenes.py):
+      ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD   (ambos inclusive, obligatorios)
+      ?agrupar=dia|semana|mes|trimestre|cajero|turno   (por defecto dia)
+    Respuesta:
+    {
+      "desde": "...", "hasta": "...", "agrupar": "...",
+      "cubetas": [
+        {"cubeta": "YYYY-MM-DD" | usuario_id | "turno", "cajero": "...",  // sólo agrupar=cajero
+         "num_cortes": ..., "ventas_efectivo": ..., "ventas_tarjeta": ...,
+         "total_ventas": ..., "gastos": ..., "neto": ..., "num_movimientos": ...}
+      ],
+      "total": { ...mismos campos... }
+    }
+    Semana empieza en lunes; mes y trimestre se etiquetan con su primer día.
+    """
+    agrupar = request.args.get("agrupar") or "dia"
+    if agrupar not in resumenes.AGRUPACIONES:
+        return jsonify({"error": f"agrupar debe ser uno de: {', '.join(resumenes.AGRUPACIONES)}"}), 400
+
+    try:
+        desde = datetime.strptime(request.args.get("desde") or "", "%Y-%m-%d").date()
+        hasta = datetime.strptime(request.args.get("hasta") or "", "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "desde y hasta son obligatorios, con formato YYYY-MM-DD"}), 400
+    if desde > hasta:
+        return jsonify({"error": "desde no puede ser posterior a hasta"}), 400
+
+    try:
+        with db.conexion() as conn, conn.cursor() as cursor:
+            etag = versiones.etag(versiones.leer(cursor))
+            if request.if_none_match.contains(etag):
+                return no_modificado(etag)
+            filas = resumenes.consultar(cursor, desde, hasta, agrupar)
+
+        # Montos en centavos hasta el final para que el total no acumule error
+        campos = ("ventas_efectivo", "ventas_tarjeta", "gastos", "neto")
+        total = dict.fromkeys((*campos, "num_cortes", "num_movimientos"), 0)
+
+        cubetas = []
+        for f in filas:
+            cubeta = f["cubeta"]
+            item = {"cubeta": cubeta.strftime("%Y-%m-%d") if hasattr(cubeta, "strftime") else cubeta}
+            if agrupar == "cajero":
+                item["cajero"] = f["cajero"]
+            item["num_cortes"] = int(f["num_cortes"] or 0)
+            item["num_movimientos"] = int(f["num_movimientos"] or 0)
+            for c in campos:
+                item[c] = centavos(f[c])
+            for c in total:
+                total[c] += item[c]
+
+            item["total_ventas"] = item["ventas_efectivo"] + item["ventas_tarjeta"]
+            for c in (*campos, "total_ventas"):
+                item[c] = a_pesos(item[c])
+            cubetas.append(item)
+
+        total["total_ventas"] = total["ventas_efectivo"] + total["ventas_tarjeta"]
+        for c in (*campos, "total_ventas"):
+            total[c] = a_pesos(total[c])
+
+        return con_etag(jsonify({
+            "desde": desde.strftime("%Y-%m-%d"),
+            "hasta": hasta.strftime("%Y-%m-%d"),
+            "agrupar": agrupar,
+            "cubetas": cubetas,
+            "total": total,
+        }), etag), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -492,11 +1064,83 @@ def obtener_cortes_dashboard():
 # ==========================================
 # DETALLE DE CORTE PARA EL MODAL: /corte/<id>
 # ==========================================
+SQL_DETALLE = """
+    SELECT c.id,
+           c.usuario_id,
+           u.nombre AS cajero,
+           c.monto_inicial,
+           c.monto_final,
+           c.fecha_inicio,
+           c.fecha_fin,
+           c.turno,
+           c.estado,
+           c.observaciones,
+           t.ventas_efectivo,
+           t.ventas_tarjeta,
+           t.gastos
+    FROM {cortes} c
+    JOIN usuarios u ON u.id = c.usuario_id
+    LEFT JOIN {totales} t ON t.corte_id = c.id
+"""
+
+DETALLE_MAX = int(os.getenv("DETALLE_MAX_IDS", "500"))
+
+
+def leer_detalles(cursor, ids):
+    """{id: fila de SQL_DETALLE}; los que no están en caliente se buscan en el archivo."""
+    por_id = {}
+    for fuente in (archivo.CALIENTE, archivo.ARCHIVO):
+        faltan = [i for i in ids if i not in por_id]
+        if not faltan:
+            break
+        if fuente is archivo.ARCHIVO and archivo.frontera(cursor) is None:
+            break
+        placeholders = ",".join(["%s"] * len(faltan))
+        cursor.execute(SQL_DETALLE.format(**fuente) + f" WHERE c.id IN ({placeholders})", faltan)
+        por_id.update((row["id"], row) for row in cursor.fetchall())
+    return por_id
+
+
+def formatear_detalle(corte):
+    """Fila de SQL_DETALLE -> objeto que espera abrirModal() en dashboard.js."""
+    # En centavos: el neto sale exacto
+    ventas_efectivo = centavos(corte["ventas_efectivo"])
+    ventas_tarjeta = centavos(corte["ventas_tarjeta"])
+    gastos = centavos(corte["gastos"])
+
+    total_ventas = ventas_efectivo + ventas_tarjeta
+    fondo_inicial = centavos(corte["monto_inicial"])
+    neto_calculado = fondo_inicial + total_ventas - gastos
+
+    fecha_dt = corte["fecha_inicio"]
+    if fecha_dt:
+        fecha_str = fecha_dt.strftime("%Y-%m-%d")
+        hora_str = fecha_dt.strftime("%H:%M")
+    else:
+        fecha_str = ""
+        hora_str = ""
+
+    return {
+        "id": corte["id"],
+        "cajero": corte["cajero"],
+        "fecha": fecha_str,
+        "hora": hora_str,
+        "fondo_inicial": a_pesos(fondo_inicial),
+        "ventas_efectivo": a_pesos(ventas_efectivo),
+        "ventas_tarjeta": a_pesos(ventas_tarjeta),
+        "total_ventas": a_pesos(total_ventas),
+        "gastos": a_pesos(gastos),
+        "neto_calculado": a_pesos(neto_calculado),
+        "observaciones": corte["observaciones"] or "Ninguna"
+    }
+
+
 @app.route("/corte/<int:corte_id>", methods=["GET"])
 def detalle_corte(corte_id):
     """
     Devuelve el detalle de un corte en la forma que espera abrirModal() en dashboard.js:
     {
+      "id": ...,
       "cajero": "...",
       "fecha": "YYYY-MM-DD",
       "hora": "HH:MM",
@@ -510,87 +1154,72 @@ def detalle_corte(corte_id):
     }
     """
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT c.id,
-                       c.usuario_id,
-                       u.nombre AS cajero,
-                       c.monto_inicial,
-                       c.monto_final,
-                       c.fecha_inicio,
-                       c.fecha_fin,
-                       c.turno,
-                       c.estado,
-                       c.observaciones
-                FROM cortes c
-                JOIN usuarios u ON u.id = c.usuario_id
-                WHERE c.id = %s
-                """,
-                (corte_id,)
-            )
-            corte = cursor.fetchone()
+        with db.conexion() as conn, conn.cursor() as cursor:
+            etag = versiones.etag(versiones.leer(cursor))
+            if request.if_none_match.contains(etag):
+                return no_modificado(etag)
 
-            if not corte:
-                conn.close()
-                return jsonify({"error": "Corte no encontrado"}), 404
+            corte = leer_detalles(cursor, [corte_id]).get(corte_id)
 
-            cursor.execute(
-                """
-                SELECT tipo, descripcion, monto
-                FROM movimientos
-                WHERE corte_id = %s
-                """,
-                (corte_id,)
-            )
-            movimientos = cursor.fetchall()
+        if not corte:
+            return jsonify({"error": "Corte no encontrado"}), 404
 
-        conn.close()
+        return con_etag(jsonify(formatear_detalle(corte)), etag), 200
 
-        ventas_efectivo = 0
-        ventas_tarjeta = 0
-        gastos = 0
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        for m in movimientos:
-            tipo = m["tipo"]
-            desc = (m["descripcion"] or "").upper()
-            monto = float(m["monto"] or 0)
 
-            if tipo == "INGRESO":
-                if desc == "VENTAS_EFECTIVO":
-                    ventas_efectivo += monto
-                elif desc == "VENTAS_TARJETA":
-                    ventas_tarjeta += monto
-                else:
-                    ventas_efectivo += monto
-            elif tipo == "EGRESO":
-                gastos += monto
-
-        total_ventas = ventas_efectivo + ventas_tarjeta
-        fondo_inicial = float(corte["monto_inicial"] or 0)
-        neto_calculado = fondo_inicial + total_ventas - gastos
-
-        fecha_dt = corte["fecha_inicio"]
-        if fecha_dt:
-            fecha_str = fecha_dt.strftime("%Y-%m-%d")
-            hora_str = fecha_dt.strftime("%H:%M")
-        else:
-            fecha_str = ""
-            hora_str = ""
+def leer_ids_detalle():
+    """ids de ?ids=1,2,3 (GET) o de {"ids": [1, 2, 3]} (POST), sin repetir y en orden."""
+    if request.method == "POST":
+        crudos = (request.get_json(silent=True) or {}).get("ids")
+        if not isinstance(crudos, list):
+            raise ParametroInvalido("ids debe ser una lista")
+    else:
+        crudos = [x for x in (request.args.get("ids") or "").split(",") if x.strip()]
 
-        return jsonify({
-            "cajero": corte["cajero"],
-            "fecha": fecha_str,
-            "hora": hora_str,
-            "fondo_inicial": fondo_inicial,
-            "ventas_efectivo": ventas_efectivo,
-            "ventas_tarjeta": ventas_tarjeta,
-            "total_ventas": total_ventas,
-            "gastos": gastos,
-            "neto_calculado": neto_calculado,
-            "observaciones": corte["observaciones"] or "Ninguna"
-        }), 200
+    try:
+        ids = list(dict.fromkeys(int(x) for x in crudos))
+    except (TypeError, ValueError):
+        raise ParametroInvalido("ids deben ser enteros")
+    if not ids:
+        raise ParametroInvalido("ids es obligatorio")
+    if len(ids) > DETALLE_MAX:
+        raise ParametroInvalido(f"máximo {DETALLE_MAX} ids por petición")
+    return ids
+
+
+@app.route("/cortes/detalle", methods=["GET", "POST"])
+def detalle_cortes_lote():
+    """
+    Detalle de varios cortes en una sola consulta (impresión / revisión
+    del día sin una petición por corte):
+      GET  /cortes/detalle?ids=1,2,3
+      POST /cortes/detalle   {"ids": [1, 2, 3]}
+    Respuesta:
+    {
+      "cortes": [ {mismo objeto que GET /corte/<id>}, ... ],   // en el orden pedido
+      "no_encontrados": [ids...]
+    }
+    """
+    try:
+        ids = leer_ids_detalle()
+    except ParametroInvalido as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        with db.conexion() as conn, conn.cursor() as cursor:
+            etag = versiones.etag(versiones.leer(cursor))
+            if request.method == "GET" and request.if_none_match.contains(etag):
+                return no_modificado(etag)
+
+            por_id = leer_detalles(cursor, ids)
+
+        return con_etag(jsonify({
+            "cortes": [formatear_detalle(por_id[i]) for i in ids if i in por_id],
+            "no_encontrados": [i for i in ids if i not in por_id],
+        }), etag), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -605,14 +1234,21 @@ def eliminar_corte(corte_id):
     Elimina un corte y sus movimientos asociados.
     """
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            # Borrar movimientos primero
+        with db.transaccion() as conn, conn.cursor() as cursor:
+            corte = resumenes.leer_cortes(cursor, [corte_id], "FOR UPDATE").get(corte_id)
+            if not corte and corte_archivado(cursor, corte_id):
+                return corte_solo_lectura()
+
+            # Sacarlo del rollup y borrar movimientos y totales primero
+            resumenes.restar(cursor, [corte_id])
             cursor.execute("DELETE FROM movimientos WHERE corte_id = %s", (corte_id,))
+            totales.borrar(cursor, corte_id)
             # Borrar corte
             cursor.execute("DELETE FROM cortes WHERE id = %s", (corte_id,))
-            conn.commit()
-        conn.close()
+            if corte:
+                versiones.incrementar(cursor, corte["fecha_inicio"])
+        if corte:
+            cache_dashboard.invalidar(corte["fecha_inicio"])
         return jsonify({"message": "Corte eliminado correctamente"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
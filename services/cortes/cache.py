@@ -0,0 +1,309 @@
+"""
+Cache de respuestas del dashboard (/obtener-cortes).
+
+Las entradas se etiquetan con la fecha que filtran ("YYYY-MM-DD") o con
+"*" cuando no hay filtro de fecha. Una escritura sobre un corte invalida
+sólo la etiqueta de su fecha y "*"; el resto de días sigue en cache.
+
+Para no guardar un resultado calculado antes de una invalidación que
+llegó a mitad de la consulta, cada etiqueta lleva un contador de
+generación: se lee antes de ir a la BD y guardar() descarta el valor si
+la generación cambió entre tanto.
+
+Cada valor se guarda junto con la versión de datos (cortes/versiones.py:
+la del día filtrado, o la suma de todas sin fecha) con la que se calculó,
+y obtener() sólo lo regresa si coincide con la versión actual. Con
+CacheLocal y varias instancias, una escritura atendida por otra instancia
+no invalida este proceso, pero sí cambia la versión de su día: la entrada
+vieja deja de servirse, sin tocar las de otros días.
+
+Backends:
+  - CacheLocal: en el proceso, LRU + TTL, acotado por entradas y bytes.
+  - CacheRemoto: cliente HTTP de un proceso de cache compartido (el mismo
+    CacheLocal servido con `python cache.py servir`), que hace las veces
+    de un cache distribuido cuando hay varias instancias del servicio.
+
+Se elige con CACHE_BACKEND=local|remoto|off (CACHE_URL para remoto).
+"""
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+
+TODAS = "*"
+
+
+class BackendCache:
+    """Interfaz común de los backends."""
+
+    def obtener(self, clave):
+        raise NotImplementedError
+
+    def guardar(self, clave, etiqueta, valor, generacion):
+        raise NotImplementedError
+
+    def generacion(self, etiqueta):
+        raise NotImplementedError
+
+    def invalidar(self, fecha):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class CacheLocal(BackendCache):
+    def __init__(self, ttl=30.0, max_entradas=256, max_bytes=16 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+
+        self._datos = OrderedDict()      # clave -> (expira, etiqueta, valor)
+        self._generaciones = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidadas": 0, "expulsadas": 0, "descartadas": 0}
+
+    def obtener(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] < ahora:
+                if entrada is not None:
+                    self._quitar(clave)
+                self._stats["misses"] += 1
+                return None
+            self._datos.move_to_end(clave)
+            self._stats["hits"] += 1
+            return entrada[2]
+
+    def guardar(self, clave, etiqueta, valor, generacion):
+        if len(valor) > self.max_bytes:
+            return False
+        with self._lock:
+            if self._generaciones.get(etiqueta, 0) != generacion:
+                self._stats["descartadas"] += 1
+                return False
+            if clave in self._datos:
+                self._quitar(clave)
+            self._datos[clave] = (time.monotonic() + self.ttl, etiqueta, valor)
+            self._bytes += len(valor)
+            while len(self._datos) > self.max_entradas or self._bytes > self.max_bytes:
+                self._quitar(next(iter(self._datos)))
+                self._stats["expulsadas"] += 1
+            return True
+
+    def generacion(self, etiqueta):
+        with self._lock:
+            return self._generaciones.get(etiqueta, 0)
+
+    def invalidar(self, fecha):
+        etiquetas = {fecha, TODAS}
+        with self._lock:
+            for etiqueta in etiquetas:
+                self._generaciones[etiqueta] = self._generaciones.get(etiqueta, 0) + 1
+            claves = [k for k, (_, etiqueta, _) in self._datos.items() if etiqueta in etiquetas]
+            for clave in claves:
+                self._quitar(clave)
+            self._stats["invalidadas"] += len(claves)
+            return len(claves)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "local",
+                "entradas": len(self._datos),
+                "bytes": self._bytes,
+                **self._stats,
+            }
+
+    def _quitar(self, clave):
+        _, _, valor = self._datos.pop(clave)
+        self._bytes -= len(valor)
+
+
+class CacheRemoto(BackendCache):
+    """
+    Cliente del proceso de cache compartido. Si el proceso no responde se
+    comporta como un cache vacío: el dashboard sigue funcionando contra la BD.
+    """
+
+    def __init__(self, url, timeout=0.2):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _pedir(self, metodo, ruta, cuerpo=None, **params):
+        url = f"{self.url}{ruta}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        req = urllib.request.Request(url, data=cuerpo, method=metodo)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, b""
+        except (urllib.error.URLError, OSError):
+            return None, b""
+
+    def obtener(self, clave):
+        status, cuerpo = self._pedir("GET", "/entrada", clave=clave)
+        return cuerpo if status == 200 else None
+
+    def guardar(self, clave, etiqueta, valor, generacion):
+        status, _ = self._pedir("PUT", "/entrada", valor,
+                                clave=clave, etiqueta=etiqueta, generacion=generacion)
+        return status == 204
+
+    def generacion(self, etiqueta):
+        status, cuerpo = self._pedir("GET", "/generacion", etiqueta=etiqueta)
+        # Sin servidor: una generación imposible para que guardar() no haga nada
+        return int(cuerpo) if status == 200 else -1
+
+    def invalidar(self, fecha):
+        status, cuerpo = self._pedir("POST", "/invalidar", fecha=fecha)
+        return int(cuerpo) if status == 200 else 0
+
+    def stats(self):
+        status, cuerpo = self._pedir("GET", "/stats")
+        if status != 200:
+            return {"backend": "remoto", "url": self.url, "disponible": False}
+        return {**json.loads(cuerpo), "backend": "remoto", "url": self.url}
+
+
+class CacheDashboard:
+    """Fachada que usa app.py: claves, etiquetas y contadores del proceso."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave(fecha, cajero, limit, after):
+        return json.dumps([fecha or "", (cajero or "").strip().lower(), limit, after or ""])
+
+    @staticmethod
+    def etiqueta(fecha):
+        return fecha or TODAS
+
+    def obtener(self, clave, version):
+        """Valor guardado para `clave` si se calculó con `version`."""
+        if self.backend is None:
+            return None
+        valor = self.backend.obtener(clave)
+        if valor is not None:
+            guardada, _, valor = valor.partition(b"\n")
+            if guardada != str(version).encode():
+                valor = None
+        with self._lock:
+            if valor is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return valor
+
+    def generacion(self, fecha):
+        return self.backend.generacion(self.etiqueta(fecha)) if self.backend else None
+
+    def guardar(self, clave, fecha, valor, generacion, version):
+        if self.backend is not None:
+            self.backend.guardar(clave, self.etiqueta(fecha), f"{version}\n".encode() + valor, generacion)
+
+    def invalidar(self, *fechas):
+        """Invalida las fechas (date/datetime/str) tocadas por una escritura."""
+        if self.backend is None:
+            return
+        for fecha in {f.strftime("%Y-%m-%d") if hasattr(f, "strftime") else str(f) for f in fechas if f}:
+            self.backend.invalidar(fecha)
+
+    def stats(self):
+        if self.backend is None:
+            return {"backend": "off"}
+        with self._lock:
+            proceso = {"hits": self.hits, "misses": self.misses}
+        return {"proceso": proceso, **self.backend.stats()}
+
+
+def desde_env():
+    tipo = os.getenv("CACHE_BACKEND", "local")
+    if tipo == "off":
+        return CacheDashboard(None)
+    if tipo == "remoto":
+        return CacheDashboard(CacheRemoto(os.getenv("CACHE_URL", "http://localhost:8098")))
+    return CacheDashboard(CacheLocal(
+        ttl=float(os.getenv("CACHE_TTL", "30")),
+        max_entradas=int(os.getenv("CACHE_MAX_ENTRADAS", "256")),
+        max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ))
+
+
+# ==========================================
+# Proceso de cache compartido
+# ==========================================
+def servir(puerto, cache):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def _params(self):
+            ruta, _, query = self.path.partition("?")
+            return ruta, {k: v[0] for k, v in urllib.parse.parse_qs(query).items()}
+
+        def _responder(self, status, cuerpo=b""):
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def do_GET(self):
+            ruta, p = self._params()
+            if ruta == "/entrada":
+                valor = cache.obtener(p.get("clave", ""))
+                self._responder(200, valor) if valor is not None else self._responder(404)
+            elif ruta == "/generacion":
+                self._responder(200, str(cache.generacion(p.get("etiqueta", TODAS))).encode())
+            elif ruta == "/stats":
+                self._responder(200, json.dumps(cache.stats()).encode())
+            else:
+                self._responder(404)
+
+        def do_PUT(self):
+            ruta, p = self._params()
+            if ruta != "/entrada":
+                return self._responder(404)
+            valor = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            ok = cache.guardar(p["clave"], p["etiqueta"], valor, int(p["generacion"]))
+            self._responder(204 if ok else 409)
+
+        def do_POST(self):
+            ruta, p = self._params()
+            if ruta != "/invalidar":
+                return self._responder(404)
+            self._responder(200, str(cache.invalidar(p["fecha"])).encode())
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("0.0.0.0", puerto), Handler)
+    print(f"cache compartido escuchando en :{puerto}")
+    servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "servir":
+        print("Uso: python cache.py servir [puerto]")
+        sys.exit(2)
+    puerto = int(sys.argv[2]) if len(sys.argv) > 2 else 8098
+    try:
+        servir(puerto, CacheLocal(
+            ttl=float(os.getenv("CACHE_TTL", "30")),
+            max_entradas=int(os.getenv("CACHE_MAX_ENTRADAS", "4096")),
+            max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(128 * 1024 * 1024))),
+        ))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,117 @@
+"""
+Índice en memoria para el filtro ?cajero= del dashboard y las exportaciones.
+
+En vez de `u.nombre LIKE '%texto%'` (que recorre usuarios en cada llamada y
+luego cruza contra todos los cortes), el texto se resuelve aquí a un
+conjunto de usuario_id y la consulta de cortes queda como
+`c.usuario_id IN (...)`, que usa ix_cortes_usuario_fecha.
+
+La búsqueda es por subcadena, sin distinguir mayúsculas ni acentos
+("jose" encuentra "José", "NUNEZ" encuentra "Núñez"). Se indexan los
+trigramas del nombre normalizado; textos de menos de 3 letras se comparan
+contra todos los nombres en memoria (usuarios es una tabla chica).
+
+Los usuarios los escribe el servicio users, así que el índice se recarga
+cuando vence su TTL (CAJEROS_TTL, 60 s por defecto) y, como mucho una vez
+cada CAJEROS_RECARGA_MIN segundos, cuando una búsqueda no encuentra nada
+(para que un cajero recién creado aparezca sin esperar el TTL).
+"""
+import os
+import threading
+import time
+import unicodedata
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos ni espacios repetidos: 'José  Núñez' -> 'jose nunez'."""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    sin_marcas = "".join(ch for ch in descompuesto if not unicodedata.combining(ch))
+    return " ".join(sin_marcas.casefold().split())
+
+
+def trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceCajeros:
+    def __init__(self, db, ttl=None, recarga_min=None):
+        self.db = db
+        self.ttl = ttl if ttl is not None else float(os.getenv("CAJEROS_TTL", "60"))
+        self.recarga_min = (recarga_min if recarga_min is not None
+                            else float(os.getenv("CAJEROS_RECARGA_MIN", "5")))
+
+        self._nombres = {}       # usuario_id -> nombre normalizado
+        self._trigramas = {}     # trigrama -> set(usuario_id)
+        self._cargado = None     # time.monotonic() de la última carga
+        self._lock = threading.Lock()
+        self._stats = {"busquedas": 0, "recargas": 0}
+
+    # ------------------------------
+    # Carga
+    # ------------------------------
+    def recargar(self):
+        with self.db.conexion() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT id, nombre FROM usuarios")
+            filas = cursor.fetchall()
+
+        nombres = {}
+        indice = {}
+        for row in filas:
+            nombre = normalizar(row["nombre"])
+            nombres[row["id"]] = nombre
+            for tri in trigramas(nombre):
+                indice.setdefault(tri, set()).add(row["id"])
+
+        with self._lock:
+            self._nombres = nombres
+            self._trigramas = indice
+            self._cargado = time.monotonic()
+            self._stats["recargas"] += 1
+
+    def _edad(self):
+        return float("inf") if self._cargado is None else time.monotonic() - self._cargado
+
+    # ------------------------------
+    # Búsqueda
+    # ------------------------------
+    def _buscar_cargado(self, texto):
+        with self._lock:
+            if len(texto) < 3:
+                return {uid for uid, nombre in self._nombres.items() if texto in nombre}
+
+            candidatos = None
+            for tri in trigramas(texto):
+                ids = self._trigramas.get(tri)
+                if not ids:
+                    return set()
+                candidatos = set(ids) if candidatos is None else candidatos & ids
+                if not candidatos:
+                    return set()
+            # Los trigramas pueden coincidir sin que el texto aparezca seguido
+            return {uid for uid in candidatos if texto in self._nombres[uid]}
+
+    def buscar(self, texto):
+        """Regresa la lista ordenada de usuario_id cuyo nombre contiene `texto`."""
+        texto = normalizar(texto)
+        if not texto:
+            return []
+
+        with self._lock:
+            self._stats["busquedas"] += 1
+        if self._edad() > self.ttl:
+            self.recargar()
+
+        ids = self._buscar_cargado(texto)
+        if not ids and self._edad() > self.recarga_min:
+            self.recargar()
+            ids = self._buscar_cargado(texto)
+        return sorted(ids)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "usuarios": len(self._nombres),
+                "trigramas": len(self._trigramas),
+                "edad_s": None if self._cargado is None else round(self._edad(), 1),
+                **self._stats,
+            }
@@ -0,0 +1,64 @@
+"""
+Exportación en streaming (CSV / NDJSON) para /cortes/export y
+/movimientos/export.
+
+Las filas salen de un cursor sin buffer (common/flujos.py) y se van
+serializando en bloques de ~64 KB, así que la memoria no crece con el
+tamaño de la exportación.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+FORMATOS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+TAMANO_BLOQUE = 64 * 1024
+
+
+def _valor(v):
+    if isinstance(v, datetime):
+        return v.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(v, date):
+        return v.strftime("%Y-%m-%d")
+    if isinstance(v, Decimal):
+        return str(v)
+    return v
+
+
+def como_csv(filas, columnas):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas)
+    for row in filas:
+        writer.writerow([_valor(row.get(c)) for c in columnas])
+        if buffer.tell() >= TAMANO_BLOQUE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def como_ndjson(filas, columnas):
+    partes = []
+    tamano = 0
+    for row in filas:
+        linea = json.dumps({c: _valor(row.get(c)) for c in columnas}, ensure_ascii=False) + "\n"
+        partes.append(linea)
+        tamano += len(linea)
+        if tamano >= TAMANO_BLOQUE:
+            yield "".join(partes)
+            partes = []
+            tamano = 0
+    if partes:
+        yield "".join(partes)
+
+
+def serializar(formato, filas, columnas):
+    if formato == "csv":
+        return como_csv(filas, columnas)
+    return como_ndjson(filas, columnas)
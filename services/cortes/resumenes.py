@@ -0,0 +1,321 @@
+"""
+Rollups de cortes cerrados por (día, cajero, turno) (tabla resumen_diario).
+
+Alimentan GET /resumen para las vistas de semana / mes / trimestre: cada
+consulta agrega a lo más (cajeros x turnos) filas por día, sin importar
+cuántos movimientos haya debajo.
+
+Sólo cuentan los cortes CERRADO. Los endpoints de escritura aplican
+deltas ya conocidos con un upsert por VALUES (x = x + delta), en su
+transacción y con el mismo cursor, sin reagregar con INSERT ... SELECT:
+  sumar_movimientos(cursor, cortes, por_corte)  movimientos nuevos: el
+      delta sale de los propios montos (totales.delta_de_movimientos)
+  sumar_corte_nuevo(cursor, corte, movs)        /guardar-corte
+  sumar(cursor, ids) / restar(cursor, ids)      un corte que se cierra
+      entra completo, uno borrado sale (lee su fila de corte_totales)
+Para cortes ABIERTO no se toca nada.
+
+Las filas de `cortes` se leen con bloqueo (leer_cortes) ANTES de escribir
+movimientos o corte_totales. Así un cierre y un movimiento simultáneos
+sobre el mismo corte se ordenan en esa fila y el delta no se cuenta dos
+veces ni se pierde. Las llaves se escriben ordenadas para que dos
+transacciones no se crucen en resumen_diario.
+
+El día de negocio es DATE(fecha_inicio), el mismo que usa el dashboard.
+Los montos se toman de corte_totales (ver totales.py).
+
+La tabla la crea la migración common/sql/0006_resumen_diario.sql.
+
+Mantenimiento (desde services/cortes):
+  python resumenes.py reconstruir
+  python resumenes.py verificar
+"""
+import os
+import sys
+
+import totales
+
+AGRUPACIONES = ("dia", "semana", "mes", "trimestre", "cajero", "turno")
+
+_COLUMNAS = ("num_cortes", "ventas_efectivo", "ventas_tarjeta", "gastos", "neto", "num_movimientos")
+
+# Fila de rollup de cada corte cerrado (multiplicada por el signo)
+_SQL_APORTE = """
+    SELECT DATE(c.fecha_inicio) AS dia,
+           c.usuario_id,
+           COALESCE(c.turno, '') AS turno,
+           {signo} AS num_cortes,
+           {signo} * COALESCE(t.ventas_efectivo, 0) AS ventas_efectivo,
+           {signo} * COALESCE(t.ventas_tarjeta, 0) AS ventas_tarjeta,
+           {signo} * COALESCE(t.gastos, 0) AS gastos,
+           {signo} * COALESCE(t.neto, 0) AS neto,
+           {signo} * COALESCE(t.num_movimientos, 0) AS num_movimientos
+    FROM {cortes} c
+    LEFT JOIN {totales} t ON t.corte_id = c.id
+    WHERE c.estado = 'CERRADO' {where}
+"""
+
+# Suma incremental; con executemany() PyMySQL lo manda como un INSERT multi-fila
+_SQL_UPSERT = """
+    INSERT INTO resumen_diario
+        (dia, usuario_id, turno, num_cortes, ventas_efectivo, ventas_tarjeta,
+         gastos, neto, num_movimientos)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        {actualizaciones}
+""".replace("{actualizaciones}", ",\n        ".join(
+    f"{c} = {c} + VALUES({c})" for c in _COLUMNAS
+))
+
+# Expresión de la cubeta y etiqueta de cada agrupación
+_CUBETAS = {
+    "dia": "r.dia",
+    "semana": "DATE_SUB(r.dia, INTERVAL WEEKDAY(r.dia) DAY)",
+    "mes": "DATE_SUB(r.dia, INTERVAL DAYOFMONTH(r.dia) - 1 DAY)",
+    "trimestre": "MAKEDATE(YEAR(r.dia), 1) + INTERVAL QUARTER(r.dia) - 1 QUARTER",
+    "cajero": "r.usuario_id",
+    "turno": "r.turno",
+}
+
+
+def leer_cortes(cursor, corte_ids, bloqueo="FOR SHARE"):
+    """
+    {id: fila} de los cortes con lo que define su llave en el rollup.
+    Con FOR SHARE / FOR UPDATE la fila queda bloqueada hasta el commit.
+    """
+    if not corte_ids:
+        return {}
+    placeholders = ",".join(["%s"] * len(corte_ids))
+    cursor.execute(
+        f"""
+        SELECT id, usuario_id, fecha_inicio, turno, estado
+        FROM cortes
+        WHERE id IN ({placeholders})
+        {bloqueo}
+        """,
+        list(corte_ids)
+    )
+    return {row["id"]: row for row in cursor.fetchall()}
+
+
+def _llave(corte):
+    fecha = corte["fecha_inicio"]
+    return (fecha.date() if hasattr(fecha, "date") else fecha, corte["usuario_id"], corte["turno"] or "")
+
+
+def _upsert(cursor, deltas):
+    """deltas: {(dia, usuario_id, turno): [valor por columna de _COLUMNAS]}."""
+    filas = [(*llave, *valores) for llave, valores in sorted(deltas.items()) if any(valores)]
+    if filas:
+        cursor.executemany(_SQL_UPSERT, filas)
+    return len(filas)
+
+
+def _acumular(deltas, llave, valores):
+    fila = deltas.setdefault(llave, [0] * len(_COLUMNAS))
+    for i, v in enumerate(valores):
+        fila[i] += v
+
+
+def sumar_movimientos(cursor, cortes, movimientos_por_corte):
+    """
+    Movimientos nuevos sobre cortes existentes:
+    {corte_id: [(tipo, descripcion, monto), ...]}. `cortes` es lo que
+    regresó leer_cortes() al inicio de la transacción.
+    """
+    deltas = {}
+    for corte_id, movimientos in movimientos_por_corte.items():
+        corte = cortes.get(corte_id)
+        if not corte or corte["estado"] != "CERRADO":
+            continue
+        delta = totales.delta_de_movimientos(movimientos)
+        _acumular(deltas, _llave(corte), [0, *(delta[c] for c in _COLUMNAS[1:])])
+    return _upsert(cursor, deltas)
+
+
+def sumar_corte_nuevo(cursor, corte, movimientos):
+    """Corte que se crea ya CERRADO con sus movimientos (/guardar-corte)."""
+    delta = totales.delta_de_movimientos(movimientos)
+    return _upsert(cursor, {_llave(corte): [1, *(delta[c] for c in _COLUMNAS[1:])]})
+
+
+def _aplicar(cursor, corte_ids, signo):
+    """Aporte completo de cada corte CERRADO (su fila de corte_totales) por `signo`."""
+    if not corte_ids:
+        return 0
+    placeholders = ",".join(["%s"] * len(corte_ids))
+    cursor.execute(
+        _SQL_APORTE.format(signo=signo, where=f"AND c.id IN ({placeholders})",
+                           cortes="cortes", totales="corte_totales") + " FOR SHARE",
+        list(corte_ids)
+    )
+    deltas = {}
+    for row in cursor.fetchall():
+        _acumular(deltas, (row["dia"], row["usuario_id"], row["turno"]),
+                  [row[c] or 0 for c in _COLUMNAS])
+    return _upsert(cursor, deltas)
+
+
+def sumar(cursor, corte_ids):
+    """Suma al rollup los cortes CERRADO de `corte_ids` (p. ej. recién cerrados)."""
+    return _aplicar(cursor, corte_ids, 1)
+
+
+def restar(cursor, corte_ids):
+    """Quita del rollup los cortes CERRADO de `corte_ids` (antes de borrarlos)."""
+    return _aplicar(cursor, corte_ids, -1)
+
+
+def consultar(cursor, desde, hasta, agrupar):
+    """
+    Totales por cubeta entre `desde` y `hasta` (fechas, ambas inclusive).
+    Para agrupar=cajero agrega el nombre del cajero.
+    """
+    cursor.execute(sql_consulta(agrupar), (desde, hasta))
+    return cursor.fetchall()
+
+
+def sql_consulta(agrupar):
+    cajero = agrupar == "cajero"
+    return f"""
+        SELECT {_CUBETAS[agrupar]} AS cubeta{", MAX(u.nombre) AS cajero" if cajero else ""},
+               SUM(r.num_cortes) AS num_cortes,
+               SUM(r.ventas_efectivo) AS ventas_efectivo,
+               SUM(r.ventas_tarjeta) AS ventas_tarjeta,
+               SUM(r.gastos) AS gastos,
+               SUM(r.neto) AS neto,
+               SUM(r.num_movimientos) AS num_movimientos
+        FROM resumen_diario r
+        {"JOIN usuarios u ON u.id = r.usuario_id" if cajero else ""}
+        WHERE r.dia >= %s AND r.dia <= %s
+        GROUP BY cubeta
+        HAVING SUM(r.num_cortes) > 0
+        ORDER BY cubeta
+    """
+
+
+_SQL_TOTALES_DASHBOARD = """
+    SELECT SUM(x.total_cortes) AS total_cortes,
+           SUM(x.total_ingresos) AS total_ingresos,
+           SUM(x.total_egresos) AS total_egresos
+    FROM (
+        SELECT SUM(r.num_cortes) AS total_cortes,
+               SUM(r.ventas_efectivo + r.ventas_tarjeta) AS total_ingresos,
+               SUM(r.gastos) AS total_egresos
+        FROM resumen_diario r
+        WHERE 1=1 {filtro_r}
+        UNION ALL
+        SELECT COUNT(*),
+               SUM(t.ventas_efectivo + t.ventas_tarjeta),
+               SUM(t.gastos)
+        FROM cortes c
+        LEFT JOIN corte_totales t ON t.corte_id = c.id
+        WHERE c.estado = 'ABIERTO' {filtro_c}
+    ) x
+"""
+
+
+def totales_dashboard(cursor, filtro_r="", filtro_c="", params=()):
+    """
+    Resumen del dashboard sin filtro de fecha. Los cortes CERRADO (también
+    los archivados) salen de resumen_diario; de cortes sólo se leen los
+    ABIERTO, por índice. Así la vista por defecto no recorre cortes +
+    corte_totales completas. `filtro_r` / `filtro_c` son la misma condición
+    de cajero sobre los alias r y c; `params` trae sus valores una vez.
+    """
+    cursor.execute(
+        _SQL_TOTALES_DASHBOARD.format(filtro_r=filtro_r, filtro_c=filtro_c),
+        [*params, *params]
+    )
+    return cursor.fetchone() or {}
+
+
+# ==========================================
+# Reconstrucción / verificación
+# ==========================================
+# Los cortes archivados (common/archivo.py) siguen contando en los rollups
+_SQL_RECALCULO = f"""
+    SELECT a.dia, a.usuario_id, a.turno,
+           {", ".join(f"SUM(a.{c}) AS {c}" for c in _COLUMNAS)}
+    FROM (
+        {_SQL_APORTE.format(signo=1, where="", cortes="cortes", totales="corte_totales")}
+        UNION ALL
+        {_SQL_APORTE.format(signo=1, where="", cortes="cortes_archivo", totales="corte_totales_archivo")}
+    ) a
+    GROUP BY a.dia, a.usuario_id, a.turno
+"""
+
+
+def reconstruir(cursor):
+    """Recalcula resumen_diario completo desde cortes + corte_totales (con el archivo)."""
+    cursor.execute("DELETE FROM resumen_diario")
+    cursor.execute(
+        f"""
+        INSERT INTO resumen_diario
+            (dia, usuario_id, turno, {", ".join(_COLUMNAS)})
+        {_SQL_RECALCULO}
+        """
+    )
+    return cursor.rowcount
+
+
+def verificar(cursor):
+    """
+    Compara resumen_diario contra el recálculo. Regresa las llaves
+    (dia, usuario_id, turno) que no cuadran.
+    """
+    distinto = " OR ".join(f"COALESCE(r.{c}, 0) <> COALESCE(x.{c}, 0)" for c in _COLUMNAS)
+    cursor.execute(
+        f"""
+        SELECT x.dia, x.usuario_id, x.turno
+        FROM ({_SQL_RECALCULO}) x
+        LEFT JOIN resumen_diario r
+               ON r.dia = x.dia AND r.usuario_id = x.usuario_id AND r.turno = x.turno
+        WHERE {distinto}
+        UNION ALL
+        SELECT r.dia, r.usuario_id, r.turno
+        FROM resumen_diario r
+        LEFT JOIN ({_SQL_RECALCULO}) x
+               ON r.dia = x.dia AND r.usuario_id = x.usuario_id AND r.turno = x.turno
+        WHERE x.dia IS NULL AND r.num_cortes <> 0
+        ORDER BY dia, usuario_id, turno
+        """
+    )
+    return cursor.fetchall()
+
+
+def main(argv):
+    _services_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _services_dir not in sys.path:
+        sys.path.append(_services_dir)
+    from common.db import get_pool
+    import versiones
+
+    if not argv or argv[0] not in ("reconstruir", "verificar"):
+        print("Uso: python resumenes.py reconstruir | verificar")
+        return 2
+
+    db = get_pool()
+
+    if argv[0] == "reconstruir":
+        with db.transaccion() as conn, conn.cursor() as cursor:
+            filas = reconstruir(cursor)
+            versiones.incrementar_todas(cursor)
+        print(f"resumen_diario reconstruida: {filas} filas")
+        return 0
+
+    with db.conexion() as conn, conn.cursor() as cursor:
+        diferencias = verificar(cursor)
+    for d in diferencias:
+        print(f"{d['dia']} usuario {d['usuario_id']} turno '{d['turno']}': distinto")
+    print(f"{len(diferencias)} diferencias")
+    return 1 if diferencias else 0
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    sys.exit(main(sys.argv[1:]))
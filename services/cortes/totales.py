@@ -0,0 +1,230 @@
+"""
+Totales materializados por corte (tabla corte_totales).
+
+Los endpoints de escritura llaman a estas funciones con el MISMO cursor
+con el que insertan/borran movimientos, así que la tabla se actualiza
+dentro de la misma transacción. El dashboard y el detalle de corte leen
+directamente de aquí en lugar de sumar `movimientos` en cada request.
+
+Clasificación (la misma que usaba detalle_corte):
+  INGRESO + VENTAS_TARJETA  -> ventas_tarjeta
+  INGRESO + cualquier otra  -> ventas_efectivo
+  EGRESO                    -> gastos
+  neto = ventas_efectivo + ventas_tarjeta - gastos   (sin fondo inicial)
+
+otros_ingresos lleva aparte los INGRESO que no son VENTAS_EFECTIVO ni
+VENTAS_TARJETA (ya incluidos en ventas_efectivo): los reportes cuentan
+como efectivo sólo VENTAS_EFECTIVO y los restan.
+
+La tabla la crea la migración common/sql/0002_corte_totales.sql.
+
+Mantenimiento (desde services/cortes):
+  python totales.py reconstruir [corte_id ...]
+  python totales.py verificar
+"""
+import os
+import sys
+from decimal import Decimal
+
+# Misma clasificación que clasificar(), pero en SQL, sobre movimientos crudos
+_SQL_RECALCULO = """
+    SELECT corte_id,
+           SUM(CASE WHEN tipo = 'INGRESO' AND UPPER(COALESCE(descripcion, '')) <> 'VENTAS_TARJETA'
+                    THEN monto ELSE 0 END) AS ventas_efectivo,
+           SUM(CASE WHEN tipo = 'INGRESO' AND UPPER(COALESCE(descripcion, '')) = 'VENTAS_TARJETA'
+                    THEN monto ELSE 0 END) AS ventas_tarjeta,
+           SUM(CASE WHEN tipo = 'EGRESO' THEN monto ELSE 0 END) AS gastos,
+           SUM(CASE WHEN tipo = 'INGRESO' THEN monto
+                    WHEN tipo = 'EGRESO' THEN -monto
+                    ELSE 0 END) AS neto,
+           COUNT(*) AS num_movimientos,
+           SUM(CASE WHEN tipo = 'INGRESO'
+                     AND UPPER(COALESCE(descripcion, '')) NOT IN ('VENTAS_EFECTIVO', 'VENTAS_TARJETA')
+                    THEN monto ELSE 0 END) AS otros_ingresos
+    FROM movimientos
+    {where}
+    GROUP BY corte_id
+"""
+
+_COLUMNAS = ("ventas_efectivo", "ventas_tarjeta", "gastos", "neto", "num_movimientos", "otros_ingresos")
+
+# Suma incremental; con executemany() PyMySQL lo manda como un INSERT multi-fila
+_SQL_UPSERT = """
+    INSERT INTO corte_totales
+        (corte_id, ventas_efectivo, ventas_tarjeta, gastos, neto, num_movimientos, otros_ingresos)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        ventas_efectivo = ventas_efectivo + VALUES(ventas_efectivo),
+        ventas_tarjeta = ventas_tarjeta + VALUES(ventas_tarjeta),
+        gastos = gastos + VALUES(gastos),
+        neto = neto + VALUES(neto),
+        num_movimientos = num_movimientos + VALUES(num_movimientos),
+        otros_ingresos = otros_ingresos + VALUES(otros_ingresos)
+"""
+
+
+def clasificar(tipo, descripcion):
+    """Columna de corte_totales a la que suma un movimiento (o None)."""
+    if tipo == "INGRESO":
+        if (descripcion or "").upper() == "VENTAS_TARJETA":
+            return "ventas_tarjeta"
+        return "ventas_efectivo"
+    if tipo == "EGRESO":
+        return "gastos"
+    return None
+
+
+def delta_de_movimientos(movimientos):
+    """
+    movimientos: iterable de (tipo, descripcion, monto).
+    Regresa el dict de incrementos a aplicar sobre corte_totales.
+    """
+    delta = {
+        "ventas_efectivo": Decimal("0"),
+        "ventas_tarjeta": Decimal("0"),
+        "gastos": Decimal("0"),
+        "num_movimientos": 0,
+        "otros_ingresos": Decimal("0"),
+    }
+    for tipo, descripcion, monto in movimientos:
+        delta["num_movimientos"] += 1
+        columna = clasificar(tipo, descripcion)
+        if columna:
+            delta[columna] += Decimal(str(monto or 0))
+        if tipo == "INGRESO" and (descripcion or "").upper() not in ("VENTAS_EFECTIVO", "VENTAS_TARJETA"):
+            delta["otros_ingresos"] += Decimal(str(monto or 0))
+
+    delta["neto"] = delta["ventas_efectivo"] + delta["ventas_tarjeta"] - delta["gastos"]
+    return delta
+
+
+def aplicar_movimientos(cursor, corte_id, movimientos):
+    """
+    Suma `movimientos` a los totales del corte (upsert). Debe llamarse con
+    el cursor de la transacción que inserta esos movimientos.
+    """
+    delta = delta_de_movimientos(movimientos)
+    if not delta["num_movimientos"]:
+        return delta
+
+    cursor.execute(_SQL_UPSERT, (corte_id, *(delta[c] for c in _COLUMNAS)))
+    return delta
+
+
+def aplicar_lote(cursor, movimientos_por_corte):
+    """
+    Igual que aplicar_movimientos() para varios cortes a la vez:
+    {corte_id: [(tipo, descripcion, monto), ...]} -> un solo executemany.
+    """
+    filas = []
+    for corte_id, movimientos in movimientos_por_corte.items():
+        delta = delta_de_movimientos(movimientos)
+        if delta["num_movimientos"]:
+            filas.append((corte_id, *(delta[c] for c in _COLUMNAS)))
+
+    if filas:
+        cursor.executemany(_SQL_UPSERT, filas)
+    return len(filas)
+
+
+def borrar(cursor, corte_id):
+    cursor.execute("DELETE FROM corte_totales WHERE corte_id = %s", (corte_id,))
+
+
+# ==========================================
+# Reconstrucción / verificación
+# ==========================================
+def _where_ids(corte_ids):
+    if not corte_ids:
+        return "", []
+    placeholders = ",".join(["%s"] * len(corte_ids))
+    return f"WHERE corte_id IN ({placeholders})", list(corte_ids)
+
+
+def reconstruir(cursor, corte_ids=None):
+    """
+    Recalcula corte_totales desde movimientos (todo, o sólo `corte_ids`).
+    Regresa cuántas filas quedaron escritas.
+    """
+    where, params = _where_ids(corte_ids)
+    cursor.execute(f"DELETE FROM corte_totales {where}", params)
+    cursor.execute(
+        f"""
+        INSERT INTO corte_totales
+            (corte_id, ventas_efectivo, ventas_tarjeta, gastos, neto, num_movimientos, otros_ingresos)
+        {_SQL_RECALCULO.format(where=where)}
+        """,
+        params
+    )
+    return cursor.rowcount
+
+
+def verificar(cursor):
+    """
+    Compara corte_totales contra el recálculo desde movimientos.
+    Regresa la lista de diferencias (vacía si todo cuadra).
+    """
+    cursor.execute(
+        f"""
+        SELECT r.corte_id,
+               'distinto' AS problema
+        FROM ({_SQL_RECALCULO.format(where="")}) r
+        LEFT JOIN corte_totales t ON t.corte_id = r.corte_id
+        WHERE t.corte_id IS NULL
+           OR t.ventas_efectivo <> r.ventas_efectivo
+           OR t.ventas_tarjeta <> r.ventas_tarjeta
+           OR t.gastos <> r.gastos
+           OR t.neto <> r.neto
+           OR t.num_movimientos <> r.num_movimientos
+           OR t.otros_ingresos <> r.otros_ingresos
+        UNION ALL
+        SELECT t.corte_id,
+               'sin movimientos' AS problema
+        FROM corte_totales t
+        WHERE t.num_movimientos <> 0
+          AND NOT EXISTS (SELECT 1 FROM movimientos m WHERE m.corte_id = t.corte_id)
+        ORDER BY corte_id
+        """
+    )
+    return cursor.fetchall()
+
+
+def main(argv):
+    _services_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _services_dir not in sys.path:
+        sys.path.append(_services_dir)
+    from common.db import get_pool
+    import resumenes
+    import versiones
+
+    if not argv or argv[0] not in ("reconstruir", "verificar"):
+        print("Uso: python totales.py reconstruir [corte_id ...] | verificar")
+        return 2
+
+    db = get_pool()
+
+    if argv[0] == "reconstruir":
+        corte_ids = [int(x) for x in argv[1:]]
+        with db.transaccion() as conn, conn.cursor() as cursor:
+            filas = reconstruir(cursor, corte_ids)
+            # Los rollups se alimentan de corte_totales
+            rollups = resumenes.reconstruir(cursor)
+            versiones.incrementar_todas(cursor)
+        print(f"corte_totales reconstruida: {filas} cortes ({rollups} filas de resumen_diario)")
+        return 0
+
+    with db.conexion() as conn, conn.cursor() as cursor:
+        diferencias = verificar(cursor)
+    for d in diferencias:
+        print(f"corte {d['corte_id']}: {d['problema']}")
+    print(f"{len(diferencias)} diferencias")
+    return 1 if diferencias else 0
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    sys.exit(main(sys.argv[1:]))
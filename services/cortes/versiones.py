@@ -0,0 +1,64 @@
+"""
+Versión de datos para GET condicionales (ETag / If-None-Match).
+
+Hay una versión por día de negocio (DATE(fecha_inicio)), en la fila
+`cortes:YYYY-MM-DD` de versiones_datos. Todas las escrituras sobre cortes
+o movimientos llaman a incrementar() con las fechas que tocan, como última
+sentencia de su transacción: la versión sube en el mismo commit que los
+datos, y si el incremento falla la escritura entera hace rollback. Al ser
+la última sentencia, el lock de la fila del día dura sólo hasta el commit,
+y escrituras de días distintos no comparten fila.
+
+Lecturas:
+  leer(cursor, fecha)  versión de un día (dashboard con ?fecha=)
+  leer(cursor)         suma de todas las filas: cambia con cualquier
+                       escritura (dashboard sin fecha, detalle, /resumen)
+"""
+
+PREFIJO = "cortes"
+
+
+def _ambito(fecha):
+    dia = fecha.strftime("%Y-%m-%d") if hasattr(fecha, "strftime") else str(fecha)[:10]
+    return f"{PREFIJO}:{dia}"
+
+
+def incrementar(cursor, *fechas):
+    """Sube la versión de cada día tocado (date/datetime/str)."""
+    ambitos = sorted({_ambito(f) for f in fechas if f})
+    if not ambitos:
+        return
+    cursor.executemany(
+        """
+        INSERT INTO versiones_datos (ambito, version) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+        """,
+        [(a,) for a in ambitos]
+    )
+
+
+def incrementar_todas(cursor):
+    """Para recálculos completos (totales / resumenes reconstruir)."""
+    cursor.execute(
+        "UPDATE versiones_datos SET version = version + 1 WHERE ambito LIKE %s",
+        (f"{PREFIJO}%",)
+    )
+
+
+def leer(cursor, fecha=None):
+    if fecha:
+        cursor.execute("SELECT version FROM versiones_datos WHERE ambito = %s", (_ambito(fecha),))
+    else:
+        # Cada incremento suma 1 a alguna fila: la suma nunca se repite
+        cursor.execute(
+            "SELECT COALESCE(SUM(version), 0) AS version FROM versiones_datos WHERE ambito LIKE %s",
+            (f"{PREFIJO}%",)
+        )
+    row = cursor.fetchone()
+    return int(row["version"]) if row and row["version"] is not None else 0
+
+
+def etag(version, fecha=None):
+    if fecha:
+        return f"{_ambito(fecha).replace(':', '-')}-v{version}"
+    return f"{PREFIJO}-v{version}"
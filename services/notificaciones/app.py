@@ -1,37 +1,47 @@
 import os
-import pymysql
-import boto3
+import sys
 from flask import Flask, request, jsonify
-from dotenv import load_dotenv
-import awsgi
 
-load_dotenv()
+# Cargar .env solo en local
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# Código compartido entre servicios (services/common)
+_SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SERVICES_DIR not in sys.path:
+    sys.path.append(_SERVICES_DIR)
+
+from common.db import get_pool
+from common.clientes import cliente_aws
 
 app = Flask(__name__)
 
 # ============================================================
 #   CONFIG BD
 # ============================================================
-connection_params = {
-    "host": os.getenv("DB_HOST"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASS"),
-    "database": os.getenv("DB_NAME"),
-    "cursorclass": pymysql.cursors.DictCursor
-}
-
-def get_connection():
-    return pymysql.connect(**connection_params)
+db = get_pool()
 
 
 # ============================================================
 #   CONFIG SES
 # ============================================================
-ses = boto3.client("ses", region_name=os.getenv("REGION"))
+# El cliente se crea en el primer envío (ver common/clientes.py)
+REGION = os.getenv("REGION")
 MAIL_FROM = os.getenv("SES_EMAIL_FROM")
 MAIL_TO = os.getenv("SES_EMAIL_TO", MAIL_FROM)
 
 
+# ============================================================
+#   HEALTHCHECK
+# ============================================================
+@app.route("/health", methods=["GET"])
+def health():
+    return jsonify({"status": "ok", "service": "notificaciones", "db_pool": db.stats()}), 200
+
+
 # ============================================================
 #   ENDPOINT PRINCIPAL
 #   /enviar-correo-reporte-final
@@ -47,17 +57,26 @@ def enviar_correo_reporte_final():
     if not corte_final_id or not pdf_url or not excel_url:
         return jsonify({"error": "Datos incompletos"}), 400
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    # El outbox entrega "al menos una vez": si ya enviamos este evento, no repetimos
+    clave = request.headers.get("Idempotency-Key")
+    if clave:
+        with db.conexion() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM notificaciones WHERE clave_idempotencia = %s",
+                (clave,)
+            )
+            if cursor.fetchone():
+                return jsonify({"message": "Correo ya enviado", "duplicado": True}), 200
 
     # 1) Buscar usuario para asociar notificación (el que tenga MAIL_TO)
     usuario_id = 1
     try:
-        cursor.execute(
-            "SELECT id FROM usuarios WHERE email = %s LIMIT 1",
-            (MAIL_TO,)
-        )
-        row = cursor.fetchone()
+        with db.conexion() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM usuarios WHERE email = %s LIMIT 1",
+                (MAIL_TO,)
+            )
+            row = cursor.fetchone()
         if row:
             usuario_id = row["id"]
     except Exception:
@@ -84,7 +103,7 @@ def enviar_correo_reporte_final():
 
     # 3) Enviar con SES
     try:
-        resp = ses.send_email(
+        resp = cliente_aws("ses", REGION).send_email(
             Source=MAIL_FROM,
             Destination={"ToAddresses": correos},
             Message={
@@ -102,17 +121,17 @@ def enviar_correo_reporte_final():
         }), 500
 
     # 4) Registrar notificación
-    cursor.execute("""
-        INSERT INTO notificaciones (usuario_id, asunto, mensaje, enviado)
-        VALUES (%s, %s, %s, %s)
-    """, (
-        usuario_id,
-        asunto,
-        f"PDF: {pdf_url} | Excel: {excel_url}",
-        1
-    ))
-    conn.commit()
-    conn.close()
+    with db.transaccion() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO notificaciones (usuario_id, asunto, mensaje, enviado, clave_idempotencia)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (
+            usuario_id,
+            asunto,
+            f"PDF: {pdf_url} | Excel: {excel_url}",
+            1,
+            clave
+        ))
 
     return jsonify({
         "message": "Correo enviado correctamente",
@@ -123,5 +142,10 @@ def enviar_correo_reporte_final():
 # ============================================================
 #   HANDLER PARA AWS LAMBDA
 # ============================================================
-def handler(event, context):
-    return awsgi.response(app, event, context)
+try:
+    import awsgi
+
+    def handler(event, context):
+        return awsgi.response(app, event, context)
+except ImportError:
+    pass
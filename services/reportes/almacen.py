@@ -0,0 +1,250 @@
+"""
+Almacenamiento de los artefactos de reportes.
+
+Los renderers escriben en un "sink" (objeto con write()) en lugar de
+regresar el archivo completo en memoria:
+
+    sink = almacen.abrir(llave, content_type)
+    try:
+        generar_excel(data, sink)
+        url = sink.cerrar()
+    except Exception:
+        sink.abortar()
+        raise
+
+Cada backend expone la misma interfaz:
+  abrir(llave, content_type) -> sink     escribir un artefacto nuevo
+  existe(llave)                          para reutilizar por huella
+  url(llave)                             URL pública del artefacto
+  ruta_local(llave)                      archivo en disco, o None si no aplica
+
+En la BD se guarda la llave además de la URL, así que cambiar de backend
+(o de bucket / URL pública) no deja ligas viejas en los listados.
+
+Backends (REPORTES_ALMACEN):
+  s3     (por defecto) bucket S3_REPORTES_BUCKET. Lo escrito se junta en
+         partes de REPORTES_PARTE_MB (8 MB; S3 pide >= 5 MB salvo la
+         última). Si el archivo no llena una parte se sube con un solo
+         put_object; si la llena, se abre un multipart upload y cada
+         parte se sube en segundo plano mientras el render sigue. Como
+         mucho PARTES_EN_VUELO partes esperan subida: el render se frena
+         antes de acumular más, así que la memoria queda acotada por el
+         tamaño de parte y no por el del archivo.
+  local  directorio REPORTES_DIR_LOCAL: se escribe a un temporal junto al
+         destino y se renombra al cerrar (nunca queda un archivo a
+         medias). Sirve para pruebas sin red y para instalaciones on-prem.
+         Los archivos los sirve el propio servicio en
+         GET /reportes/archivos/<llave> (con Range y caché larga); la URL
+         es REPORTES_URL_PUBLICA + esa ruta.
+
+Los errores del backend salen como ErrorAlmacen.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common.clientes import cliente_aws
+
+PARTES_EN_VUELO = 2
+
+_subidas_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="parte-s3")
+
+
+class ErrorAlmacen(Exception):
+    pass
+
+
+# ==========================
+# S3
+# ==========================
+class SinkS3:
+    def __init__(self, bucket, llave, content_type, tamano_parte):
+        self.bucket = bucket
+        self.llave = llave
+        self.content_type = content_type
+        self.tamano_parte = tamano_parte
+
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._partes = []        # futuros de (numero, etag)
+        self._en_vuelo = threading.BoundedSemaphore(PARTES_EN_VUELO)
+        self._s3 = cliente_aws("s3")
+
+    def write(self, datos):
+        self._buffer += datos
+        if len(self._buffer) >= self.tamano_parte:
+            self._enviar_parte()
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def _enviar_parte(self):
+        # Un error de una parte anterior corta el render de una vez
+        for futuro in self._partes:
+            if futuro.done() and futuro.exception():
+                raise ErrorAlmacen(str(futuro.exception()))
+
+        try:
+            if self._upload_id is None:
+                self._upload_id = self._s3.create_multipart_upload(
+                    Bucket=self.bucket, Key=self.llave, ContentType=self.content_type
+                )["UploadId"]
+        except Exception as e:
+            raise ErrorAlmacen(str(e)) from e
+
+        numero = len(self._partes) + 1
+        cuerpo, self._buffer = bytes(self._buffer), bytearray()
+        self._en_vuelo.acquire()
+        self._partes.append(_subidas_executor.submit(self._subir_parte, numero, cuerpo))
+
+    def _subir_parte(self, numero, cuerpo):
+        try:
+            resp = self._s3.upload_part(
+                Bucket=self.bucket, Key=self.llave, UploadId=self._upload_id,
+                PartNumber=numero, Body=cuerpo,
+            )
+            return {"PartNumber": numero, "ETag": resp["ETag"]}
+        finally:
+            self._en_vuelo.release()
+
+    def cerrar(self):
+        """Termina la subida y regresa la URL del objeto."""
+        try:
+            if self._upload_id is None:
+                self._s3.put_object(
+                    Bucket=self.bucket, Key=self.llave,
+                    Body=bytes(self._buffer), ContentType=self.content_type,
+                )
+            else:
+                if self._buffer:
+                    self._enviar_parte()
+                partes = [futuro.result() for futuro in self._partes]
+                self._s3.complete_multipart_upload(
+                    Bucket=self.bucket, Key=self.llave, UploadId=self._upload_id,
+                    MultipartUpload={"Parts": partes},
+                )
+        except ErrorAlmacen:
+            self.abortar()
+            raise
+        except Exception as e:
+            self.abortar()
+            raise ErrorAlmacen(str(e)) from e
+        self._buffer = bytearray()
+        return url_s3(self.bucket, self.llave)
+
+    def abortar(self):
+        self._buffer = bytearray()
+        if self._upload_id is None:
+            return
+        for futuro in self._partes:
+            futuro.exception()   # esperar a que terminen antes de abortar
+        try:
+            self._s3.abort_multipart_upload(Bucket=self.bucket, Key=self.llave, UploadId=self._upload_id)
+        except Exception as e:
+            print(f"No se pudo abortar el multipart de {self.llave}:", e)
+        self._upload_id = None
+
+
+def url_s3(bucket, llave):
+    return f"https://{bucket}.s3.amazonaws.com/{llave}"
+
+
+class AlmacenS3:
+    def __init__(self, bucket, tamano_parte=None):
+        self.bucket = bucket
+        self.tamano_parte = tamano_parte or int(os.getenv("REPORTES_PARTE_MB", "8")) * 1024 * 1024
+
+    def url(self, llave):
+        return url_s3(self.bucket, llave)
+
+    def ruta_local(self, llave):
+        return None
+
+    def existe(self, llave):
+        if not self.bucket:
+            return False
+        try:
+            cliente_aws("s3").head_object(Bucket=self.bucket, Key=llave)
+            return True
+        except Exception as e:
+            codigo = getattr(e, "response", {}).get("Error", {}).get("Code")
+            if codigo not in ("404", "NoSuchKey", "NotFound"):
+                print(f"No se pudo revisar {llave} en S3:", e)
+            return False
+
+    def abrir(self, llave, content_type):
+        if not self.bucket:
+            raise ErrorAlmacen("S3_REPORTES_BUCKET no está configurado")
+        return SinkS3(self.bucket, llave, content_type, self.tamano_parte)
+
+
+# ==========================
+# Disco local
+# ==========================
+class SinkLocal:
+    def __init__(self, ruta, url):
+        self.ruta = ruta
+        self.url = url
+        self._temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.parcial"
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            self._archivo = open(self._temporal, "wb")
+        except OSError as e:
+            raise ErrorAlmacen(str(e)) from e
+
+    def write(self, datos):
+        try:
+            return self._archivo.write(datos)
+        except OSError as e:
+            raise ErrorAlmacen(str(e)) from e
+
+    def flush(self):
+        pass
+
+    def cerrar(self):
+        try:
+            self._archivo.close()
+            os.replace(self._temporal, self.ruta)
+        except OSError as e:
+            self.abortar()
+            raise ErrorAlmacen(str(e)) from e
+        return self.url
+
+    def abortar(self):
+        try:
+            self._archivo.close()
+            os.remove(self._temporal)
+        except OSError:
+            pass
+
+
+class AlmacenLocal:
+    def __init__(self, raiz, url_base=""):
+        self.raiz = os.path.abspath(raiz)
+        self.url_base = url_base.rstrip("/")
+
+    def ruta_local(self, llave):
+        ruta = os.path.abspath(os.path.join(self.raiz, llave))
+        if not ruta.startswith(self.raiz + os.sep):
+            raise ErrorAlmacen(f"Llave fuera del directorio de reportes: {llave}")
+        return ruta
+
+    def url(self, llave):
+        return f"{self.url_base}/reportes/archivos/{llave}"
+
+    def existe(self, llave):
+        return os.path.isfile(self.ruta_local(llave))
+
+    def abrir(self, llave, content_type):
+        return SinkLocal(self.ruta_local(llave), self.url(llave))
+
+
+def desde_env():
+    tipo = os.getenv("REPORTES_ALMACEN", "s3")
+    if tipo == "local":
+        return AlmacenLocal(os.getenv("REPORTES_DIR_LOCAL", "reportes_local"),
+                            os.getenv("REPORTES_URL_PUBLICA", ""))
+    if tipo == "s3":
+        return AlmacenS3(os.getenv("S3_REPORTES_BUCKET"))
+    raise ValueError(f"REPORTES_ALMACEN desconocido: {tipo}")
@@ -1,12 +1,14 @@
+import hashlib
+import json
 import os
-from io import BytesIO
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo   # <-- NUEVO
 
-from flask import Flask, request, jsonify
-import pymysql
-from pymysql.cursors import DictCursor
-import requests
+from flask import Flask, request, jsonify, redirect, send_file
 
 # .env solo en local
 try:
@@ -15,155 +17,296 @@ try:
 except ImportError:
     pass
 
-import boto3
-from openpyxl import Workbook
-from fpdf import FPDF
+# Código compartido entre servicios (services/common)
+_SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SERVICES_DIR not in sys.path:
+    sys.path.append(_SERVICES_DIR)
+
+from common.db import get_pool
+from common import agregados, archivo, outbox
+from common.flujos import filas_mezcladas, filas_sin_buffer
+
+import almacen
+import jobs
 
 app = Flask(__name__)
+# Detrás de nginx / Apache con X-Sendfile el servidor manda los archivos
+app.config["USE_X_SENDFILE"] = os.getenv("REPORTES_X_SENDFILE") == "1"
 
 mx_tz = ZoneInfo("America/Mexico_City")   # <-- NUEVO
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", "localhost"),
-    "user": os.getenv("DB_USER", "root"),
-    "password": os.getenv("DB_PASS", ""),
-    "database": os.getenv("DB_NAME", "corte_caja"),
-    "cursorclass": DictCursor,
-}
+db = get_pool()
 
-S3_REPORTES_BUCKET = os.getenv("S3_REPORTES_BUCKET")
-NOTIFICACIONES_URL = os.getenv("NOTIFICACIONES_URL")
+# S3 o disco local (ver almacen.py)
+almacen_reportes = almacen.desde_env()
 
 
 # ==========================
-# Helpers de infraestructura
+# Lógica de negocio
 # ==========================
 
-def get_connection():
-    return pymysql.connect(**DB_CONFIG)
-
-
-def subir_a_s3(nombre_objeto, contenido_bytes, content_type):
-    if not S3_REPORTES_BUCKET:
-        raise RuntimeError("S3_REPORTES_BUCKET no está configurado")
-
-    s3 = boto3.client("s3")
-    s3.put_object(
-        Bucket=S3_REPORTES_BUCKET,
-        Key=nombre_objeto,
-        Body=contenido_bytes,
-        ContentType=content_type,
+# ==========================
+# Carga de datos del reporte
+# ==========================
+# Una conexión y dos sentencias:
+#   1) el corte final (caliente o archivado), el FINAL anterior (MAX sobre
+#      ix_cortes_tipo_fecha en caliente y archivo) y la frontera del archivo
+#   2) los cortes del rango con sus totales: join por rango de fecha_inicio
+#      (TURNO del rango + el propio FINAL), sin lista de ids
+# El archivo se une a la segunda sólo si el rango empieza antes de la
+# frontera (common/archivo.py).
+
+# Se consulta en caliente y archivo a la vez (UNION ALL): el corte final
+# puede estar en cualquiera de los dos
+_SQL_CORTE_FINAL = """
+    SELECT f.id, f.usuario_id, f.fecha_inicio, f.fecha_fin, f.turno, f.tipo_corte,
+           (SELECT MAX(p.fecha_inicio) FROM cortes p
+             WHERE p.tipo_corte = 'FINAL' AND p.fecha_inicio < f.fecha_inicio) AS anterior,
+           (SELECT MAX(p.fecha_inicio) FROM cortes_archivo p
+             WHERE p.tipo_corte = 'FINAL' AND p.fecha_inicio < f.fecha_inicio) AS anterior_archivo,
+           (SELECT e.hasta FROM archivo_estado e WHERE e.id = 1) AS frontera
+    FROM {cortes} f
+    WHERE f.id = %s
+"""
+
+# Cortes del rango con sus totales (una fuente por tabla caliente / archivo).
+# Los reportes conservan su clasificación: efectivo es sólo INGRESO
+# VENTAS_EFECTIVO, así que se restan los otros ingresos que corte_totales
+# suma en ventas_efectivo (ver cortes/totales.py).
+_SQL_CORTES_RANGO = """
+    SELECT c.id, c.usuario_id, COALESCE(c.turno, '') AS turno, c.fecha_inicio, c.fecha_fin,
+           COALESCE(t.ventas_efectivo - t.otros_ingresos, 0) AS ventas_efectivo,
+           COALESCE(t.ventas_tarjeta, 0) AS ventas_tarjeta,
+           COALESCE(t.gastos, 0) AS gastos,
+           COALESCE(t.num_movimientos, 0) AS num_movimientos
+    FROM {cortes} c
+    LEFT JOIN {totales} t ON t.corte_id = c.id
+    WHERE c.fecha_inicio > %s AND c.fecha_inicio <= %s
+      AND (c.tipo_corte = 'TURNO' OR c.id = %s)
+"""
+
+# Desglose en una sola consulta: GROUP BY turno, cajero, corte WITH ROLLUP
+# regresa cada corte, el subtotal de cada (turno, cajero), el de cada turno
+# y el total general. turno ya viene con COALESCE, así que un NULL en una
+# columna de agrupación sólo puede ser una fila de ROLLUP.
+_SQL_DESGLOSE = """
+    SELECT x.turno, x.usuario_id, x.id,
+           MAX(u.nombre) AS cajero,
+           MAX(x.fecha_inicio) AS fecha_inicio,
+           MAX(x.fecha_fin) AS fecha_fin,
+           COUNT(*) AS num_cortes,
+           SUM(x.ventas_efectivo) AS ventas_efectivo,
+           SUM(x.ventas_tarjeta) AS ventas_tarjeta,
+           SUM(x.gastos) AS gastos,
+           SUM(x.num_movimientos) AS num_movimientos
+    FROM ({cortes_rango}) x
+    JOIN usuarios u ON u.id = x.usuario_id
+    GROUP BY x.turno, x.usuario_id, x.id WITH ROLLUP
+"""
+
+
+# Súbela al cambiar generar_pdf / generar_excel: cambia todas las huellas
+# y los reportes se vuelven a generar en vez de reutilizarse.
+VERSION_PLANTILLA = 2
+
+
+def huella_reporte(corte_final_id, fecha_desde, fecha_hasta, filas):
+    """
+    sha256 de lo que define el contenido del reporte: rango, cortes
+    incluidos y sus totales (más la versión de las plantillas).
+    """
+    cortes = sorted(
+        (row["id"], str(row["ventas_efectivo"]), str(row["ventas_tarjeta"]),
+         str(row["gastos"]), int(row["num_movimientos"] or 0))
+        for row in filas
+    )
+    entrada = json.dumps(
+        [VERSION_PLANTILLA, corte_final_id, str(fecha_desde), str(fecha_hasta), cortes],
+        separators=(",", ":"),
     )
+    return hashlib.sha256(entrada.encode("utf-8")).hexdigest()
 
-    return f"https://{S3_REPORTES_BUCKET}.s3.amazonaws.com/{nombre_objeto}"
 
+def _montos(row):
+    """Fila con ventas_efectivo / ventas_tarjeta / gastos -> dict en pesos con neto."""
+    return agregados.resumen([
+        agregados.centavos(row["ventas_efectivo"]),
+        agregados.centavos(row["ventas_tarjeta"]),
+        agregados.centavos(row["gastos"]),
+        0,
+    ])
 
-# ==========================
-# Lógica de negocio
-# ==========================
 
-def obtener_corte_final(corte_final_id):
-    sql = """
-        SELECT id, usuario_id, fecha_inicio, fecha_fin, turno, tipo_corte
-        FROM cortes
-        WHERE id = %s
+def armar_desglose(filas, corte_final_id):
     """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql, (corte_final_id,))
-            corte = cursor.fetchone()
-    finally:
-        conn.close()
+    Separa las filas de _SQL_DESGLOSE. Regresa (cortes, totales, desglose):
+      por_turno   [{turno, num_cortes, montos..., cajeros: [...]}]
+      por_cajero  [{usuario_id, cajero, num_cortes, montos...}] (todos los turnos)
+      por_corte   [{id, tipo, cajero, turno, fecha_inicio, ..., montos...}]
+    El subtotal por cajero sin importar el turno no sale del ROLLUP (sólo
+    agrega de izquierda a derecha); se suma aquí sobre las filas de corte,
+    en centavos exactos.
+    """
+    cortes, por_turno, cajeros_turno, total = [], {}, {}, None
+    for row in filas:
+        if row["id"] is not None:
+            cortes.append(row)
+        elif row["usuario_id"] is not None:
+            cajeros_turno.setdefault(row["turno"], []).append({
+                "usuario_id": row["usuario_id"], "cajero": row["cajero"],
+                "num_cortes": row["num_cortes"], **_montos(row),
+            })
+        elif row["turno"] is not None:
+            por_turno[row["turno"]] = {
+                "turno": row["turno"], "num_cortes": row["num_cortes"], **_montos(row),
+            }
+        else:
+            total = row
+
+    cortes.sort(key=lambda c: (c["fecha_inicio"], c["id"]))
+    for turno, fila in por_turno.items():
+        fila["cajeros"] = cajeros_turno.get(turno, [])
+
+    nombres, conteo = {}, {}
+    for c in cortes:
+        nombres[c["usuario_id"]] = c["cajero"]
+        conteo[c["usuario_id"]] = conteo.get(c["usuario_id"], 0) + 1
+    sumas = agregados.sumar_totales(cortes, "usuario_id")
+    por_cajero = [
+        {"usuario_id": uid, "cajero": nombres[uid], "num_cortes": conteo[uid],
+         **agregados.resumen(sumas[uid])}
+        for uid in sorted(sumas, key=lambda u: nombres[u] or "")
+    ]
+
+    por_corte = [
+        {"id": c["id"], "tipo": "FINAL" if c["id"] == corte_final_id else "TURNO",
+         "usuario_id": c["usuario_id"], "cajero": c["cajero"], "turno": c["turno"],
+         "fecha_inicio": c["fecha_inicio"], "fecha_fin": c["fecha_fin"],
+         "num_movimientos": int(c["num_movimientos"] or 0), **_montos(c)}
+        for c in cortes
+    ]
+
+    totales = _montos(total) if total else agregados.resumen([0] * len(agregados.CATEGORIAS))
+    desglose = {"por_turno": list(por_turno.values()), "por_cajero": por_cajero, "por_corte": por_corte}
+    return cortes, totales, desglose
+
+
+def cargar_datos_reporte(corte_final_id):
+    """
+    Regresa None si el corte no existe o no es FINAL; si no, un dict con
+    corte_final, fecha_desde, fecha_hasta, cortes_turno, totales, desglose,
+    huella y fuentes (las tablas que cubre el rango, para la hoja de
+    movimientos).
+    """
+    with db.conexion() as conn, conn.cursor() as cursor:
+        sql, params = archivo.union_all(
+            _SQL_CORTE_FINAL, [archivo.CALIENTE, archivo.ARCHIVO], (corte_final_id,)
+        )
+        cursor.execute(sql, params)
+        corte_final = cursor.fetchone()
+        if not corte_final:
+            return None
+        if corte_final.get("tipo_corte") and corte_final["tipo_corte"] != "FINAL":
+            return None
+
+        fecha_final = corte_final["fecha_inicio"]
+        anteriores = [f for f in (corte_final.pop("anterior"), corte_final.pop("anterior_archivo")) if f]
+        if anteriores:
+            fecha_desde = max(anteriores)
+        else:
+            fecha_desde = datetime(
+                fecha_final.year, fecha_final.month, fecha_final.day, 0, 0, 0
+            ).replace(tzinfo=mx_tz)
 
-    if not corte:
-        return None
+        fuentes = archivo.fuentes_con_frontera(corte_final.pop("frontera"), fecha_desde)
+        cortes_rango, params = archivo.union_all(
+            _SQL_CORTES_RANGO, fuentes, (fecha_desde, fecha_final, corte_final_id)
+        )
+        cursor.execute(_SQL_DESGLOSE.format(cortes_rango=cortes_rango), params)
+        filas = cursor.fetchall()
+
+    # Totales sobre los TURNO del rango + el FINAL; el listado sólo lleva los TURNO
+    cortes, totales, desglose = armar_desglose(filas, corte_final["id"])
+    cortes_turno = [
+        {k: row[k] for k in ("id", "usuario_id", "fecha_inicio", "fecha_fin", "turno")}
+        for row in cortes if row["id"] != corte_final["id"]
+    ]
+    return {
+        "corte_final": corte_final,
+        "fecha_desde": fecha_desde,
+        "fecha_hasta": fecha_final,
+        "cortes_turno": cortes_turno,
+        "totales": totales,
+        "desglose": desglose,
+        "huella": huella_reporte(corte_final["id"], fecha_desde, fecha_final, cortes),
+        "fuentes": fuentes,
+    }
 
-    if corte.get("tipo_corte") and corte["tipo_corte"] != "FINAL":
-        return None
 
-    return corte
+_SQL_MOVIMIENTOS_REPORTE = """
+    SELECT m.id, m.corte_id, u.nombre AS cajero, c.turno,
+           c.fecha_inicio AS corte_inicio, m.fecha, m.tipo, m.descripcion, m.monto
+    FROM {movimientos} m
+    JOIN {cortes} c ON c.id = m.corte_id
+    JOIN usuarios u ON u.id = c.usuario_id
+    WHERE c.fecha_inicio > %s AND c.fecha_inicio <= %s
+      AND (c.tipo_corte = 'TURNO' OR c.id = %s)
+    ORDER BY c.fecha_inicio, m.corte_id, m.fecha, m.id
+"""
 
 
-def obtener_ultimo_corte_final_anterior(fecha_final):
-    sql = """
-        SELECT id, fecha_inicio
-        FROM cortes
-        WHERE tipo_corte = 'FINAL'
-          AND fecha_inicio < %s
-        ORDER BY fecha_inicio DESC
-        LIMIT 1
+def movimientos_del_reporte(corte_final_id, fecha_desde, fecha_final, fuentes):
     """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql, (fecha_final,))
-            return cursor.fetchone()
-    finally:
-        conn.close()
+    Generador con los movimientos de los cortes del reporte (los TURNO del
+    rango más el propio FINAL), en el orden del Excel. Lee sin buffer: la
+    conexión se toma hasta que se pide la primera fila.
+    """
+    params = (fecha_desde, fecha_final, corte_final_id)
+    flujos = [filas_sin_buffer(db, _SQL_MOVIMIENTOS_REPORTE.format(**f), params) for f in fuentes]
+    if len(flujos) == 1:
+        yield from flujos[0]
+    else:
+        yield from filas_mezcladas(
+            flujos, lambda row: (row["corte_inicio"], row["corte_id"], row["fecha"], row["id"])
+        )
 
 
-def obtener_cortes_turno_en_rango(fecha_desde, fecha_hasta):
-    sql = """
-        SELECT id, usuario_id, fecha_inicio, fecha_fin, turno
-        FROM cortes
-        WHERE tipo_corte = 'TURNO'
-          AND fecha_inicio > %s
-          AND fecha_inicio <= %s
-        ORDER BY fecha_inicio ASC
-    """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql, (fecha_desde, fecha_hasta))
-            return cursor.fetchall()
-    finally:
-        conn.close()
+def _texto_fecha(valor):
+    return valor.strftime("%Y-%m-%d %H:%M:%S") if valor else ""
 
 
-def calcular_totales_para_cortes(cortes_turno):
-    if not cortes_turno:
-        return {
-            "ventas_efectivo": 0.0,
-            "ventas_tarjeta": 0.0,
-            "gastos": 0.0,
-            "neto": 0.0,
-        }
+def _latin1(texto):
+    # Las fuentes base de fpdf sólo cubren latin-1
+    return str(texto).encode("latin-1", "replace").decode("latin-1")
 
-    corte_ids = [c["id"] for c in cortes_turno]
-    placeholders = ",".join(["%s"] * len(corte_ids))
 
-    sql = f"""
-        SELECT
-            SUM(CASE WHEN m.tipo = 'INGRESO' AND m.descripcion = 'VENTAS_EFECTIVO' THEN m.monto ELSE 0 END) AS ventas_efectivo,
-            SUM(CASE WHEN m.tipo = 'INGRESO' AND m.descripcion = 'VENTAS_TARJETA' THEN m.monto ELSE 0 END) AS ventas_tarjeta,
-            SUM(CASE WHEN m.tipo = 'EGRESO' THEN m.monto ELSE 0 END) AS gastos
-        FROM movimientos m
-        WHERE m.corte_id IN ({placeholders})
-    """
+_COLUMNAS_MONTOS = ("ventas_efectivo", "ventas_tarjeta", "gastos", "neto")
 
-    conn = get_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql, corte_ids)
-            row = cursor.fetchone() or {}
-    finally:
-        conn.close()
 
-    ventas_efectivo = float(row.get("ventas_efectivo") or 0)
-    ventas_tarjeta = float(row.get("ventas_tarjeta") or 0)
-    gastos = float(row.get("gastos") or 0)
-    neto = ventas_efectivo + ventas_tarjeta - gastos
+def _tabla_pdf(pdf, titulo, encabezados, anchos, filas):
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, titulo, ln=True)
+    pdf.set_font("Helvetica", "B", 9)
+    for texto, ancho in zip(encabezados, anchos):
+        pdf.cell(ancho, 6, texto, border=1)
+    pdf.ln()
+    pdf.set_font("Helvetica", "", 9)
+    for fila in filas:
+        for valor, ancho in zip(fila, anchos):
+            if isinstance(valor, float):
+                pdf.cell(ancho, 6, f"${valor:,.2f}", border=1, align="R")
+            else:
+                pdf.cell(ancho, 6, _latin1(valor), border=1)
+        pdf.ln()
+    pdf.ln(4)
 
-    return {
-        "ventas_efectivo": ventas_efectivo,
-        "ventas_tarjeta": ventas_tarjeta,
-        "gastos": gastos,
-        "neto": neto,
-    }
 
+# Los dos escriben el archivo en `destino` (un sink de almacen.py).
+# fpdf y openpyxl se importan dentro de cada uno para que /health y los
+# listados no los carguen en el arranque en frío.
+def generar_pdf(data, destino):
+    from fpdf import FPDF
 
-def generar_pdf(data):
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
@@ -193,108 +336,317 @@ def generar_pdf(data):
     # Resumen de cortes por turno
     pdf.set_font("Helvetica", "B", 12)
     pdf.cell(0, 8, f"Cortes por turno incluidos: {len(data['cortes_turno'])}", ln=True)
+    pdf.ln(4)
 
+    # Desglose (los subtotales por cajero van bajo su turno)
+    desglose = data["desglose"]
+    montos = ["Efectivo", "Tarjeta", "Gastos", "Neto"]
+    filas = []
+    for t in desglose["por_turno"]:
+        filas.append([t["turno"] or "(sin turno)", "", t["num_cortes"]]
+                     + [t[k] for k in _COLUMNAS_MONTOS])
+        for c in t["cajeros"]:
+            filas.append(["", c["cajero"], c["num_cortes"]] + [c[k] for k in _COLUMNAS_MONTOS])
+    _tabla_pdf(pdf, "Por turno", ["Turno", "Cajero", "Cortes"] + montos,
+               [24, 46, 16, 26, 26, 26, 26], filas)
+
+    _tabla_pdf(pdf, "Por cajero", ["Cajero", "Cortes"] + montos, [70, 16, 26, 26, 26, 26],
+               [[c["cajero"], c["num_cortes"]] + [c[k] for k in _COLUMNAS_MONTOS]
+                for c in desglose["por_cajero"]])
+
+    _tabla_pdf(pdf, "Por corte", ["ID", "Inicio", "Cajero", "Turno"] + montos,
+               [14, 32, 40, 14, 22, 22, 22, 24],
+               [[c["id"], _texto_fecha(c["fecha_inicio"])[:16], c["cajero"], c["turno"]]
+                + [c[k] for k in _COLUMNAS_MONTOS] for c in desglose["por_corte"]])
+
+    # fpdf arma el documento completo en memoria; se entrega al sink por
+    # bloques para que las partes empiecen a subir
     out = pdf.output(dest="S")
-    if isinstance(out, (bytes, bytearray)):
-        pdf_bytes = bytes(out)
-    else:
-        pdf_bytes = str(out).encode("latin-1")
-
-    return pdf_bytes
-
-
-def generar_excel(data):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Reporte Final"
-
-    ws["A1"] = "Reporte Final de Corte de Caja"
-    ws["A2"] = f"Fecha de reporte: {data['fecha_reporte']}"
-    ws["A3"] = f"Corte final ID: {data['corte_final_id']}"
-    ws["A4"] = f"Rango: {data['rango_desde']} a {data['rango_hasta']}"
-
-    ws["A6"] = "Ventas efectivo"
-    ws["B6"] = data["totales"]["ventas_efectivo"]
-    ws["A7"] = "Ventas tarjeta"
-    ws["B7"] = data["totales"]["ventas_tarjeta"]
-    ws["A8"] = "Gastos"
-    ws["B8"] = data["totales"]["gastos"]
-    ws["A9"] = "Neto"
-    ws["B9"] = data["totales"]["neto"]
-
-    ws["A11"] = "Cortes por turno incluidos"
-    ws["A12"] = "ID corte"
-    ws["B12"] = "Usuario ID"
-    ws["C12"] = "Fecha inicio"
-    ws["D12"] = "Fecha fin"
-    ws["E12"] = "Turno"
-
-    row = 13
-    for c_info in data["cortes_turno"]:
-        ws[f"A{row}"] = c_info["id"]
-        ws[f"B{row}"] = c_info["usuario_id"]
-        ws[f"C{row}"] = c_info["fecha_inicio"].strftime("%Y-%m-%d %H:%M:%S") if c_info["fecha_inicio"] else ""
-        ws[f"D{row}"] = c_info["fecha_fin"].strftime("%Y-%m-%d %H:%M:%S") if c_info["fecha_fin"] else ""
-        ws[f"E{row}"] = c_info.get("turno") or ""
-        row += 1
+    if not isinstance(out, (bytes, bytearray)):
+        out = str(out).encode("latin-1")
+    vista = memoryview(out)
+    for i in range(0, len(vista), BLOQUE_PDF):
+        destino.write(vista[i:i + BLOQUE_PDF])
+
+
+def _categoria(tipo, descripcion):
+    """Categoría de un movimiento con la clasificación de los reportes."""
+    if tipo == "INGRESO" and (descripcion or "").upper() not in ("VENTAS_EFECTIVO", "VENTAS_TARJETA"):
+        return "otros"
+    return agregados.CATEGORIAS[agregados.codigo(tipo, descripcion)]
+
+
+def generar_excel(data, destino):
+    """
+    Libro en modo write_only: cada fila se escribe al temporal de su hoja
+    en cuanto se agrega, así que ni los cortes ni los movimientos (que
+    llegan como generador desde el cursor) se quedan en memoria como
+    celdas. Al guardar, el zip se escribe directo en `destino`.
+    """
+    from openpyxl import Workbook
 
-    buffer = BytesIO()
-    wb.save(buffer)
-    excel_bytes = buffer.getvalue()
-    buffer.close()
-    return excel_bytes
+    wb = Workbook(write_only=True)
 
+    ws = wb.create_sheet("Reporte Final")
+    ws.append(["Reporte Final de Corte de Caja"])
+    ws.append([f"Fecha de reporte: {data['fecha_reporte']}"])
+    ws.append([f"Corte final ID: {data['corte_final_id']}"])
+    ws.append([f"Rango: {data['rango_desde']} a {data['rango_hasta']}"])
+    ws.append([])
 
-def guardar_reporte_bd(corte_final_id, pdf_url, excel_url):
+    ws.append(["Ventas efectivo", data["totales"]["ventas_efectivo"]])
+    ws.append(["Ventas tarjeta", data["totales"]["ventas_tarjeta"]])
+    ws.append(["Gastos", data["totales"]["gastos"]])
+    ws.append(["Neto", data["totales"]["neto"]])
+    ws.append([])
+
+    ws.append(["Cortes por turno incluidos"])
+    ws.append(["ID corte", "Usuario ID", "Fecha inicio", "Fecha fin", "Turno"])
+    for c_info in data["cortes_turno"]:
+        ws.append([
+            c_info["id"],
+            c_info["usuario_id"],
+            _texto_fecha(c_info["fecha_inicio"]),
+            _texto_fecha(c_info["fecha_fin"]),
+            c_info.get("turno") or "",
+        ])
+
+    # Desglose
+    desglose = data["desglose"]
+    montos = ["Ventas efectivo", "Ventas tarjeta", "Gastos", "Neto"]
+
+    ws_turno = wb.create_sheet("Por turno")
+    ws_turno.append(["Turno", "Cajero", "Cortes"] + montos)
+    for t in desglose["por_turno"]:
+        ws_turno.append([t["turno"], "", t["num_cortes"]] + [t[k] for k in _COLUMNAS_MONTOS])
+        for c in t["cajeros"]:
+            ws_turno.append([t["turno"], c["cajero"], c["num_cortes"]] + [c[k] for k in _COLUMNAS_MONTOS])
+
+    ws_cajero = wb.create_sheet("Por cajero")
+    ws_cajero.append(["Usuario ID", "Cajero", "Cortes"] + montos)
+    for c in desglose["por_cajero"]:
+        ws_cajero.append([c["usuario_id"], c["cajero"], c["num_cortes"]]
+                         + [c[k] for k in _COLUMNAS_MONTOS])
+
+    ws_corte = wb.create_sheet("Por corte")
+    ws_corte.append(["ID corte", "Tipo", "Usuario ID", "Cajero", "Turno", "Fecha inicio",
+                     "Fecha fin", "Movimientos"] + montos)
+    for c in desglose["por_corte"]:
+        ws_corte.append([c["id"], c["tipo"], c["usuario_id"], c["cajero"], c["turno"],
+                         _texto_fecha(c["fecha_inicio"]), _texto_fecha(c["fecha_fin"]),
+                         c["num_movimientos"]] + [c[k] for k in _COLUMNAS_MONTOS])
+
+    # Detalle por movimiento
+    ws_mov = wb.create_sheet("Movimientos")
+    ws_mov.append(["ID movimiento", "ID corte", "Cajero", "Turno", "Fecha",
+                   "Tipo", "Categoría", "Descripción", "Monto"])
+    for m in data.get("movimientos") or ():
+        ws_mov.append([
+            m["id"],
+            m["corte_id"],
+            m["cajero"],
+            m["turno"] or "",
+            _texto_fecha(m["fecha"]),
+            m["tipo"],
+            _categoria(m["tipo"], m["descripcion"]),
+            m["descripcion"] or "",
+            m["monto"],
+        ])
+
+    wb.save(destino)
+
+
+def guardar_reporte_bd(corte_final_id, pdf_llave, excel_llave, huella=None, notificar=True):
+    """
+    Inserta el reporte (llaves del almacén + URLs actuales) y, en la misma
+    transacción, el evento de outbox para que notificaciones envíe el
+    correo (salvo notificar=False).
+    """
+    pdf_url, excel_url = almacen_reportes.url(pdf_llave), almacen_reportes.url(excel_llave)
     sql = """
-        INSERT INTO reportes (corte_id, archivo_pdf_url, archivo_excel_url)
-        VALUES (%s, %s, %s)
+        INSERT INTO reportes
+            (corte_id, archivo_pdf_url, archivo_excel_url,
+             archivo_pdf_llave, archivo_excel_llave, huella)
+        VALUES (%s, %s, %s, %s, %s, %s)
     """
-    conn = get_connection()
+    with db.transaccion() as conn, conn.cursor() as cursor:
+        cursor.execute(sql, (corte_final_id, pdf_url, excel_url, pdf_llave, excel_llave, huella))
+        reporte_id = cursor.lastrowid
+        if notificar:
+            outbox.encolar(cursor, outbox.EVENTO_NOTIFICAR_REPORTE, {
+                "corte_final_id": corte_final_id,
+                "pdf_url": pdf_url,
+                "excel_url": excel_url,
+            })
+        return reporte_id
+
+
+# ==========================
+# Render + subida en paralelo
+# ==========================
+# Cada artefacto se renderiza directo a su sink; las dos cadenas corren a
+# la vez. El render es Python puro (comparte el GIL), pero las partes de
+# cada archivo se suben mientras su render sigue y mientras el otro
+# artefacto se renderiza.
+BLOQUE_PDF = 1024 * 1024
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_artefactos_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("REPORTES_HILOS", "4")), thread_name_prefix="reporte"
+)
+
+
+class ErrorSubida(Exception):
+    pass
+
+
+def _ms(inicio):
+    return round((time.perf_counter() - inicio) * 1000, 1)
+
+
+def renderizar_y_subir(nombre, generar, data, key, content_type):
+    """
+    Regresa (url, {etapa: ms}). render_* incluye las partes que se suben
+    durante el render; cierre_* es lo que falta al terminar. Los errores
+    del almacén salen como ErrorSubida.
+    """
+    try:
+        sink = almacen_reportes.abrir(key, content_type)
+    except almacen.ErrorAlmacen as e:
+        raise ErrorSubida(str(e)) from e
+
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql, (corte_final_id, pdf_url, excel_url))
-            conn.commit()
-            return cursor.lastrowid
-    finally:
-        conn.close()
+        inicio = time.perf_counter()
+        generar(data, sink)
+        tiempos = {f"render_{nombre}_ms": _ms(inicio)}
+
+        inicio = time.perf_counter()
+        url = sink.cerrar()
+        tiempos[f"cierre_{nombre}_ms"] = _ms(inicio)
+    except almacen.ErrorAlmacen as e:
+        sink.abortar()
+        raise ErrorSubida(str(e)) from e
+    except BaseException:
+        sink.abortar()
+        raise
+    return url, tiempos
 
 
 # ==========================
-# Rutas / Endpoints
+# Generación completa
 # ==========================
 
-@app.route("/health", methods=["GET"])
-def health():
-    return jsonify({"status": "ok", "service": "reportes"}), 200
+class CorteNoEncontrado(Exception):
+    pass
 
 
-@app.route("/reportes/generar-desde-corte-final", methods=["POST"])
-def generar_desde_corte_final():
-    data = request.get_json(force=True) or {}
-    corte_final_id = data.get("corte_final_id")
+class ErrorGuardado(Exception):
+    pass
 
-    if not corte_final_id:
-        return jsonify({"error": "corte_final_id es requerido"}), 400
 
-    corte_final = obtener_corte_final(corte_final_id)
-    if not corte_final:
-        return jsonify({"error": "Corte final no encontrado o no es tipo FINAL"}), 404
+def es_corte_final(corte_final_id):
+    """¿Existe el corte (caliente o archivado) y es FINAL?"""
+    sql, params = archivo.union_all(
+        "SELECT tipo_corte FROM {cortes} WHERE id = %s",
+        [archivo.CALIENTE, archivo.ARCHIVO], (corte_final_id,)
+    )
+    with db.conexion() as conn, conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return bool(row) and (not row["tipo_corte"] or row["tipo_corte"] == "FINAL")
 
-    fecha_final = corte_final["fecha_inicio"]
 
-    ultimo_final = obtener_ultimo_corte_final_anterior(fecha_final)
-    if ultimo_final:
-        fecha_desde = ultimo_final["fecha_inicio"]
-    else:
-        fecha_desde = datetime(
-            fecha_final.year, fecha_final.month, fecha_final.day, 0, 0, 0
-        ).replace(tzinfo=mx_tz)
+# ==========================
+# Reutilización por huella
+# ==========================
+# Los artefactos se guardan con la huella en la llave. Antes de generar:
+#   1) reportes ya tiene una fila del corte con esa huella -> se regresa
+#      esa (sin subir, sin fila nueva, sin correo);
+#   2) los dos objetos ya están en el almacén (p. ej. falló el INSERT del intento
+#      anterior) -> sólo se registra la fila.
+# "forzar" se salta ambas revisiones.
+# Los contadores se tocan desde los hilos de Flask y los de ColaReportes.
+_reuso = {"consultas": 0, "reutilizados_bd": 0, "reutilizados_almacen": 0, "forzados": 0}
+_reuso_lock = threading.Lock()
+
+
+def _contar_reuso(clave):
+    with _reuso_lock:
+        _reuso[clave] += 1
+
+
+def stats_reuso():
+    with _reuso_lock:
+        reuso = dict(_reuso)
+    aciertos = reuso["reutilizados_bd"] + reuso["reutilizados_almacen"]
+    return {
+        **reuso,
+        "ratio": round(aciertos / reuso["consultas"], 3) if reuso["consultas"] else None,
+    }
 
-    cortes_turno = obtener_cortes_turno_en_rango(fecha_desde, fecha_final)
 
-    cortes_para_totales = list(cortes_turno) + [corte_final]
-    totales = calcular_totales_para_cortes(cortes_para_totales)
+def buscar_reporte_previo(corte_final_id, huella):
+    with db.conexion() as conn, conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT id, archivo_pdf_url, archivo_excel_url, archivo_pdf_llave, archivo_excel_llave
+            FROM reportes
+            WHERE corte_id = %s AND huella = %s
+            ORDER BY id DESC
+            LIMIT 1
+            """,
+            (corte_final_id, huella)
+        )
+        row = cursor.fetchone()
+    return resolver_urls(row) if row else None
+
+
+def generar_reporte(corte_final_id, avance=None, forzar=False, notificar=True):
+    """
+    Datos -> PDF + Excel (render y subida en paralelo) -> BD + outbox,
+    salvo que ya exista un reporte con la misma huella (ver arriba).
+    `avance(etapa)` se llama al entrar a cada etapa (lo usan los jobs).
+    Con notificar=False no se encola el correo (regenerar.py).
+    Regresa el resultado que ve el cliente.
+    """
+    avance = avance or (lambda etapa: None)
+    inicio_total = inicio = time.perf_counter()
+    tiempos = {}
+
+    datos = cargar_datos_reporte(corte_final_id)
+    if not datos:
+        raise CorteNoEncontrado(f"Corte final {corte_final_id} no encontrado o no es tipo FINAL")
+
+    fecha_desde, fecha_final = datos["fecha_desde"], datos["fecha_hasta"]
+    cortes_turno = datos["cortes_turno"]
+    totales = datos["totales"]
+    huella = datos["huella"]
+
+    def resultado(reporte_id, pdf_url, excel_url, reutilizado):
+        tiempos["total_ms"] = _ms(inicio_total)
+        return {
+            "reporte_id": reporte_id,
+            "corte_final_id": corte_final_id,
+            "pdf_url": pdf_url,
+            "excel_url": excel_url,
+            "totales": totales,
+            "num_cortes_turno": len(cortes_turno),
+            # El desglose por corte va en los archivos
+            "desglose": {k: datos["desglose"][k] for k in ("por_turno", "por_cajero")},
+            "huella": huella,
+            "reutilizado": reutilizado,
+            "tiempos": tiempos,
+        }
+
+    _contar_reuso("consultas")
+    if forzar:
+        _contar_reuso("forzados")
+    else:
+        previo = buscar_reporte_previo(corte_final_id, huella)
+        if previo:
+            _contar_reuso("reutilizados_bd")
+            tiempos["datos_ms"] = _ms(inicio)
+            return resultado(previo["id"], previo["archivo_pdf_url"], previo["archivo_excel_url"], True)
 
     payload_reporte = {
         "fecha_reporte": datetime.now(mx_tz).strftime("%Y-%m-%d %H:%M:%S"),
@@ -303,122 +655,219 @@ def generar_desde_corte_final():
         "rango_hasta": fecha_final.strftime("%Y-%m-%d %H:%M:%S"),
         "totales": totales,
         "cortes_turno": cortes_turno,
+        "desglose": datos["desglose"],
+        # Generador: lo consume sólo generar_excel, fila por fila
+        "movimientos": movimientos_del_reporte(
+            corte_final_id, fecha_desde, fecha_final, datos["fuentes"]
+        ),
     }
+    tiempos["datos_ms"] = _ms(inicio)
+
+    # Llave por contenido: misma huella -> mismo objeto
+    pdf_key = f"reportes/reporte_final_{corte_final_id}_{huella[:16]}.pdf"
+    excel_key = f"reportes/reporte_final_{corte_final_id}_{huella[:16]}.xlsx"
+
+    avance("artefactos")
+    inicio = time.perf_counter()
+    reutilizado = (not forzar and almacen_reportes.existe(pdf_key)
+                   and almacen_reportes.existe(excel_key))
+    if reutilizado:
+        _contar_reuso("reutilizados_almacen")
+        pdf_url, excel_url = almacen_reportes.url(pdf_key), almacen_reportes.url(excel_key)
+    else:
+        # PDF y Excel: render -> subida, las dos cadenas a la vez
+        futuros = [
+            _artefactos_executor.submit(renderizar_y_subir, "pdf", generar_pdf,
+                                        payload_reporte, pdf_key, "application/pdf"),
+            _artefactos_executor.submit(renderizar_y_subir, "excel", generar_excel,
+                                        payload_reporte, excel_key, XLSX_CONTENT_TYPE),
+        ]
+        (pdf_url, tiempos_pdf), (excel_url, tiempos_excel) = [f.result() for f in futuros]
+        tiempos.update(tiempos_pdf)
+        tiempos.update(tiempos_excel)
+    tiempos["artefactos_ms"] = _ms(inicio)
+
+    avance("bd")
+    inicio = time.perf_counter()
+    try:
+        reporte_id = guardar_reporte_bd(corte_final_id, pdf_key, excel_key, huella, notificar)
+    except Exception as e:
+        raise ErrorGuardado(str(e)) from e
+    tiempos["bd_ms"] = _ms(inicio)
+
+    return resultado(reporte_id, pdf_url, excel_url, reutilizado)
+
+
+cola_reportes = jobs.ColaReportes(db, generar_reporte)
+
+
+# ==========================
+# Rutas / Endpoints
+# ==========================
 
-    pdf_bytes = generar_pdf(payload_reporte)
-    excel_bytes = generar_excel(payload_reporte)
+@app.route("/health", methods=["GET"])
+def health():
+    return jsonify({
+        "status": "ok",
+        "service": "reportes",
+        "db_pool": db.stats(),
+        "jobs": cola_reportes.stats(),
+        "reuso": stats_reuso(),
+    }), 200
+
+
+@app.route("/reportes/generar-desde-corte-final", methods=["POST"])
+def generar_desde_corte_final():
+    """
+    Registra un job y regresa 202 con su id (GET /reportes/jobs/<id>).
+    Con ?esperar=1 (o "esperar": true) genera en la misma petición y
+    regresa 201 como antes; sirve a quien necesita el resultado o el
+    código de error para reintentar. El dispatcher del outbox siempre va
+    por este camino (los eventos ya encolados sin "esperar" se reconocen
+    por su Idempotency-Key). Con ?forzar=1 (o "forzar": true) se vuelve a
+    generar aunque exista un reporte con la misma huella.
+    """
+    data = request.get_json(force=True) or {}
+    corte_final_id = data.get("corte_final_id")
 
-    timestamp = datetime.now(mx_tz).strftime("%Y%m%d_%H%M%S")   # <-- CORREGIDO
-    pdf_key = f"reportes/reporte_final_{corte_final_id}_{timestamp}.pdf"
-    excel_key = f"reportes/reporte_final_{corte_final_id}_{timestamp}.xlsx"
+    if not corte_final_id:
+        return jsonify({"error": "corte_final_id es requerido"}), 400
+    try:
+        corte_final_id = int(corte_final_id)
+    except (TypeError, ValueError):
+        return jsonify({"error": "corte_final_id debe ser entero"}), 400
+
+    esperar = (
+        data.get("esperar") is True
+        or request.args.get("esperar") in ("1", "true")
+        or request.headers.get("Idempotency-Key", "").startswith("outbox-")
+    )
+    forzar = data.get("forzar") is True or request.args.get("forzar") in ("1", "true")
 
     try:
-        pdf_url = subir_a_s3(pdf_key, pdf_bytes, "application/pdf")
-        excel_url = subir_a_s3(
-            excel_key,
-            excel_bytes,
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-    except Exception as e:
+        if esperar:
+            resultado = generar_reporte(corte_final_id, forzar=forzar)
+            return jsonify({"message": "Reporte generado correctamente", **resultado}), 201
+
+        if not es_corte_final(corte_final_id):
+            raise CorteNoEncontrado(f"Corte final {corte_final_id} no encontrado o no es tipo FINAL")
+        job, nuevo = cola_reportes.encolar(corte_final_id, forzar=forzar)
+    except CorteNoEncontrado:
+        return jsonify({"error": "Corte final no encontrado o no es tipo FINAL"}), 404
+    except ErrorSubida as e:
         print("Error subiendo archivos a S3:", e)
         return jsonify({"error": "Error subiendo archivos a S3", "details": str(e)}), 500
-
-    try:
-        reporte_id = guardar_reporte_bd(corte_final_id, pdf_url, excel_url)
-    except Exception as e:
+    except ErrorGuardado as e:
         print("Error guardando reporte en BD:", e)
         return jsonify({"error": "Error guardando reporte en BD", "details": str(e)}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    respuesta = jsonify({**jobs.formatear(job), "deduplicado": not nuevo})
+    respuesta.headers["Location"] = f"/reportes/jobs/{job['id']}"
+    return respuesta, 202
+
 
+@app.route("/reportes/jobs/<job_id>", methods=["GET"])
+def obtener_job(job_id):
     try:
-        if NOTIFICACIONES_URL:
-            resp_notify = requests.post(
-                NOTIFICACIONES_URL,
-                json={
-                    "corte_final_id": corte_final_id,
-                    "pdf_url": pdf_url,
-                    "excel_url": excel_url,
-                },
-                timeout=5
-            )
-            print("Llamada a NOTIFICACIONES_URL status:",
-                  resp_notify.status_code,
-                  resp_notify.text)
-        else:
-            print("NOTIFICACIONES_URL no configurada, no se envía correo.")
+        job = cola_reportes.obtener(job_id)
     except Exception as e:
-        print("Error llamando a NOTIFICACIONES_URL:", e)
-
-    return jsonify({
-        "message": "Reporte generado correctamente",
-        "reporte_id": reporte_id,
-        "corte_final_id": corte_final_id,
-        "pdf_url": pdf_url,
-        "excel_url": excel_url,
-        "totales": totales,
-        "num_cortes_turno": len(cortes_turno),
-    }), 201
+        return jsonify({"error": str(e)}), 500
+
+    if not job:
+        return jsonify({"error": "Job no encontrado"}), 404
+    return jsonify(jobs.formatear(job)), 200
+
+
+# El corte final puede estar en el archivo frío: LEFT JOIN a las dos tablas
+_SQL_REPORTES = """
+    SELECT r.id,
+           r.corte_id,
+           r.archivo_pdf_url,
+           r.archivo_excel_url,
+           r.archivo_pdf_llave,
+           r.archivo_excel_llave,
+           r.fecha_generado,
+           COALESCE(c.fecha_inicio, ca.fecha_inicio) AS fecha_corte_final
+    FROM reportes r
+    LEFT JOIN cortes c ON r.corte_id = c.id
+    LEFT JOIN cortes_archivo ca ON r.corte_id = ca.id
+"""
+
+
+def resolver_urls(row):
+    """URLs con el backend actual cuando el reporte tiene llaves."""
+    for tipo in ("pdf", "excel"):
+        llave = row.pop(f"archivo_{tipo}_llave", None)
+        if llave:
+            row[f"archivo_{tipo}_url"] = almacen_reportes.url(llave)
+    return row
+
+
+def formatear_reporte(row):
+    resolver_urls(row)
+    if isinstance(row.get("fecha_generado"), datetime):
+        row["fecha_generado"] = row["fecha_generado"].strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(row.get("fecha_corte_final"), datetime):
+        row["fecha_corte_final"] = row["fecha_corte_final"].strftime("%Y-%m-%d %H:%M:%S")
+    return row
 
 
 @app.route("/reportes", methods=["GET"])
 def listar_reportes():
-    sql = """
-        SELECT r.id,
-               r.corte_id,
-               r.archivo_pdf_url,
-               r.archivo_excel_url,
-               r.fecha_generado,
-               c.fecha_inicio AS fecha_corte_final
-        FROM reportes r
-        JOIN cortes c ON r.corte_id = c.id
-        ORDER BY r.fecha_generado DESC
-    """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql)
-            rows = cursor.fetchall()
-    finally:
-        conn.close()
+    with db.conexion() as conn, conn.cursor() as cursor:
+        cursor.execute(_SQL_REPORTES + " ORDER BY r.fecha_generado DESC")
+        rows = cursor.fetchall()
 
-    for r in rows:
-        if isinstance(r.get("fecha_generado"), datetime):
-            r["fecha_generado"] = r["fecha_generado"].strftime("%Y-%m-%d %H:%M:%S")
-        if isinstance(r.get("fecha_corte_final"), datetime):
-            r["fecha_corte_final"] = r["fecha_corte_final"].strftime("%Y-%m-%d %H:%M:%S")
-
-    return jsonify(rows), 200
+    return jsonify([formatear_reporte(r) for r in rows]), 200
 
 
 @app.route("/reportes/<int:reporte_id>", methods=["GET"])
 def obtener_reporte(reporte_id):
-    sql = """
-        SELECT r.id,
-               r.corte_id,
-               r.archivo_pdf_url,
-               r.archivo_excel_url,
-               r.fecha_generado,
-               c.fecha_inicio AS fecha_corte_final
-        FROM reportes r
-        JOIN cortes c ON r.corte_id = c.id
-        WHERE r.id = %s
-    """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql, (reporte_id,))
-            row = cursor.fetchone()
-    finally:
-        conn.close()
+    with db.conexion() as conn, conn.cursor() as cursor:
+        cursor.execute(_SQL_REPORTES + " WHERE r.id = %s", (reporte_id,))
+        row = cursor.fetchone()
 
     if not row:
         return jsonify({"error": "Reporte no encontrado"}), 404
 
-    if isinstance(row.get("fecha_generado"), datetime):
-        row["fecha_generado"] = row["fecha_generado"].strftime("%Y-%m-%d %H:%M:%S")
-    if isinstance(row.get("fecha_corte_final"), datetime):
-        row["fecha_corte_final"] = row["fecha_corte_final"].strftime("%Y-%m-%d %H:%M:%S")
+    return jsonify(formatear_reporte(row)), 200
+
+
+# Los artefactos no cambian nunca (la llave lleva la huella del contenido)
+CACHE_ARCHIVOS_S = 365 * 24 * 3600
+CONTENT_TYPES = {".pdf": "application/pdf", ".xlsx": XLSX_CONTENT_TYPE}
 
-    return jsonify(row), 200
+
+@app.route("/reportes/archivos/<path:llave>", methods=["GET"])
+def descargar_archivo(llave):
+    """
+    Con almacén local manda el archivo con send_file: soporta Range (206),
+    If-None-Match / If-Modified-Since (304) y usa el file_wrapper del
+    servidor WSGI (sendfile sin copiar a Python). Con S3 redirige al
+    objeto.
+    """
+    try:
+        ruta = almacen_reportes.ruta_local(llave)
+    except almacen.ErrorAlmacen:
+        return jsonify({"error": "Archivo no encontrado"}), 404
+
+    if ruta is None:
+        return redirect(almacen_reportes.url(llave), 302)
+    if not os.path.isfile(ruta):
+        return jsonify({"error": "Archivo no encontrado"}), 404
+
+    respuesta = send_file(
+        ruta,
+        mimetype=CONTENT_TYPES.get(os.path.splitext(ruta)[1], "application/octet-stream"),
+        as_attachment=True,
+        download_name=os.path.basename(ruta),
+        conditional=True,
+        max_age=CACHE_ARCHIVOS_S,
+    )
+    respuesta.headers["Cache-Control"] = f"public, max-age={CACHE_ARCHIVOS_S}, immutable"
+    return respuesta
 
 
 # ==========================
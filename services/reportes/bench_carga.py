@@ -0,0 +1,246 @@
+"""
+Benchmark de la carga de datos del reporte: cargar_datos_reporte() contra
+la cadena anterior (obtener_corte_final -> obtener_ultimo_corte_final_anterior
+-> obtener_cortes_turno_en_rango -> calcular_totales_para_cortes, cada una
+con su conexión y los totales con una lista IN de ids).
+
+Cuenta conexiones prestadas y sentencias por reporte y mide la latencia.
+Con --rtt-ms se agrega esa espera a cada sentencia para simular la red
+hasta RDS (contra un MySQL local el round trip es casi cero).
+
+Después compara, sobre el mismo rango, la consulta de cortes con sólo
+totales (antes del desglose) contra la de desglose con ROLLUP
+(app._SQL_DESGLOSE + armar_desglose).
+
+Uso (desde services/reportes, con la BD del .env):
+  python bench_carga.py <corte_final_id> [--repeticiones 50] [--rtt-ms 0]
+"""
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import app
+from common import agregados, archivo
+
+
+# ==========================
+# Cadena anterior (referencia)
+# ==========================
+def _anterior(db, corte_final_id):
+    def obtener_corte_final():
+        sql = """
+            SELECT id, usuario_id, fecha_inicio, fecha_fin, turno, tipo_corte
+            FROM {cortes}
+            WHERE id = %s
+        """
+        with db.conexion() as conn, conn.cursor() as cursor:
+            cursor.execute(sql.format(**archivo.CALIENTE), (corte_final_id,))
+            corte = cursor.fetchone()
+            if not corte and archivo.frontera(cursor) is not None:
+                cursor.execute(sql.format(**archivo.ARCHIVO), (corte_final_id,))
+                corte = cursor.fetchone()
+        if not corte or (corte.get("tipo_corte") and corte["tipo_corte"] != "FINAL"):
+            return None
+        return corte
+
+    def obtener_ultimo_corte_final_anterior(fecha_final):
+        sql = """
+            SELECT id, fecha_inicio
+            FROM {cortes}
+            WHERE tipo_corte = 'FINAL'
+              AND fecha_inicio < %s
+            ORDER BY fecha_inicio DESC
+            LIMIT 1
+        """
+        with db.conexion() as conn, conn.cursor() as cursor:
+            cursor.execute(sql.format(**archivo.CALIENTE), (fecha_final,))
+            ultimo = cursor.fetchone()
+            hasta = archivo.frontera(cursor)
+            if hasta is not None and (not ultimo or ultimo["fecha_inicio"] < hasta):
+                cursor.execute(sql.format(**archivo.ARCHIVO), (fecha_final,))
+                archivado = cursor.fetchone()
+                if archivado and (not ultimo or archivado["fecha_inicio"] > ultimo["fecha_inicio"]):
+                    ultimo = archivado
+            return ultimo
+
+    def obtener_cortes_turno_en_rango(fecha_desde, fecha_hasta):
+        plantilla = """
+            SELECT id, usuario_id, fecha_inicio, fecha_fin, turno
+            FROM {cortes}
+            WHERE tipo_corte = 'TURNO'
+              AND fecha_inicio > %s
+              AND fecha_inicio <= %s
+        """
+        with db.conexion() as conn, conn.cursor() as cursor:
+            sql, params = archivo.union_all(
+                plantilla, archivo.fuentes(cursor, fecha_desde), (fecha_desde, fecha_hasta)
+            )
+            cursor.execute(sql + " ORDER BY fecha_inicio ASC", params)
+            return cursor.fetchall()
+
+    def calcular_totales_para_cortes(cortes):
+        corte_ids = [c["id"] for c in cortes]
+        placeholders = ",".join(["%s"] * len(corte_ids))
+        plantilla = f"""
+            SELECT corte_id, ventas_efectivo - otros_ingresos AS ventas_efectivo,
+                   ventas_tarjeta, gastos
+            FROM {{totales}}
+            WHERE corte_id IN ({placeholders})
+        """
+        with db.conexion() as conn, conn.cursor() as cursor:
+            sql, params = archivo.union_all(
+                plantilla, archivo.fuentes(cursor, min(c["fecha_inicio"] for c in cortes)), corte_ids
+            )
+            cursor.execute(sql, params)
+            filas = cursor.fetchall()
+        return agregados.resumen(agregados.total(filas))
+
+    corte_final = obtener_corte_final()
+    if not corte_final:
+        return None
+    fecha_final = corte_final["fecha_inicio"]
+    ultimo = obtener_ultimo_corte_final_anterior(fecha_final)
+    if ultimo:
+        fecha_desde = ultimo["fecha_inicio"]
+    else:
+        fecha_desde = datetime(fecha_final.year, fecha_final.month, fecha_final.day).replace(tzinfo=app.mx_tz)
+    cortes_turno = obtener_cortes_turno_en_rango(fecha_desde, fecha_final)
+    totales = calcular_totales_para_cortes(list(cortes_turno) + [corte_final])
+    return {"cortes_turno": cortes_turno, "totales": totales}
+
+
+# Consulta del rango antes del desglose: cortes + totales, suma en Python
+_SQL_SOLO_TOTALES = """
+    SELECT c.id, c.usuario_id, c.fecha_inicio, c.fecha_fin, c.turno,
+           t.ventas_efectivo - t.otros_ingresos AS ventas_efectivo,
+           t.ventas_tarjeta, t.gastos, t.num_movimientos
+    FROM {cortes} c
+    LEFT JOIN {totales} t ON t.corte_id = c.id
+    WHERE c.fecha_inicio > %s AND c.fecha_inicio <= %s
+      AND (c.tipo_corte = 'TURNO' OR c.id = %s)
+"""
+
+
+def _solo_totales(db, params, fuentes):
+    sql, params = archivo.union_all(_SQL_SOLO_TOTALES, fuentes, params)
+    with db.conexion() as conn, conn.cursor() as cursor:
+        cursor.execute(sql + " ORDER BY fecha_inicio ASC", params)
+        filas = cursor.fetchall()
+    return agregados.resumen(agregados.total(filas))
+
+
+def _desglose(db, params, fuentes, corte_final_id):
+    cortes_rango, params = archivo.union_all(app._SQL_CORTES_RANGO, fuentes, params)
+    with db.conexion() as conn, conn.cursor() as cursor:
+        cursor.execute(app._SQL_DESGLOSE.format(cortes_rango=cortes_rango), params)
+        filas = cursor.fetchall()
+    _, totales, _ = app.armar_desglose(filas, corte_final_id)
+    return totales
+
+
+# ==========================
+# Conteo de round trips
+# ==========================
+class _CursorContado:
+    def __init__(self, cursor, contador):
+        self._cursor = cursor
+        self._contador = contador
+
+    def execute(self, sql, params=None):
+        self._contador.sentencias += 1
+        if self._contador.rtt:
+            time.sleep(self._contador.rtt)
+        return self._cursor.execute(sql, params)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+
+class _ConexionContada:
+    def __init__(self, conn, contador):
+        self._conn = conn
+        self._contador = contador
+
+    def cursor(self, *args):
+        return _CursorContado(self._conn.cursor(*args), self._contador)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+
+class PoolContado:
+    """Envuelve el pool y cuenta conexiones prestadas y sentencias."""
+
+    def __init__(self, pool, rtt_ms=0):
+        self._pool = pool
+        self.rtt = rtt_ms / 1000
+        self.conexiones = 0
+        self.sentencias = 0
+
+    @contextmanager
+    def conexion(self):
+        self.conexiones += 1
+        with self._pool.conexion() as conn:
+            yield _ConexionContada(conn, self)
+
+
+def medir(nombre, fn, pool, repeticiones):
+    pool.conexiones = pool.sentencias = 0
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    print(f"  {nombre:<24} conexiones {pool.conexiones / repeticiones:4.1f}"
+          f"   sentencias {pool.sentencias / repeticiones:4.1f}"
+          f"   p50 {tiempos[len(tiempos) // 2]:7.2f} ms   max {tiempos[-1]:7.2f} ms")
+    return resultado
+
+
+def main(argv):
+    if not argv or argv[0].startswith("--"):
+        print("Uso: python bench_carga.py <corte_final_id> [--repeticiones N] [--rtt-ms N]")
+        return 2
+
+    def opcion(nombre, defecto):
+        return float(argv[argv.index(nombre) + 1]) if nombre in argv else defecto
+
+    corte_final_id = int(argv[0])
+    repeticiones = int(opcion("--repeticiones", 50))
+    pool = PoolContado(app.db, opcion("--rtt-ms", 0))
+    app.db = pool
+
+    print(f"corte final {corte_final_id}, {repeticiones} repeticiones, rtt simulado {pool.rtt * 1000:g} ms")
+    antes = medir("cadena anterior", lambda: _anterior(pool, corte_final_id), pool, repeticiones)
+    ahora = medir("cargar_datos_reporte", lambda: app.cargar_datos_reporte(corte_final_id), pool, repeticiones)
+
+    if antes is None or ahora is None:
+        print("el corte no existe o no es FINAL")
+        return 1
+    iguales = (antes["totales"] == ahora["totales"]
+               and [c["id"] for c in antes["cortes_turno"]] == [c["id"] for c in ahora["cortes_turno"]])
+    print(f"  {len(ahora['cortes_turno'])} cortes TURNO, resultados {'iguales' if iguales else 'DISTINTOS'}")
+
+    print("consulta del rango:")
+    params = (ahora["fecha_desde"], ahora["fecha_hasta"], ahora["corte_final"]["id"])
+    solo = medir("sólo totales (antes)", lambda: _solo_totales(pool, params, ahora["fuentes"]),
+                 pool, repeticiones)
+    con_desglose = medir("desglose con ROLLUP",
+                         lambda: _desglose(pool, params, ahora["fuentes"], ahora["corte_final"]["id"]),
+                         pool, repeticiones)
+    iguales = iguales and solo == con_desglose
+    print(f"  totales {'iguales' if solo == con_desglose else 'DISTINTOS'}")
+    return 0 if iguales else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
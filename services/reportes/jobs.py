@@ -0,0 +1,206 @@
+"""
+Generación de reportes en segundo plano.
+
+POST /reportes/generar-desde-corte-final registra un job en reporte_jobs
+(migración 0008) y regresa 202 con su id; un pool acotado de hilos
+(REPORTES_JOBS_HILOS, 2 por defecto) lo ejecuta y va guardando etapa y
+progreso, que se consultan con GET /reportes/jobs/<id>. El estado vive en
+la BD, así que cualquier instancia del servicio puede contestar.
+
+Deduplicación: mientras un job está PENDIENTE o EN_PROCESO su columna
+`activo` vale el corte_final_id (índice único). Una petición para el mismo
+corte choca con ese índice y se une al job existente en vez de crear otro.
+
+Los hilos sólo sirven en un proceso que sigue vivo después de responder
+(gunicorn, contenedor). En Lambda el contenedor se congela en cuanto sale
+la respuesta, así que ahí (AWS_LAMBDA_FUNCTION_NAME definida, o
+REPORTES_JOBS_EN_LINEA=1) el job se registra igual pero corre dentro de la
+misma petición y se regresa ya terminado.
+
+La cola no es durable: un job que falla queda en ERROR y nadie lo
+reintenta. Por eso el evento reporte.generar del outbox usa el camino
+síncrono (esperar) y sólo se da por entregado con el reporte guardado.
+
+Cada avance de etapa actualiza `actualizado`. Si un job vivo no avanza en
+REPORTES_JOB_VENCE_S segundos (300 por defecto; p. ej. la instancia murió
+a media ejecución), se marca ERROR y la siguiente petición crea uno nuevo.
+"""
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pymysql
+
+ESTADOS_ACTIVOS = ("PENDIENTE", "EN_PROCESO")
+
+# Porcentaje al entrar a cada etapa
+ETAPAS = {
+    "en_cola": 0,
+    "datos": 10,
+    "artefactos": 30,
+    "bd": 90,
+    "listo": 100,
+}
+
+_COLUMNAS = """
+    id, corte_final_id, estado, etapa, progreso, resultado, error,
+    creado, actualizado, terminado
+"""
+
+_SQL_ALTA = """
+    INSERT INTO reporte_jobs (id, corte_final_id, etapa, activo)
+    VALUES (%s, %s, 'en_cola', %s)
+"""
+
+
+def _texto_fecha(valor):
+    return valor.strftime("%Y-%m-%d %H:%M:%S") if isinstance(valor, datetime) else valor
+
+
+def formatear(job):
+    resultado = job.get("resultado")
+    if isinstance(resultado, (str, bytes)):
+        resultado = json.loads(resultado)
+    return {
+        "job_id": job["id"],
+        "corte_final_id": job["corte_final_id"],
+        "estado": job["estado"],
+        "etapa": job["etapa"],
+        "progreso": job["progreso"],
+        "resultado": resultado,
+        "error": job["error"],
+        "creado": _texto_fecha(job["creado"]),
+        "actualizado": _texto_fecha(job["actualizado"]),
+        "terminado": _texto_fecha(job["terminado"]),
+    }
+
+
+class ColaReportes:
+    """
+    `ejecutar(corte_final_id, avance, **opciones)` hace el trabajo y
+    regresa el resultado (dict serializable); `avance(etapa)` reporta el
+    progreso. Las opciones de una petición que se une a un job existente
+    se ignoran.
+    """
+
+    def __init__(self, db, ejecutar, hilos=None, vence_s=None, en_linea=None):
+        self.db = db
+        self.ejecutar = ejecutar
+        self.vence_s = vence_s if vence_s is not None else int(os.getenv("REPORTES_JOB_VENCE_S", "300"))
+        self.hilos = hilos or int(os.getenv("REPORTES_JOBS_HILOS", "2"))
+        if en_linea is None:
+            en_linea = bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME")) or os.getenv("REPORTES_JOBS_EN_LINEA") == "1"
+        self.en_linea = en_linea
+        self._executor = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="reporte-job")
+        self._stats = {"creados": 0, "deduplicados": 0, "vencidos": 0, "listos": 0, "errores": 0}
+        self._lock = threading.Lock()   # _stats: lo tocan los hilos de Flask y los del executor
+
+    def _contar(self, clave):
+        with self._lock:
+            self._stats[clave] += 1
+
+    # ------------------------------
+    # Alta
+    # ------------------------------
+    def encolar(self, corte_final_id, **opciones):
+        """Regresa (job, nuevo). Si ya hay un job vivo para el corte, regresa ése."""
+        with self.db.transaccion() as conn, conn.cursor() as cursor:
+            job_id = uuid.uuid4().hex
+            try:
+                cursor.execute(_SQL_ALTA, (job_id, corte_final_id, corte_final_id))
+                nuevo = True
+            except pymysql.err.IntegrityError:
+                nuevo = False
+
+            if not nuevo:
+                cursor.execute(
+                    f"""
+                    SELECT {_COLUMNAS}, actualizado < NOW() - INTERVAL %s SECOND AS vencido
+                    FROM reporte_jobs
+                    WHERE activo = %s
+                    FOR UPDATE
+                    """,
+                    (self.vence_s, corte_final_id)
+                )
+                existente = cursor.fetchone()
+                vencido = bool(existente and existente.pop("vencido"))
+                if existente and not vencido:
+                    self._contar("deduplicados")
+                    return existente, False
+
+                if vencido:
+                    self._contar("vencidos")
+                    cursor.execute(
+                        """
+                        UPDATE reporte_jobs
+                        SET estado = 'ERROR', activo = NULL, terminado = NOW(),
+                            error = 'Job abandonado: sin avance dentro del tiempo límite'
+                        WHERE id = %s
+                        """,
+                        (existente["id"],)
+                    )
+                cursor.execute(_SQL_ALTA, (job_id, corte_final_id, corte_final_id))
+
+            cursor.execute(f"SELECT {_COLUMNAS} FROM reporte_jobs WHERE id = %s", (job_id,))
+            job = cursor.fetchone()
+
+        self._contar("creados")
+        if self.en_linea:
+            self._correr(job_id, corte_final_id, opciones)
+            return self.obtener(job_id), True
+        self._executor.submit(self._correr, job_id, corte_final_id, opciones)
+        return job, True
+
+    def obtener(self, job_id):
+        with self.db.conexion() as conn, conn.cursor() as cursor:
+            cursor.execute(f"SELECT {_COLUMNAS} FROM reporte_jobs WHERE id = %s", (job_id,))
+            return cursor.fetchone()
+
+    # ------------------------------
+    # Ejecución
+    # ------------------------------
+    def _actualizar(self, job_id, sql, params):
+        with self.db.transaccion() as conn, conn.cursor() as cursor:
+            cursor.execute(f"UPDATE reporte_jobs SET {sql} WHERE id = %s", (*params, job_id))
+
+    def _avance(self, job_id, etapa):
+        self._actualizar(
+            job_id, "estado = 'EN_PROCESO', etapa = %s, progreso = %s",
+            (etapa, ETAPAS.get(etapa, 0))
+        )
+
+    def _correr(self, job_id, corte_final_id, opciones):
+        try:
+            self._avance(job_id, "datos")
+            resultado = self.ejecutar(
+                corte_final_id, lambda etapa: self._avance(job_id, etapa), **opciones
+            )
+        except Exception as e:
+            print(f"Job {job_id} (corte {corte_final_id}) falló:", e)
+            self._contar("errores")
+            try:
+                self._actualizar(
+                    job_id,
+                    "estado = 'ERROR', activo = NULL, terminado = NOW(), error = %s",
+                    (f"{type(e).__name__}: {e}"[:500],)
+                )
+            except Exception as e2:
+                print(f"Job {job_id}: no se pudo registrar el error:", e2)
+            return
+
+        self._contar("listos")
+        self._actualizar(
+            job_id,
+            """
+            estado = 'LISTO', activo = NULL, terminado = NOW(),
+            etapa = 'listo', progreso = 100, resultado = %s
+            """,
+            (json.dumps(resultado, default=str),)
+        )
+
+    def stats(self):
+        with self._lock:
+            return {"hilos": self.hilos, "en_linea": self.en_linea, **self._stats}
@@ -0,0 +1,191 @@
+"""
+Regeneración masiva de reportes de cortes FINAL en un rango de fechas
+(después de corregir datos o cambiar las plantillas).
+
+Los cortes se reparten en un pool de procesos (--procesos, por defecto
+uno por CPU) para que el render de PDF / Excel use todos los núcleos.
+Cada proceso importa app.py una vez, así que tiene su propio pool de
+conexiones (DB_POOL_SIZE) y su propio cliente S3 durante toda la corrida.
+
+Cada corte terminado se anota en el checkpoint (una línea JSON por corte);
+si la corrida se interrumpe, volver a lanzar el mismo comando se salta los
+que ya quedaron. Los que fallaron se reintentan. --reiniciar ignora el
+checkpoint.
+
+Como generar_reporte reutiliza por huella, un corte cuyos datos y
+plantillas no cambiaron no se vuelve a renderizar; --forzar lo obliga. Por
+defecto no se encola correo (--notificar para enviarlo).
+
+Uso (desde services/reportes):
+  python regenerar.py --desde 2025-01-01 --hasta 2025-03-31
+         [--procesos N] [--checkpoint ruta] [--reiniciar] [--forzar] [--notificar]
+"""
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+_SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SERVICES_DIR not in sys.path:
+    sys.path.append(_SERVICES_DIR)
+
+
+# ==========================
+# Worker
+# ==========================
+_app = None
+
+
+def _iniciar_worker():
+    global _app
+    import app
+    _app = app
+
+
+def _regenerar(corte_final_id, forzar, notificar):
+    inicio = time.perf_counter()
+    try:
+        resultado = _app.generar_reporte(corte_final_id, forzar=forzar, notificar=notificar)
+    except Exception as e:
+        return {"corte_final_id": corte_final_id, "estado": "error",
+                "error": f"{type(e).__name__}: {e}", "ms": _ms(inicio), "pid": os.getpid()}
+    return {"corte_final_id": corte_final_id, "estado": "ok",
+            "reporte_id": resultado["reporte_id"], "reutilizado": resultado["reutilizado"],
+            "ms": _ms(inicio), "pid": os.getpid()}
+
+
+def _ms(inicio):
+    return round((time.perf_counter() - inicio) * 1000, 1)
+
+
+# ==========================
+# Coordinador
+# ==========================
+def cortes_finales(desde, hasta):
+    """Ids de los cortes FINAL con fecha_inicio en [desde, hasta] (días completos)."""
+    from common import archivo
+    from common.db import get_pool
+
+    plantilla = """
+        SELECT id, fecha_inicio FROM {cortes}
+        WHERE tipo_corte = 'FINAL' AND fecha_inicio >= %s AND fecha_inicio < %s
+    """
+    db = get_pool()
+    with db.conexion() as conn, conn.cursor() as cursor:
+        sql, params = archivo.union_all(
+            plantilla, archivo.fuentes(cursor, desde), (desde, hasta + timedelta(days=1))
+        )
+        cursor.execute(sql + " ORDER BY fecha_inicio, id", params)
+        ids = [row["id"] for row in cursor.fetchall()]
+    # Los workers abren sus propias conexiones
+    db.cerrar()
+    return ids
+
+
+def leer_checkpoint(ruta):
+    hechos = set()
+    if not os.path.exists(ruta):
+        return hechos
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                continue   # última línea cortada por la interrupción
+            if registro.get("estado") == "ok":
+                hechos.add(registro["corte_final_id"])
+    return hechos
+
+
+def resumen(resultados, segundos, pendientes):
+    ok = [r for r in resultados if r["estado"] == "ok"]
+    errores = [r for r in resultados if r["estado"] == "error"]
+    reutilizados = sum(1 for r in ok if r["reutilizado"])
+    tiempos = sorted(r["ms"] for r in resultados)
+    por_proceso = {}
+    for r in resultados:
+        por_proceso[r["pid"]] = por_proceso.get(r["pid"], 0) + 1
+
+    print()
+    print(f"procesados:      {len(resultados)} de {pendientes} en {segundos:.1f} s")
+    print(f"  generados:     {len(ok) - reutilizados}")
+    print(f"  reutilizados:  {reutilizados}")
+    print(f"  errores:       {len(errores)}")
+    if resultados:
+        print(f"throughput:      {len(resultados) / segundos:.2f} reportes/s")
+        print(f"por reporte:     p50 {tiempos[len(tiempos) // 2]:.0f} ms"
+              f"   p95 {tiempos[int(len(tiempos) * 0.95)]:.0f} ms   max {tiempos[-1]:.0f} ms")
+        print("por proceso:     " + ", ".join(f"{pid}: {n}" for pid, n in sorted(por_proceso.items())))
+    for r in errores[:20]:
+        print(f"  corte {r['corte_final_id']}: {r['error']}")
+
+
+def main(argv):
+    def opcion(nombre, defecto=None):
+        return argv[argv.index(nombre) + 1] if nombre in argv else defecto
+
+    if "--desde" not in argv or "--hasta" not in argv:
+        print("Uso: python regenerar.py --desde AAAA-MM-DD --hasta AAAA-MM-DD "
+              "[--procesos N] [--checkpoint ruta] [--reiniciar] [--forzar] [--notificar]")
+        return 2
+
+    try:
+        desde = datetime.strptime(opcion("--desde"), "%Y-%m-%d")
+        hasta = datetime.strptime(opcion("--hasta"), "%Y-%m-%d")
+    except ValueError:
+        print("Fechas inválidas, formato AAAA-MM-DD")
+        return 2
+
+    procesos = int(opcion("--procesos", os.cpu_count() or 1))
+    ruta = opcion("--checkpoint", f"regenerar_{desde:%Y%m%d}_{hasta:%Y%m%d}.jsonl")
+    forzar = "--forzar" in argv
+    notificar = "--notificar" in argv
+
+    if "--reiniciar" in argv and os.path.exists(ruta):
+        os.remove(ruta)
+    hechos = leer_checkpoint(ruta)
+
+    ids = cortes_finales(desde, hasta)
+    pendientes = [i for i in ids if i not in hechos]
+    print(f"{len(ids)} cortes FINAL en el rango, {len(hechos & set(ids))} ya en el checkpoint, "
+          f"{len(pendientes)} pendientes; {procesos} procesos")
+    if not pendientes:
+        return 0
+
+    resultados = []
+    inicio = time.perf_counter()
+    # spawn: cada worker arranca limpio (sin heredar conexiones ni hilos)
+    contexto = multiprocessing.get_context("spawn")
+    with open(ruta, "a", encoding="utf-8") as checkpoint, \
+            ProcessPoolExecutor(max_workers=procesos, mp_context=contexto,
+                                initializer=_iniciar_worker) as pool:
+        futuros = [pool.submit(_regenerar, i, forzar, notificar) for i in pendientes]
+        try:
+            for futuro in as_completed(futuros):
+                r = futuro.result()
+                resultados.append(r)
+                checkpoint.write(json.dumps(r) + "\n")
+                checkpoint.flush()
+                print(f"[{len(resultados)}/{len(pendientes)}] corte {r['corte_final_id']}: "
+                      f"{r['estado']}{' (reutilizado)' if r.get('reutilizado') else ''} {r['ms']:.0f} ms")
+        except KeyboardInterrupt:
+            print("interrumpido: se cancelan los pendientes (el checkpoint queda al día)")
+            for futuro in futuros:
+                futuro.cancel()
+            resumen(resultados, time.perf_counter() - inicio, len(pendientes))
+            return 130
+
+    resumen(resultados, time.perf_counter() - inicio, len(pendientes))
+    return 1 if any(r["estado"] == "error" for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    sys.exit(main(sys.argv[1:]))
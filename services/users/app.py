@@ -1,7 +1,7 @@
 import os
+import sys
 from flask import Flask, request, jsonify
 import pymysql
-from pymysql.cursors import DictCursor
 
 # .env solo en local
 try:
@@ -10,24 +10,21 @@ try:
 except ImportError:
     pass
 
-app = Flask(__name__)
+# Código compartido entre servicios (services/common)
+_SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _SERVICES_DIR not in sys.path:
+    sys.path.append(_SERVICES_DIR)
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST", "localhost"),
-    "user": os.getenv("DB_USER", "root"),
-    "password": os.getenv("DB_PASS", ""),
-    "database": os.getenv("DB_NAME", "corte_caja"),
-    "cursorclass": DictCursor
-}
+from common.db import get_pool
 
+app = Flask(__name__)
 
-def get_connection():
-    return pymysql.connect(**DB_CONFIG)
+db = get_pool()
 
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"status": "ok", "service": "users"}), 200
+    return jsonify({"status": "ok", "service": "users", "db_pool": db.stats()}), 200
 
 
 @app.route("/usuarios", methods=["GET"])
@@ -36,14 +33,12 @@ def listar_usuarios():
     Lista todos los usuarios registrados (sin mostrar la contraseña).
     """
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
+        with db.conexion() as conn, conn.cursor() as cursor:
             cursor.execute(
                 "SELECT id, email, nombre, rol, fecha_creacion "
                 "FROM usuarios ORDER BY id"
             )
             rows = cursor.fetchall()
-        conn.close()
         return jsonify(rows), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -75,8 +70,7 @@ def crear_usuario():
         return jsonify({"error": "rol inválido"}), 400
 
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
+        with db.transaccion() as conn, conn.cursor() as cursor:
             cursor.execute(
                 """
                 INSERT INTO usuarios (email, password, nombre, rol)
@@ -84,7 +78,6 @@ def crear_usuario():
                 """,
                 (email, password, nombre, rol)
             )
-            conn.commit()
             nuevo_id = cursor.lastrowid
 
             cursor.execute(
@@ -93,7 +86,6 @@ def crear_usuario():
                 (nuevo_id,)
             )
             usuario = cursor.fetchone()
-        conn.close()
 
         return jsonify(usuario), 201
 
@@ -111,18 +103,14 @@ def eliminar_usuario(user_id):
     al frontend (no le muestra el botón).
     """
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
+        with db.transaccion() as conn, conn.cursor() as cursor:
             # Verificar que exista
             cursor.execute("SELECT id FROM usuarios WHERE id = %s", (user_id,))
             user = cursor.fetchone()
             if not user:
-                conn.close()
                 return jsonify({"error": "Usuario no encontrado"}), 404
 
             cursor.execute("DELETE FROM usuarios WHERE id = %s", (user_id,))
-            conn.commit()
-        conn.close()
         return jsonify({"message": "Usuario eliminado"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500